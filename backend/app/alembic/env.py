@@ -36,7 +36,9 @@ from app.core.config import settings  # noqa
 
 # from app.core.models.core import *  # noqa
 from app.users.models.users import *  # noqa
-# from app.core.models.driver import *  # noqa
+from app.core.models.driver import *  # noqa
+from app.core.models.corrida import *  # noqa
+from app.core.models.idempotencia import *  # noqa
 
 target_metadata = Base.metadata
 # breakpoint()
@@ -0,0 +1,46 @@
+"""users current_location_geog
+
+Revision ID: 125593137921
+Revises: a860633fd3c2
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = '125593137921'
+down_revision: Union[str, Sequence[str], None] = 'a860633fd3c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users',
+        sa.Column(
+            'current_location_geog',
+            geoalchemy2.types.Geography(geometry_type='POINT', srid=4326, spatial_index=False, from_text='ST_GeogFromText', name='geography'),
+            sa.Computed('current_location::geography', persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'ix_users_current_location_geog',
+        'users',
+        ['current_location_geog'],
+        unique=False,
+        postgresql_using='gist',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_current_location_geog', table_name='users', postgresql_using='gist')
+    op.drop_column('users', 'current_location_geog')
@@ -0,0 +1,121 @@
+"""tarifas categorias
+
+Revision ID: 5ae543c508ea
+Revises: 125593137921
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5ae543c508ea'
+down_revision: Union[str, Sequence[str], None] = '125593137921'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Categorias e tarifas que antes ficavam fixas no código (roteamento.fake_categorias)
+CATEGORIAS = [
+    ('22f5cb69-d97b-4753-a148-398a387b3ceb', 'Confort', 'confort.json', 4.0, 1.8, 0.4, 8.0),
+    ('716f1605-2be5-47f3-8e1f-6c7bc76736f2', 'Confort M', 'woman.json', 4.0, 1.8, 0.4, 8.0),
+    ('a59af7b3-2895-46e1-bf44-86b8d171613b', 'XL', 'xl.json', 6.0, 2.2, 0.5, 12.0),
+    ('2b05c586-203e-45cd-8cf0-ce9cecd153e5', 'Economico', 'economico.json', 10.0, 3.5, 0.8, 20.0),
+    ('8073d7b7-63b1-447f-b91f-f0518d8a0dc2', 'MOTO', 'moto.json', 2.5, 1.0, 0.25, 5.0),
+]
+
+LOG_COLUMNS = [
+    ('is_active', sa.Boolean(), False),
+    ('created_at', sa.DateTime(timezone=True), False),
+    ('updated_at', sa.DateTime(timezone=True), True),
+    ('deleted_at', sa.DateTime(timezone=True), True),
+    ('created_by', sa.Integer(), True),
+    ('updated_by', sa.Integer(), True),
+    ('deleted_by', sa.Integer(), True),
+]
+
+
+def log_columns():
+    return [sa.Column(nome, tipo, nullable=nullable) for nome, tipo, nullable in LOG_COLUMNS]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    categorias = op.create_table('categorias_corridas',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('nome', sa.String(length=100), nullable=False),
+    sa.Column('descricao', sa.String(length=255), nullable=True),
+    sa.Column('icone', sa.String(length=255), nullable=True),
+    sa.Column('ordem', sa.Integer(), nullable=False),
+    *log_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    tarifas = op.create_table('tarifas_categorias',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('categoria_id', sa.Uuid(), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.Column('tarifa_base', sa.Float(), nullable=False),
+    sa.Column('custo_por_km', sa.Float(), nullable=False),
+    sa.Column('custo_por_minuto', sa.Float(), nullable=False),
+    sa.Column('tarifa_minima', sa.Float(), nullable=False),
+    sa.Column('vigente_desde', sa.DateTime(timezone=True), nullable=False),
+    *log_columns(),
+    sa.ForeignKeyConstraint(['categoria_id'], ['categorias_corridas.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('categoria_id', 'versao', name='uq_tarifas_categorias_categoria_versao')
+    )
+    op.create_table('categorias_veiculo',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('nome', sa.String(length=100), nullable=False),
+    sa.Column('descricao', sa.String(length=255), nullable=True),
+    sa.Column('icone', sa.String(length=255), nullable=True),
+    *log_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    agora = datetime.now(timezone.utc)
+    op.bulk_insert(categorias, [
+        {'id': uuid.UUID(id_), 'nome': nome, 'descricao': '...', 'icone': icone, 'ordem': ordem, 'is_active': True, 'created_at': agora}
+        for ordem, (id_, nome, icone, *_) in enumerate(CATEGORIAS)
+    ])
+    op.bulk_insert(tarifas, [
+        {
+            'categoria_id': uuid.UUID(id_), 'versao': 1, 'tarifa_base': base, 'custo_por_km': km,
+            'custo_por_minuto': minuto, 'tarifa_minima': minima, 'vigente_desde': agora,
+            'is_active': True, 'created_at': agora,
+        }
+        for id_, _, _, base, km, minuto, minima in CATEGORIAS
+    ])
+
+    # Avisa os processos da API para recarregarem a tabela de tarifas em memória
+    op.execute("""
+        CREATE FUNCTION notificar_tarifas_alteradas() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('tarifas_alteradas', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for tabela in ('categorias_corridas', 'tarifas_categorias'):
+        op.execute(f"""
+            CREATE TRIGGER trg_{tabela}_notificar
+            AFTER INSERT OR UPDATE OR DELETE ON {tabela}
+            FOR EACH STATEMENT EXECUTE FUNCTION notificar_tarifas_alteradas();
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_tarifas_categorias_notificar ON tarifas_categorias")
+    op.execute("DROP TRIGGER IF EXISTS trg_categorias_corridas_notificar ON categorias_corridas")
+    op.execute("DROP FUNCTION IF EXISTS notificar_tarifas_alteradas()")
+    op.drop_table('categorias_veiculo')
+    op.drop_table('tarifas_categorias')
+    op.drop_table('categorias_corridas')
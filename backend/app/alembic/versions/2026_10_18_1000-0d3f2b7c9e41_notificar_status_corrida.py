@@ -0,0 +1,52 @@
+"""notificar status corrida
+
+Revision ID: 0d3f2b7c9e41
+Revises: 5ae543c508ea
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d3f2b7c9e41'
+down_revision: Union[str, Sequence[str], None] = '5ae543c508ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NOTIFY no canal `corridas` a cada mudança de status da corrida (hoje em users.status_corrida).
+    # O payload é pequeno (bem abaixo do limite de 8000 bytes do NOTIFY) e só é entregue após o commit.
+    op.execute("""
+        CREATE FUNCTION notificar_status_corrida() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('corridas', json_build_object(
+                'tabela', TG_TABLE_NAME,
+                'id', NEW.id,
+                'status', NEW.status_corrida,
+                'anterior', OLD.status_corrida
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_users_status_corrida_notificar
+        AFTER UPDATE OF status_corrida ON users
+        FOR EACH ROW
+        WHEN (OLD.status_corrida IS DISTINCT FROM NEW.status_corrida)
+        EXECUTE FUNCTION notificar_status_corrida()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_users_status_corrida_notificar ON users")
+    op.execute("DROP FUNCTION IF EXISTS notificar_status_corrida()")
@@ -0,0 +1,148 @@
+"""corridas
+
+Revision ID: 9b8e4c1d2a67
+Revises: 0d3f2b7c9e41
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b8e4c1d2a67'
+down_revision: Union[str, Sequence[str], None] = '0d3f2b7c9e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUS = ('aguardando', 'atribuida', 'aceita', 'em_andamento', 'finalizada', 'cancelada', 'sem_motorista')
+ATIVOS = "status IN ('aguardando', 'atribuida', 'aceita', 'em_andamento')"
+COM_MOTORISTA = "status IN ('atribuida', 'aceita', 'em_andamento')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'corridas',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('passageiro_id', sa.Integer(), nullable=False),
+        sa.Column('motorista_id', sa.Integer(), nullable=True),
+        sa.Column('categoria_id', sa.Uuid(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('versao', sa.Integer(), nullable=False),
+        sa.Column('lat_ini', sa.Float(), nullable=True),
+        sa.Column('lon_ini', sa.Float(), nullable=True),
+        sa.Column('lat_fim', sa.Float(), nullable=True),
+        sa.Column('lon_fim', sa.Float(), nullable=True),
+        sa.Column('endereco_inicio', sa.String(length=500), nullable=True),
+        sa.Column('endereco_fim', sa.String(length=500), nullable=True),
+        sa.Column('distancia_km', sa.Float(), nullable=True),
+        sa.Column('duracao_min', sa.Float(), nullable=True),
+        sa.Column('preco', sa.Float(), nullable=True),
+        sa.Column('versao_tarifa', sa.Integer(), nullable=True),
+        sa.Column('tempo_chegada_min', sa.Float(), nullable=True),
+        sa.Column('atribuida_em', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('aceita_em', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('iniciada_em', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finalizada_em', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('cancelada_em', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('updated_by', sa.Integer(), nullable=True),
+        sa.Column('deleted_by', sa.Integer(), nullable=True),
+        sa.CheckConstraint(f"status IN {STATUS!r}", name='ck_corridas_status'),
+        sa.ForeignKeyConstraint(['passageiro_id'], ['users.id'], ondelete='RESTRICT'),
+        sa.ForeignKeyConstraint(['motorista_id'], ['users.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['categoria_id'], ['categorias_corridas.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'uq_corridas_passageiro_ativa',
+        'corridas',
+        ['passageiro_id'],
+        unique=True,
+        postgresql_where=sa.text(ATIVOS),
+        postgresql_include=['id', 'status', 'motorista_id'],
+    )
+    op.create_index(
+        'uq_corridas_motorista_ativa',
+        'corridas',
+        ['motorista_id'],
+        unique=True,
+        postgresql_where=sa.text(COM_MOTORISTA),
+        postgresql_include=['id', 'status', 'passageiro_id'],
+    )
+    op.create_index(
+        'ix_corridas_aguardando',
+        'corridas',
+        ['created_at'],
+        postgresql_where=sa.text("status = 'aguardando'"),
+        postgresql_include=['id', 'passageiro_id', 'lat_ini', 'lon_ini'],
+    )
+
+    # O NOTIFY de mudança de status passa de users.status_corrida para corridas.status
+    op.execute("DROP TRIGGER IF EXISTS trg_users_status_corrida_notificar ON users")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notificar_status_corrida() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('corridas', json_build_object(
+                'tabela', TG_TABLE_NAME,
+                'id', NEW.id,
+                'passageiro_id', NEW.passageiro_id,
+                'motorista_id', NEW.motorista_id,
+                'status', NEW.status,
+                'anterior', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_corridas_status_inserir
+        AFTER INSERT ON corridas
+        FOR EACH ROW EXECUTE FUNCTION notificar_status_corrida()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_corridas_status_notificar
+        AFTER UPDATE OF status ON corridas
+        FOR EACH ROW
+        WHEN (OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION notificar_status_corrida()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_corridas_status_notificar ON corridas")
+    op.execute("DROP TRIGGER IF EXISTS trg_corridas_status_inserir ON corridas")
+    op.drop_index('ix_corridas_aguardando', table_name='corridas')
+    op.drop_index('uq_corridas_motorista_ativa', table_name='corridas')
+    op.drop_index('uq_corridas_passageiro_ativa', table_name='corridas')
+    op.drop_table('corridas')
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notificar_status_corrida() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('corridas', json_build_object(
+                'tabela', TG_TABLE_NAME,
+                'id', NEW.id,
+                'status', NEW.status_corrida,
+                'anterior', OLD.status_corrida
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_users_status_corrida_notificar
+        AFTER UPDATE OF status_corrida ON users
+        FOR EACH ROW
+        WHEN (OLD.status_corrida IS DISTINCT FROM NEW.status_corrida)
+        EXECUTE FUNCTION notificar_status_corrida()
+    """)
@@ -0,0 +1,56 @@
+"""notificar usuarios alterados
+
+Revision ID: 4f7a2c9e1b83
+Revises: 9b8e4c1d2a67
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f7a2c9e1b83'
+down_revision: Union[str, Sequence[str], None] = '9b8e4c1d2a67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Invalida o cache de usuário autenticado (app.services.cache_principais) em todos os workers.
+    # Só as colunas do principal disparam: posição e disponibilidade mudam o tempo todo.
+    op.execute("""
+        CREATE FUNCTION notificar_usuarios_alterados() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('usuarios_alterados', json_build_object('id', OLD.id)::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_users_notificar_alterados
+        AFTER UPDATE OF email, full_name, role, is_active, is_superuser ON users
+        FOR EACH ROW
+        WHEN (
+            (OLD.email, OLD.full_name, OLD.role, OLD.is_active, OLD.is_superuser)
+            IS DISTINCT FROM (NEW.email, NEW.full_name, NEW.role, NEW.is_active, NEW.is_superuser)
+        )
+        EXECUTE FUNCTION notificar_usuarios_alterados()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_users_notificar_removidos
+        AFTER DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION notificar_usuarios_alterados()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_users_notificar_removidos ON users")
+    op.execute("DROP TRIGGER IF EXISTS trg_users_notificar_alterados ON users")
+    op.execute("DROP FUNCTION IF EXISTS notificar_usuarios_alterados()")
@@ -0,0 +1,32 @@
+"""users localizacao_em
+
+Revision ID: 7c1e5a9d3b20
+Revises: 4f7a2c9e1b83
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a9d3b20'
+down_revision: Union[str, Sequence[str], None] = '4f7a2c9e1b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('localizacao_em', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_users_localizacao_em', 'users', ['localizacao_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_localizacao_em', table_name='users')
+    op.drop_column('users', 'localizacao_em')
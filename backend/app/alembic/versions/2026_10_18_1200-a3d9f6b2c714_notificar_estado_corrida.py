@@ -0,0 +1,64 @@
+"""notificar estado corrida
+
+Revision ID: a3d9f6b2c714
+Revises: 7c1e5a9d3b20
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9f6b2c714'
+down_revision: Union[str, Sequence[str], None] = '7c1e5a9d3b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O NOTIFY `corridas` alimenta o pub/sub das conexões SSE de todos os workers
+    # (app.services.pubsub.ao_notificar_corrida): leva o estado completo que o
+    # passageiro recebe e o embarque, usado na oferta ao motorista.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notificar_status_corrida() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('corridas', json_build_object(
+                'tabela', TG_TABLE_NAME,
+                'id', NEW.id,
+                'passageiro_id', NEW.passageiro_id,
+                'motorista_id', NEW.motorista_id,
+                'status', NEW.status,
+                'anterior', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+                'tempo_chegada_min', NEW.tempo_chegada_min,
+                'lat_ini', NEW.lat_ini,
+                'lon_ini', NEW.lon_ini
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notificar_status_corrida() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('corridas', json_build_object(
+                'tabela', TG_TABLE_NAME,
+                'id', NEW.id,
+                'passageiro_id', NEW.passageiro_id,
+                'motorista_id', NEW.motorista_id,
+                'status', NEW.status,
+                'anterior', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
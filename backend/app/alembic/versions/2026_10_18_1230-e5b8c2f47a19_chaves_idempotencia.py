@@ -0,0 +1,42 @@
+"""chaves idempotencia
+
+Revision ID: e5b8c2f47a19
+Revises: a3d9f6b2c714
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+import geoalchemy2
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8c2f47a19'
+down_revision: Union[str, Sequence[str], None] = 'a3d9f6b2c714'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'chaves_idempotencia',
+        sa.Column('chave', sa.LargeBinary(), nullable=False),
+        sa.Column('digest', sa.LargeBinary(), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('headers', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('corpo', sa.LargeBinary(), nullable=True),
+        sa.Column('expira_em', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('chave'),
+    )
+    op.create_index(op.f('ix_chaves_idempotencia_expira_em'), 'chaves_idempotencia', ['expira_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_chaves_idempotencia_expira_em'), table_name='chaves_idempotencia')
+    op.drop_table('chaves_idempotencia')
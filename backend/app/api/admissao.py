@@ -0,0 +1,61 @@
+import json
+import re
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.services.admissao import ControleAdmissao, Prioridade, controle_admissao
+
+API = settings.API_V1_STR
+
+# Mudanças de estado da corrida: nunca são recusadas pelo controle de admissão
+ROTAS_CRITICAS = re.compile(
+    rf"^{re.escape(API)}/(corrida/(reservar|cancelar|iniciar|finalizar)|driver/ofertas/\d+/(aceitar|recusar))/?$"
+)
+PREFIXOS_BAIXA = tuple(
+    f"{API}{prefixo}" for prefixo in ("/utils", "/core", "/perfil", "/private", "/corrida/cache", "/corrida/eta")
+)
+# Fora do controle: conexões longas (SSE), que não seguram sessão do banco enquanto estão
+# abertas, e o health-check, que não usa o banco e não pode falhar por sobrecarga
+SEM_ADMISSAO = {f"{API}/corrida/consultar/stream", f"{API}/utils/health-check/"}
+
+
+def prioridade_da_rota(metodo: str, caminho: str) -> Prioridade | None:
+    if caminho in SEM_ADMISSAO or not caminho.startswith(API):
+        return None
+    if metodo == "POST" and ROTAS_CRITICAS.match(caminho):
+        return Prioridade.CRITICA
+    if caminho.startswith(PREFIXOS_BAIXA):
+        return Prioridade.BAIXA
+    return Prioridade.NORMAL
+
+
+class MiddlewareAdmissao:
+    """Aplica o `ControleAdmissao` antes do roteamento: a requisição recusada não abre sessão no banco."""
+
+    def __init__(self, app: ASGIApp, controle: ControleAdmissao = controle_admissao):
+        self.app = app
+        self.controle = controle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        prioridade = prioridade_da_rota(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if prioridade is None:
+            await self.app(scope, receive, send)
+            return
+        if not self.controle.entrar(prioridade):
+            corpo = json.dumps({"detail": "Serviço sobrecarregado, tente novamente em instantes"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(corpo)).encode()),
+                    (b"retry-after", str(settings.ADMISSAO_RETRY_AFTER_S).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": corpo})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controle.sair(prioridade)
@@ -13,7 +13,9 @@ from sqlmodel import Session
 from app.core import security
 from app.core.config import settings
 from app.core.db import async_session, engine_async
-from app.core.permissions import Role, permissoes_rbac
+from app.core.permissions import PERMISSOES_VERSAO, mapa_permissoes
+from app.services.cache_principais import Principal, cache_principais, principal_stmt
+from app.services.tokens_supabase import TokenSupabaseInvalido, verificador_supabase
 from app.users.models.users import TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
@@ -46,16 +48,40 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
 AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 
 
-async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> User:
+def decode_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = await session.get(User, token_data.sub)
+
+
+def token_subject(token: str) -> str:
+    token_data = decode_token(token)
+    if token_data.sub is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    return token_data.sub
+
+
+def claims_supabase(token: str) -> dict:
+    """Claims de um token do Supabase Auth, verificadas localmente (`verificador_supabase`)."""
+    try:
+        return verificador_supabase.verificar(token)
+    except TokenSupabaseInvalido:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token do Supabase inválido",
+        )
+
+
+async def get_user_from_token(session: AsyncSession, token: str) -> User:
+    user = await session.get(User, token_subject(token))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -63,25 +89,86 @@ async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> User:
     return user
 
 
+async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> User:
+    return await get_user_from_token(session, token)
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
+async def get_principal_from_token(token: str, session: AsyncSession | None = None) -> Principal:
+    """
+    Usuário autenticado sem carregar a entidade `User`, via `cache_principais`.
+
+    Só consulta o banco (as colunas do `Principal`) quando o subject não está no cache,
+    pela `session` da requisição quando houver. Sem ela (WebSocket e SSE, que não
+    seguram sessão durante a conexão) abre uma sessão só para a consulta.
+    """
+    sub = token_subject(token)
+    principal = cache_principais.obter(sub)
+    if principal is None:
+        try:
+            usuario_id = int(sub)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        if session is not None:
+            linha = (await session.execute(principal_stmt(usuario_id))).one_or_none()
+        else:
+            async with async_session() as sessao_propria:
+                linha = (await sessao_propria.execute(principal_stmt(usuario_id))).one_or_none()
+        if linha is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(**linha._mapping)
+        if principal.is_active:
+            cache_principais.guardar(sub, principal)
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+async def get_current_principal(session: AsyncSessionDep, token: TokenDep) -> Principal:
+    # mesma sessão da rota (a dependência é resolvida uma vez por requisição): sem
+    # segunda conexão do pool quando o principal não está no cache
+    return await get_principal_from_token(token, session)
+
+
+# Para endpoints que só leem o usuário; os que alteram o `User` continuam com `CurrentUser`
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
 def ResourceAccess(recurso: str) -> Depends:
-    def rbac_dep(
-        request: Request,
-        user: User = Depends(get_current_user),
-    ) -> None:
-        metodo = request.method
-        if user.role == Role.ADMIN:
-            return Depends(rbac_dep)
-        if (user.role, recurso, metodo) not in permissoes_rbac:
+    """
+    RBAC pelo `mapa_permissoes` com o papel do principal em cache
+    (`get_principal_from_token`), que só vai ao banco quando o usuário não
+    está no cache e é invalidado por NOTIFY quando o usuário muda. Assim uma
+    troca de papel ou desativação vale já na próxima requisição, sem esperar
+    o token expirar.
+
+    A versão das permissões continua vindo na claim: incrementar
+    `PERMISSOES_VERSAO` obriga todas as sessões a refazer o login.
+    """
+
+    async def rbac_dep(request: Request, session: AsyncSessionDep, token: TokenDep) -> None:
+        token_data = decode_token(token)
+        if token_data.pv != PERMISSOES_VERSAO:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Permissões do token desatualizadas, faça login novamente",
+            )
+        # papel atual do principal em cache, não o da claim: o token vale dias e o papel pode
+        # ter mudado (ou o usuário ter sido desativado) depois de emitido
+        principal = await get_principal_from_token(token, session)
+        if not mapa_permissoes.permite(principal.role, recurso, request.method):
             raise HTTPException(status_code=403, detail="Permissão negada")
         # Não retorna nada — só valida
 
     return Depends(rbac_dep)
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+def get_current_active_superuser(current_user: CurrentPrincipal) -> Principal:
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="The user doesn't have enough privileges")
     return current_user
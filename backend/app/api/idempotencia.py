@@ -0,0 +1,124 @@
+import hashlib
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app.api.limite_taxa import endereco_do_cliente
+from app.services.idempotencia import (
+    TAMANHO_MAXIMO_CHAVE,
+    ArmazenamentoIdempotencia,
+    CorpoDiferente,
+    EmAndamento,
+    RegistroIdempotencia,
+    RespostaGuardada,
+    armazenamento_idempotencia,
+    digest_corpo,
+    registro_idempotencia,
+)
+
+CABECALHO = "idempotency-key"
+# cabeçalhos que o Starlette recalcula ao montar a resposta repetida
+_NAO_GUARDAR = {b"content-length", b"set-cookie"}
+
+
+def _escopo(request: Request) -> bytes:
+    """Quem fez a requisição: o token (sem consultar o banco) ou, sem ele, o IP."""
+    autorizacao = request.headers.get("authorization")
+    if autorizacao:
+        return hashlib.blake2b(autorizacao.encode(), digest_size=16).digest()
+    return endereco_do_cliente(request.scope).encode()
+
+
+def _guardar(response: Response) -> RespostaGuardada:
+    headers = tuple((k, v) for k, v in response.raw_headers if k not in _NAO_GUARDAR)
+    return RespostaGuardada(response.status_code, headers, bytes(response.body))
+
+
+def _repetir(guardada: RespostaGuardada) -> Response:
+    response = Response(content=guardada.body, status_code=guardada.status_code)
+    response.raw_headers = [*(h for h in response.raw_headers if h[0] == b"content-length"), *guardada.headers]
+    response.headers["idempotency-replayed"] = "true"
+    return response
+
+
+class RotaIdempotente(APIRoute):
+    """
+    Rota que honra o cabeçalho `Idempotency-Key` nos POSTs.
+
+    Com a chave, a resposta da primeira execução (inclusive erros 4xx) é
+    guardada e devolvida às repetições sem rodar o endpoint. Sem a chave, ou
+    em outros métodos, a rota se comporta como uma `APIRoute` comum.
+
+    `registro` é o cache do processo; `armazenamento` (Postgres) vale entre
+    workers. Sem armazenamento, a deduplicação fica restrita ao processo.
+    """
+
+    registro: RegistroIdempotencia = registro_idempotencia
+    armazenamento: ArmazenamentoIdempotencia | None = armazenamento_idempotencia
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original = super().get_route_handler()
+        registro = self.registro
+        armazenamento = self.armazenamento
+
+        async def reservar(chave: tuple, digest: bytes) -> RespostaGuardada | None:
+            guardada = registro.reservar(chave, digest)
+            if guardada is not None or armazenamento is None:
+                return guardada
+            try:
+                guardada = await armazenamento.reservar(chave, digest)
+            except BaseException:
+                registro.liberar(chave)
+                raise
+            if guardada is not None:
+                registro.concluir(chave, guardada)
+            return guardada
+
+        async def liberar(chave: tuple) -> None:
+            registro.liberar(chave)
+            if armazenamento is not None:
+                await armazenamento.liberar(chave)
+
+        async def concluir(chave: tuple, guardada: RespostaGuardada) -> None:
+            registro.concluir(chave, guardada)
+            if armazenamento is not None:
+                await armazenamento.concluir(chave, guardada)
+
+        async def handler(request: Request) -> Response:
+            chave_cliente = request.headers.get(CABECALHO)
+            if request.method != "POST" or chave_cliente is None:
+                return await original(request)
+            if not chave_cliente or len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+                raise HTTPException(status_code=400, detail="Idempotency-Key inválida")
+
+            chave = (_escopo(request), request.url.path, chave_cliente)
+            try:
+                guardada = await reservar(chave, digest_corpo(await request.body()))
+            except EmAndamento:
+                raise HTTPException(status_code=409, detail="Requisição com esta Idempotency-Key ainda em andamento")
+            except CorpoDiferente:
+                raise HTTPException(status_code=422, detail="Idempotency-Key já usada com outro corpo")
+            if guardada is not None:
+                return _repetir(guardada)
+
+            try:
+                response = await original(request)
+            except HTTPException as exc:
+                if exc.status_code >= 500:
+                    await liberar(chave)
+                    raise
+                # mesmo formato do tratador padrão do FastAPI, para a repetição ser idêntica
+                response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            except BaseException:
+                await liberar(chave)
+                raise
+            if response.status_code >= 500 or not hasattr(response, "body"):
+                await liberar(chave)
+            else:
+                await concluir(chave, _guardar(response))
+            return response
+
+        return handler
@@ -0,0 +1,114 @@
+import ipaddress
+import json
+import math
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import security
+from app.core.config import settings
+from app.services.limite_taxa import LimitadorTaxa, limitador_taxa
+
+# prefixo do caminho -> grupo de `LIMITE_TAXA`
+GRUPOS_POR_PREFIXO = {
+    f"{settings.API_V1_STR}/corrida": "corrida",
+    f"{settings.API_V1_STR}/driver": "driver",
+    f"{settings.API_V1_STR}/login": "login",
+    f"{settings.API_V1_STR}/password-recovery": "login",
+    f"{settings.API_V1_STR}/reset-password": "login",
+}
+
+
+def grupo_da_rota(caminho: str) -> str | None:
+    for prefixo, grupo in GRUPOS_POR_PREFIXO.items():
+        if caminho == prefixo or caminho.startswith(prefixo + "/"):
+            return grupo
+    return None
+
+
+Rede = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+PROXIES_CONFIAVEIS: list[Rede] = [ipaddress.ip_network(p, strict=False) for p in settings.PROXIES_CONFIAVEIS]
+
+
+def _confiavel(endereco: str, proxies: list[Rede]) -> bool:
+    try:
+        ip = ipaddress.ip_address(endereco)
+    except ValueError:
+        return False
+    return any(ip in rede for rede in proxies)
+
+
+def endereco_do_cliente(scope: Scope, proxies: list[Rede] | None = None) -> str:
+    """
+    Endereço do cliente, descontando os proxies de `PROXIES_CONFIAVEIS`.
+
+    O X-Forwarded-For só é lido quando a conexão vem de um proxy confiável e é
+    percorrido da direita para a esquerda: o primeiro endereço que não é de um
+    proxy confiável é o cliente (o que vem antes dele pode ter sido forjado).
+    """
+    proxies = PROXIES_CONFIAVEIS if proxies is None else proxies
+    cliente = scope.get("client")
+    endereco = cliente[0] if cliente else ""
+    if not proxies or not _confiavel(endereco, proxies):
+        return endereco
+    encaminhado = [
+        valor.decode("latin-1") for nome, valor in scope["headers"] if nome == b"x-forwarded-for"
+    ]
+    saltos = [s.strip() for s in ",".join(encaminhado).split(",") if s.strip()]
+    for salto in reversed(saltos):
+        endereco = salto
+        if not _confiavel(salto, proxies):
+            break
+    return endereco
+
+
+def chave_do_cliente(scope: Scope) -> str:
+    """`u:<id>` se o token for válido, senão `ip:<endereço>`."""
+    for nome, valor in scope["headers"]:
+        if nome == b"authorization":
+            esquema, _, token = valor.decode("latin-1").partition(" ")
+            if esquema.lower() == "bearer" and token:
+                try:
+                    sub = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]).get("sub")
+                except InvalidTokenError:
+                    sub = None
+                if sub is not None:
+                    return f"u:{sub}"
+            break
+    return f"ip:{endereco_do_cliente(scope)}"
+
+
+class MiddlewareLimiteTaxa:
+    """
+    Rejeita com 429 as requisições acima do orçamento do grupo de rotas.
+
+    Roda antes do roteamento, então a requisição recusada não chega à injeção
+    de dependências e não pega conexão do pool do banco.
+    """
+
+    def __init__(self, app: ASGIApp, limitador: LimitadorTaxa = limitador_taxa):
+        self.app = app
+        self.limitador = limitador
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        grupo = grupo_da_rota(scope["path"])
+        espera_s = self.limitador.consumir(grupo, chave_do_cliente(scope)) if grupo else 0.0
+        if not espera_s:
+            await self.app(scope, receive, send)
+            return
+        corpo = json.dumps({"detail": "Muitas requisições, tente novamente em instantes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"retry-after", str(math.ceil(espera_s)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": corpo})
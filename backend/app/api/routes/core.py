@@ -6,7 +6,7 @@ from fastapi.params import Form
 from pydantic import BaseModel, Field, HttpUrl, computed_field, field_serializer
 from sqlalchemy import delete, desc, exists, func, select
 
-from app.api.deps import AsyncSessionDep, CurrentUser, ResourceAccess
+from app.api.deps import AsyncSessionDep, CurrentPrincipal, ResourceAccess
 from app.core.permissions import Role
 # from app.models.core import Documentos
 # from app.models.perfis import Perfil
@@ -50,7 +50,7 @@ class DocumentosOut(BaseModel):
 
 
 @router.post("/upload-image", response_model=LinkImage)
-async def upload_image(current_user: CurrentUser, file: UploadFile = File(...)):
+async def upload_image(current_user: CurrentPrincipal, file: UploadFile = File(...)):
     extension = os.path.splitext(file.filename)[1]
     filename = str(uuid4()) + extension
     resultado = SupabaseStorageService().upload_fileobj(file, filename, file.content_type)
@@ -61,7 +61,7 @@ async def upload_image(current_user: CurrentUser, file: UploadFile = File(...)):
 @router.post("/documentos")
 async def upload_documentos(
     session: AsyncSessionDep,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     hash: UUID = Form(...),
     file: UploadFile = File(...),
     _=ResourceAccess('documentos'),
@@ -132,7 +132,7 @@ async def upload_documentos(
 
 @router.get("/documentos/{hash}")
 async def get_documentos(
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     session: AsyncSessionDep,
     _=ResourceAccess('documentos'),
 ):
@@ -147,7 +147,7 @@ async def get_documentos(
 @router.delete("/documentos/{id}")
 async def delete_documento(
     id: int,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     session: AsyncSessionDep,
     _=ResourceAccess('documentos'),
 ):
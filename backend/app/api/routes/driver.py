@@ -1,20 +1,34 @@
+import asyncio
 import io
-from datetime import date
+import time
+from datetime import date, datetime
 from typing import Optional
 from uuid import uuid4
 
-import jwt
 import sqlalchemy.exc
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from pydantic import BaseModel, ConfigDict, EmailStr
+import sqlalchemy.orm.exc
+from fastapi import APIRouter, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect, status
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.api.deps import (
     AsyncSessionDep,
+    CurrentPrincipal,
     CurrentUser,
+    claims_supabase,
+    get_principal_from_token,
 )
+from app.core.config import settings
+from app.core.db import async_session
 from app.core.models.core import VeiculoMotorista
+from app.core.models.corrida import Corrida, StatusCorrida, TransicaoInvalida
 from app.services import leitor_crlv
+from app.services.despacho import Atribuicao
+from app.services.indice_motoristas import indice_motoristas
+from app.services.localizacao import buffer_localizacoes
+from app.services.ofertas import agendador_ofertas
+from app.services.pubsub import pubsub_usuarios
 from app.services.supabase import SupabaseStorageService
 from app.users.models.users import (
     User,
@@ -71,9 +85,15 @@ class CRLVe(BaseModel):
     token: str
 
 
+class PingLocalizacao(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    registrado_em: Optional[datetime] = None
+
+
 @router.post("/account-status")
 async def account_status(payload: NewAcount, session: AsyncSessionDep):
-    token = jwt.decode(payload.token, options={"verify_signature": False})
+    token = claims_supabase(payload.token)
     email = token['email'].lower()
     result = await session.execute(select(User).where(User.email == email))
     db_user = result.scalars().first()
@@ -143,7 +163,7 @@ async def create_driver(dados: DriverRegister, session: AsyncSessionDep):  # ver
 
 @router.get("/vehicles")
 async def register_vehicle(
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     session: AsyncSessionDep,  # se for via Depends, ajuste: session: AsyncSessionDep
 ):
     stmt = select(VeiculoMotorista.cor, VeiculoMotorista.placa,VeiculoMotorista.id).where(
@@ -160,3 +180,129 @@ async def upload_pdf(session: AsyncSessionDep, file: UploadFile = File(...)):
     filename = str(uuid4()) + '_' + file.filename
     resultado = SupabaseStorageService().upload_fileobj(file, filename, file.content_type)
     return resultado
+
+
+@router.post("/location", status_code=202)
+async def update_location(current_user: CurrentPrincipal, pings: PingLocalizacao | list[PingLocalizacao]):
+    """
+    Recebe a posição do motorista (um ping ou uma lista acumulada pelo app).
+
+    A posição só é guardada no buffer em memória; a gravação no banco é feita
+    em lote pelo `buffer_localizacoes`, fora da requisição.
+    """
+    if current_user.role != 'driver':
+        raise HTTPException(status_code=403, detail="Apenas motoristas enviam localização")
+    if isinstance(pings, PingLocalizacao):
+        pings = [pings]
+    aceitos = 0
+    for ping in sorted(pings, key=lambda p: p.registrado_em.timestamp() if p.registrado_em else 0):
+        aceitos += buffer_localizacoes.registrar(current_user.id, ping.lat, ping.lon, ping.registrado_em)
+    return {'aceitos': aceitos}
+
+
+@router.websocket("/location/ws")
+async def location_stream(websocket: WebSocket, token: str):
+    """
+    Canal contínuo de posições do motorista (~1 Hz).
+
+    O token e a disponibilidade são lidos uma única vez, na abertura da conexão; depois disso
+    cada posição vai direto para o buffer/índice em memória, sem acesso ao
+    banco. Posições mais frequentes que `LOCALIZACAO_WS_INTERVALO_MIN_S` são
+    agregadas: a mais recente fica retida e é aplicada quando o intervalo termina.
+    """
+    try:
+        # nenhuma sessão do banco fica presa à conexão
+        user = await get_principal_from_token(token)
+    except HTTPException as ex:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(ex.detail))
+        return
+    if user.role != 'driver':
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Apenas motoristas enviam localização")
+        return
+    motorista_id = user.id
+    # uma única leitura na abertura: motorista em corrida só volta ao índice ao ser liberado
+    async with async_session() as session:
+        disponivel = await session.scalar(select(User.is_available).where(User.id == motorista_id))
+    indice_motoristas.definir_disponivel(motorista_id, user.is_active and disponivel is not False)
+    await websocket.accept()
+
+    intervalo = settings.LOCALIZACAO_WS_INTERVALO_MIN_S
+    ultimo_envio = 0.0
+    pendente: PingLocalizacao | None = None
+
+    def aplicar(ping: PingLocalizacao) -> None:
+        nonlocal ultimo_envio, pendente
+        buffer_localizacoes.registrar(motorista_id, ping.lat, ping.lon, ping.registrado_em)
+        ultimo_envio = time.monotonic()
+        pendente = None
+
+    try:
+        while True:
+            # com uma posição retida, espera no máximo até o fim do intervalo e então a aplica,
+            # sem depender de o app mandar outra (borda final)
+            espera = None if pendente is None else ultimo_envio + intervalo - time.monotonic()
+            if espera is not None and espera <= 0:
+                aplicar(pendente)
+                continue
+            try:
+                texto = await asyncio.wait_for(websocket.receive_text(), espera)
+            except asyncio.TimeoutError:
+                aplicar(pendente)
+                continue
+            try:
+                ping = PingLocalizacao.model_validate_json(texto)
+            except ValidationError as ex:
+                await websocket.send_json({'erro': ex.errors(include_url=False)})
+                continue
+            if time.monotonic() - ultimo_envio < intervalo:
+                pendente = ping
+                continue
+            aplicar(ping)
+    except WebSocketDisconnect:
+        if pendente is not None:
+            aplicar(pendente)
+    finally:
+        # motorista offline deixa de ser candidato neste worker; os demais o perdem pelo TTL
+        indice_motoristas.remover(motorista_id)
+
+
+async def oferta_pendente(session: AsyncSession, corrida_id: int, motorista_id: int) -> Corrida:
+    """Corrida atribuída a este motorista e ainda sem resposta; 404 caso contrário."""
+    corrida = await session.get(Corrida, corrida_id)
+    if corrida is None or corrida.status != StatusCorrida.ATRIBUIDA or corrida.motorista_id != motorista_id:
+        raise HTTPException(status_code=404, detail="Oferta não encontrada ou expirada")
+    return corrida
+
+
+@router.post("/ofertas/{corrida_id}/aceitar")
+async def aceitar_oferta(*, session: AsyncSessionDep, current_user: CurrentPrincipal, corrida_id: int):
+    """Aceita a corrida oferecida pelo despacho, dentro do prazo da oferta."""
+    corrida = await oferta_pendente(session, corrida_id, current_user.id)
+    try:
+        corrida.transicionar(StatusCorrida.ACEITA)
+        await session.commit()
+    except TransicaoInvalida:
+        raise HTTPException(status_code=409, detail="Oferta não está mais disponível")
+    except sqlalchemy.orm.exc.StaleDataError:
+        # o prazo venceu (ou o passageiro cancelou) enquanto o aceite era gravado
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Oferta não está mais disponível")
+    agendador_ofertas.aceitar(corrida_id)
+    pubsub_usuarios.publicar(corrida.passageiro_id, corrida.estado())
+    return corrida.estado()
+
+
+@router.post("/ofertas/{corrida_id}/recusar")
+async def recusar_oferta(*, session: AsyncSessionDep, current_user: CurrentPrincipal, corrida_id: int):
+    """Recusa a oferta; a corrida segue para o próximo motorista."""
+    corrida = await oferta_pendente(session, corrida_id, current_user.id)
+    # a oferta pode ter sido feita pelo despacho de outro worker
+    oferta = agendador_ofertas.oferta(corrida_id, current_user.id) or Atribuicao.da_corrida(corrida)
+    devolvidas = await agendador_ofertas.devolver(session, [oferta])
+    await session.commit()
+    if devolvidas:
+        agendador_ofertas.concluir_devolucao(devolvidas, expiradas=False)
+    else:
+        # cancelada ou expirada enquanto a recusa era gravada
+        agendador_ofertas.descartar(corrida_id)
+    return {'recusada': bool(devolvidas)}
@@ -4,14 +4,15 @@ from typing import Annotated, Any
 from fastapi import APIRouter, Body, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
-import jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-# from app import crud
-from app.api.deps import AsyncSessionDep, CurrentUser, get_current_active_superuser
+from app import crud
+from app.api.deps import AsyncSessionDep, CurrentUser, claims_supabase, get_current_active_superuser
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
-from app.users.models.users import Message, NewPassword, Token, UserPublic
+from app.services.senhas import servico_senhas
+from app.users.models.users import Message, NewPassword, Token, User, UserPublic
 from app.utils import (
     generate_password_reset_token,
     generate_reset_password_email,
@@ -29,16 +30,13 @@ async def login_access_token(
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    # try:
     user = await crud.authenticate(session=session, email=form_data.username, password=form_data.password)
-    # except:
-    #     raise HTTPException(status_code=400, detail="Voce ainda não cadastrou a senha. Verifique seu email!")
     if not user:
         raise HTTPException(status_code=400, detail="E-mail ou senha incorretos")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return Token(access_token=security.create_access_token(user.id, expires_delta=access_token_expires))
+    return Token(access_token=security.create_access_token(user.id, expires_delta=access_token_expires, role=user.role))
 
 
 @router.post("/login/test-token", response_model=UserPublic)
@@ -87,7 +85,7 @@ async def reset_password(session: AsyncSessionDep, body: NewPassword) -> Message
         )
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    hashed_password = get_password_hash(password=body.new_password)
+    hashed_password = await servico_senhas.gerar_hash(body.new_password)
     user.hashed_password = hashed_password
     session.add(user)
     await session.commit()
@@ -116,19 +114,36 @@ async def recover_password_html_content(email: str, session: AsyncSessionDep) ->
     return HTMLResponse(content=email_data.html_content, headers={"subject:": email_data.subject})
 
 
+async def papel_do_usuario(session: AsyncSession, sub: str) -> str | None:
+    """Papel gravado para o subject do Supabase, para ir no token (None se ainda não há usuário)."""
+    try:
+        usuario_id = int(sub)
+    except ValueError:
+        return None
+    return await session.scalar(select(User.role).where(User.id == usuario_id))
+
+
 @router.post("/login/supabase", response_model=Token)
 async def login_supabase(session: AsyncSessionDep, token: Annotated[str, Body(..., embed=True)]) -> Token:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    decoded_payload = jwt.decode(token, options={"verify_signature": False})
-    novo_token = Token(access_token=security.create_access_token(subject=decoded_payload['sub'], expires_delta=access_token_expires))
+    decoded_payload = claims_supabase(token)
+    papel = await papel_do_usuario(session, decoded_payload['sub'])
+    novo_token = Token(
+        access_token=security.create_access_token(
+            subject=decoded_payload['sub'], expires_delta=access_token_expires, role=papel
+        )
+    )
     return novo_token
 
 
 @router.post("/login/supabase/driver", response_model=Token)
 async def login_supabase_driver(session: AsyncSessionDep, token: Annotated[str, Body(..., embed=True)]) -> Token:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    decoded_payload = jwt.decode(token, options={"verify_signature": False})
+    decoded_payload = claims_supabase(token)
+    papel = await papel_do_usuario(session, decoded_payload['sub'])
     novo_token = Token(
-        access_token=security.create_access_token(subject=decoded_payload['sub'], expires_delta=access_token_expires)
+        access_token=security.create_access_token(
+            subject=decoded_payload['sub'], expires_delta=access_token_expires, role=papel
+        )
     )
     return novo_token
\ No newline at end of file
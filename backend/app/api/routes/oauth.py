@@ -8,7 +8,7 @@ from authlib.integrations.starlette_client import OAuth
 from app.api.deps import AsyncSessionDep
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.services.senhas import servico_senhas
 from app.users.models.users import Token, User
 from app import crud
 
@@ -54,7 +54,7 @@ async def google_callback(request: Request, session: AsyncSessionDep):
     if not user:
         # Create a local user with a random password
         random_password = secrets.token_urlsafe(16)
-        hashed_password = get_password_hash(random_password)
+        hashed_password = await servico_senhas.gerar_hash(random_password)
         user = User(email=email, full_name=full_name, hashed_password=hashed_password, is_active=True)
         session.add(user)
         await session.commit()
@@ -64,7 +64,7 @@ async def google_callback(request: Request, session: AsyncSessionDep):
         raise HTTPException(status_code=400, detail="Inactive user")
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    jwt_token = security.create_access_token(user.id, expires_delta=access_token_expires)
+    jwt_token = security.create_access_token(user.id, expires_delta=access_token_expires, role=user.role)
 
     # Mobile/web: if FRONTEND_OAUTH_REDIRECT_URL is defined, redirect with token
     if settings.FRONTEND_OAUTH_REDIRECT_URL:
@@ -1,70 +1,95 @@
+import asyncio
+import json
+from dataclasses import asdict
 from typing import Any
 import uuid
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from geoalchemy2 import Geography, Geometry
-from pydantic import BaseModel
-from sqlmodel import func, select, cast
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import func, select, cast, update
 
-from app.api.deps import AsyncSessionDep, CurrentUser
-from app.services.corrida import calcular_preco
+from app.api.deps import (
+    AsyncSessionDep,
+    CurrentPrincipal,
+    CurrentUser,
+    TokenDep,
+    get_current_active_superuser,
+    get_principal_from_token,
+)
+from app.api.idempotencia import RotaIdempotente
+from app.api.limite_taxa import chave_do_cliente
+from app.core.db import async_session
+from app.core.models.corrida import (
+    ESTADOS_ATIVOS,
+    ESTADOS_COM_MOTORISTA,
+    Corrida,
+    StatusCorrida,
+    TransicaoInvalida,
+)
+from app.services.cache_cotacoes import cache_cotacoes, chave_cotacao
+from app.services.corrida import calcular_multiplicador, estimar_tempo_chegada_min
+from app.services.demanda import painel_demanda, zona
+from app.services.despacho import despachante
+from app.services.eta import calcular_matriz_eta
+from app.services.indice_motoristas import indice_motoristas
+from app.services.pubsub import pubsub_usuarios
+from app.services.rotas import servico_rotas
+from app.services.tarifas import catalogo_tarifas
 from app.users.models.users import User
 
-router = APIRouter(prefix="/corrida", tags=["corrida"])
-
-
-fake_categorias = [
-    {
-        'id': uuid.UUID('22f5cb69-d97b-4753-a148-398a387b3ceb'),
-        "tarifa_base": 4.0,
-        "custo_por_km": 1.8,
-        "custo_por_minuto": 0.4,
-        "tarifa_minima": 8.0,
-        'titulo': 'Confort',
-        'subtitulo': '...',
-        'icone': 'confort.json',
-    },
-    {
-        'id': uuid.UUID('716f1605-2be5-47f3-8e1f-6c7bc76736f2'),
-        "tarifa_base": 4.0,
-        "custo_por_km": 1.8,
-        "custo_por_minuto": 0.4,
-        "tarifa_minima": 8.0,
-        'titulo': 'Confort M',
-        'subtitulo': '...',
-        'icone': 'woman.json',
-    },
-    {
-        'id': uuid.UUID('a59af7b3-2895-46e1-bf44-86b8d171613b'),
-        "tarifa_base": 6.0,
-        "custo_por_km": 2.2,
-        "custo_por_minuto": 0.5,
-        "tarifa_minima": 12.0,
-        'titulo': 'XL',
-        'subtitulo': '...',
-        'icone': 'xl.json',
-    },
-    {
-        'id': uuid.UUID('2b05c586-203e-45cd-8cf0-ce9cecd153e5'),
-        "tarifa_base": 10.0,
-        "custo_por_km": 3.5,
-        "custo_por_minuto": 0.8,
-        "tarifa_minima": 20.0,
-        'titulo': 'Economico',
-        'subtitulo': '...',
-        'icone': 'economico.json',
-    },
-    {
-        'subtitulo': '...',
-        'id': uuid.UUID('2b05c586-203e-45cd-8cf0-ce9cecd153e5'),
-        "tarifa_base": 2.5,
-        "custo_por_km": 1.0,
-        "custo_por_minuto": 0.25,
-        "tarifa_minima": 5.0,
-        'titulo': 'MOTO',
-        'icone': 'moto.json',
-    },
-]
+# Os POSTs aceitam Idempotency-Key: repetições do app recebem a resposta já dada
+router = APIRouter(prefix="/corrida", tags=["corrida"], route_class=RotaIdempotente)
+
+RAIO_BUSCA_M = 10000  # 10 km em metros
+MOTORISTAS_MAIS_PROXIMOS = 5
+TEMPO_ESPERA_PADRAO_MIN = 5.0  # usado no preço quando não há motorista próximo
+MAXIMO_PONTOS_MATRIZ_ETA = 500
+INTERVALO_KEEPALIVE_SSE_S = 15.0
+
+
+def ponto_geography(lat: float, lon: float):
+    """Ponto WGS84 já convertido para geography (a conversão fica do lado da constante)."""
+    return cast(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326), Geography(geometry_type="POINT", srid=4326))
+
+
+def motoristas_proximos_stmt(lat: float, lon: float, raio_m: float):
+    """
+    Motoristas disponíveis a até `raio_m` metros.
+
+    O predicado usa a coluna `current_location_geog` sem cast, para que o
+    índice GiST `ix_users_current_location_geog` seja utilizado.
+    """
+    return select(User.id).where(
+        User.is_active,
+        User.is_available.isnot(False),
+        User.role == 'driver',
+        func.ST_DWithin(User.current_location_geog, ponto_geography(lat, lon), raio_m),
+    )
+
+
+def motoristas_mais_proximos_stmt(lat: float, lon: float, k: int, raio_m: float):
+    """
+    Os `k` motoristas disponíveis mais próximos, com a distância em metros.
+
+    O ORDER BY com `<->` sobre `current_location_geog` é resolvido pelo índice
+    GiST (KNN), que devolve as linhas já em ordem e para após `k` linhas.
+    """
+    ponto = ponto_geography(lat, lon)
+    return (
+        select(User.id, func.ST_Distance(User.current_location_geog, ponto).label('distancia_m'))
+        .where(
+            User.is_active,
+            User.is_available.isnot(False),
+            User.role == 'driver',
+            func.ST_DWithin(User.current_location_geog, ponto, raio_m),
+        )
+        .order_by(User.current_location_geog.op('<->')(ponto))
+        .limit(k)
+    )
 
 
 class Localizacao(BaseModel):
@@ -81,48 +106,115 @@ class Localizacao(BaseModel):
 @router.post("/cotar")
 async def cotar_corrida(
     *,
+    request: Request,
     session: AsyncSessionDep,
     localizacao: Localizacao,
 ) -> Any:
     """
     Busca motoristas próximos usando coordenadas geográficas.
     """
-    # Criar ponto de referência a partir das coordenadas de início
-    ref_point = func.ST_SetSRID(func.ST_MakePoint(localizacao.lat_ini, localizacao.lon_ini), 4326)
-
-    # Query para buscar motoristas próximos (dentro de 10km)
-    statement = select(User.id).where(
-        User.is_active,  # Apenas usuários ativos
-        func.ST_DWithin(
-            cast(User.current_location, Geography(geometry_type="POINT", srid=4326)),
-            cast(ref_point, Geography(geometry_type="POINT", srid=4326)),
-            10000,  # 10 km em metros
-        ),
+    # Oferta e demanda vêm dos contadores por zona, sem consulta espacial por cotação.
+    lat, lon = localizacao.lat_ini, localizacao.lon_ini
+    # passageiro identificado pelo token (ou IP), como no limite de taxa
+    painel_demanda.registrar_cotacao(lat, lon, chave_do_cliente(request.scope))
+    passageiros_ativos = painel_demanda.passageiros_ativos(lat, lon)
+    recusas_motoristas = painel_demanda.recusas_motoristas(lat, lon)
+
+    # Distância e duração calculadas no servidor; os valores do cliente só
+    # entram como piso validado quando não há grafo viário para o trajeto.
+    # A busca no grafo roda numa thread para não bloquear o loop (como `/eta/matriz`).
+    distancia_km, duracao_min = await asyncio.to_thread(
+        servico_rotas.trajeto,
+        lat, lon, localizacao.lat_fim, localizacao.lon_fim, localizacao.distancia, localizacao.duracao,
     )
 
-    results = (await session.execute(statement)).all()
-
-    # Parâmetros para cálculo de preço
-    distancia_km = localizacao.distancia or 0
-    duracao_min = localizacao.duracao or 0
-    passageiros_ativos = 50  # Valor padrão
-    motoristas_disponiveis = len(results)
-    tempo_espera_min = 5.0  # Valor padrão
-
-    # Calcular preços para diferentes tipos de veículo
-    for x in fake_categorias:
-        # x['icone'] = /x['icone']
-        x['preco'] = calcular_preco(
-            x,
-            distancia_km,
-            duracao_min,
-            passageiros_ativos,
-            motoristas_disponiveis,
-            tempo_espera_min,
-            taxa_combustivel_por_km=6.19,
+    # O índice pode terminar de carregar durante as consultas abaixo; a decisão vale para a cotação toda
+    usar_indice = indice_motoristas.carregado
+    if usar_indice:
+        motoristas_disponiveis = painel_demanda.motoristas_disponiveis(lat, lon)
+        mais_proximos = indice_motoristas.mais_proximos(lat, lon, MOTORISTAS_MAIS_PROXIMOS, RAIO_BUSCA_M)
+    else:
+        # Enquanto o índice do processo ainda não foi carregado, responde pelo banco (GiST)
+        indice_motoristas.aquecer_em_segundo_plano()
+        statement = select(func.count()).select_from(motoristas_proximos_stmt(lat, lon, RAIO_BUSCA_M).subquery())
+        motoristas_disponiveis = (await session.execute(statement)).scalar_one()
+        statement = motoristas_mais_proximos_stmt(lat, lon, MOTORISTAS_MAIS_PROXIMOS, RAIO_BUSCA_M)
+        mais_proximos = (await session.execute(statement)).all()
+
+    # Espera estimada pelo motorista mais próximo (lista já vem ordenada por distância)
+    tempo_espera_min = estimar_tempo_chegada_min(mais_proximos[0][1]) if mais_proximos else None
+    tempo_espera_preco = tempo_espera_min if tempo_espera_min is not None else TEMPO_ESPERA_PADRAO_MIN
+
+    chave = None
+    if usar_indice:
+        # Cotações iguais (mesmas células, faixas e preço dinâmico) na mesma janela de
+        # tempo reaproveitam os preços. O multiplicador da chave já inclui o ajuste pela
+        # espera real, então é o mesmo com que o preço é calculado abaixo.
+        zona_origem = zona(lat, lon)
+        multiplicador = calcular_multiplicador(
+            passageiros_ativos, motoristas_disponiveis, tempo_espera_preco, recusas_motoristas
         )
+        cache_cotacoes.observar_multiplicador(zona_origem, multiplicador)
+        chave = chave_cotacao(
+            lat, lon, localizacao.lat_fim, localizacao.lon_fim, distancia_km, duracao_min, multiplicador
+        )
+        cotacao = cache_cotacoes.obter(chave)
+        if cotacao is not None:
+            # a espera exibida é sempre a deste passageiro, não a de quem gerou a entrada
+            return [{**categoria, 'tempo_espera_min': tempo_espera_min} for categoria in cotacao]
+
+    # Calcular preços para todos os tipos de veículo numa única passada vetorizada,
+    # com a tabela de tarifas em memória (snapshot imutável, sem acesso ao banco)
+    tabela = catalogo_tarifas.atual()
+    precos = tabela.motor.cotar(
+        distancia_km,
+        duracao_min,
+        passageiros_ativos,
+        motoristas_disponiveis,
+        tempo_espera_preco,
+        recusas_motoristas,
+        taxa_combustivel_por_km=6.19,
+    )
+    cotacao = [
+        {**asdict(categoria), 'preco': preco, 'tempo_espera_min': tempo_espera_min}
+        for categoria, preco in zip(tabela.categorias, precos)
+    ]
+    if chave is not None:
+        cache_cotacoes.guardar(chave, zona_origem, tuple(cotacao))
+    return cotacao
+
+
+@router.get("/cache/metricas", dependencies=[Depends(get_current_active_superuser)])
+async def metricas_cache_cotacoes() -> Any:
+    """Acertos/falhas do cache de cotações, para ajuste de tamanho e faixas."""
+    return cache_cotacoes.metricas()
+
+
+class Ponto(BaseModel):
+    lat: float
+    lon: float
+
+
+class PedidoMatrizEta(BaseModel):
+    origens: list[Ponto] = Field(max_length=MAXIMO_PONTOS_MATRIZ_ETA)
+    destinos: list[Ponto] = Field(max_length=MAXIMO_PONTOS_MATRIZ_ETA)
+
 
-    return fake_categorias
+@router.post("/eta/matriz", dependencies=[Depends(get_current_active_superuser)])
+async def matriz_eta(pedido: PedidoMatrizEta) -> Any:
+    """
+    ETA (min) e distância (km) de cada origem a cada destino, em matrizes N×M.
+
+    Uso interno (despacho/diagnóstico); roda numa thread para não bloquear o loop.
+    """
+    matriz = await asyncio.to_thread(
+        calcular_matriz_eta,
+        [p.lat for p in pedido.origens],
+        [p.lon for p in pedido.origens],
+        [p.lat for p in pedido.destinos],
+        [p.lon for p in pedido.destinos],
+    )
+    return matriz.como_listas()
 
 
 class ConfirmarCorrida(BaseModel):
@@ -137,66 +229,168 @@ class ConfirmarCorrida(BaseModel):
     veiculo_id: uuid.UUID
 
 
-# @router.post("/reservar-corrida")
-# async def reservar_corrida(
-#     *,
-#     session: AsyncSessionDep,
-#     localizacao: Localizacao,
-# ) -> Any:
+class Reserva(BaseModel):
+    id: uuid.UUID  # categoria escolhida na cotação
+    # embarque obrigatório: sem ele a corrida não entra no despacho e prenderia o passageiro
+    lat_ini: float
+    lon_ini: float
+    lat_fim: float | None = None
+    lon_fim: float | None = None
+    endereco_inicio: str | None = None
+    endereco_fim: str | None = None
 
-#     ref_point = func.ST_SetSRID(func.ST_MakePoint(localizacao.lat_ini, localizacao.lon_ini), 4326)
-#     # Query para buscar motoristas próximos (dentro de 10km)
-#     statement = select(User.id).where(
-#         User.is_active,  # Apenas usuários ativos
-#         func.ST_DWithin(
-#             cast(User.current_location, Geography(geometry_type="POINT", srid=4326)),
-#             cast(ref_point, Geography(geometry_type="POINT", srid=4326)),
-#             10000,  # 10 km em metros
-#         ),
-#     )
-#     return {}
 
+# Restrições de `corridas` que uma reserva pode violar (a FK tem o nome padrão do Postgres)
+UQ_PASSAGEIRO_ATIVA = "uq_corridas_passageiro_ativa"
+FK_CATEGORIA = "corridas_categoria_id_fkey"
 
-class Reserva(BaseModel):
-    id: uuid.UUID
+
+def restricao_violada(ex: IntegrityError) -> str | None:
+    """Nome da restrição que o Postgres acusou no erro de integridade."""
+    diag = getattr(ex.orig, "diag", None)
+    return getattr(diag, "constraint_name", None)
+
+
+def corrida_ativa_stmt(coluna, usuario_id: int, estados=ESTADOS_ATIVOS):
+    """Corrida ativa do passageiro/motorista; o filtro de status casa com os índices parciais."""
+    return select(Corrida).where(coluna == usuario_id, Corrida.status.in_(estados))
+
+
+async def mudar_status(session, corrida: Corrida, novo: StatusCorrida) -> None:
+    """Aplica a transição e grava; conflitos de estado ou de versão viram 409."""
+    try:
+        corrida.transicionar(novo)
+        await session.commit()
+    except TransicaoInvalida as ex:
+        raise HTTPException(status_code=409, detail=str(ex))
+    except StaleDataError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="A corrida foi alterada por outra requisição; consulte e tente novamente")
 
 
 @router.post("/reservar")
-async def reservar_corrida(*, session: AsyncSessionDep, current_user: CurrentUser, dados: Reserva) -> Any:
-    current_user.status_corrida = 'aguardando'
-    await session.commit()
-    return {}
+async def reservar_corrida(*, session: AsyncSessionDep, current_user: CurrentPrincipal, dados: Reserva) -> Any:
+    corrida = Corrida(
+        passageiro_id=current_user.id,
+        categoria_id=dados.id,
+        status=StatusCorrida.AGUARDANDO,
+        lat_ini=dados.lat_ini,
+        lon_ini=dados.lon_ini,
+        lat_fim=dados.lat_fim,
+        lon_fim=dados.lon_fim,
+        endereco_inicio=dados.endereco_inicio,
+        endereco_fim=dados.endereco_fim,
+        created_by=current_user.id,
+    )
+    session.add(corrida)
+    try:
+        await session.commit()
+    except IntegrityError as ex:
+        await session.rollback()
+        restricao = restricao_violada(ex)
+        if restricao == UQ_PASSAGEIRO_ATIVA:
+            raise HTTPException(status_code=409, detail="Já existe uma corrida em andamento para este passageiro")
+        if restricao == FK_CATEGORIA:
+            raise HTTPException(status_code=422, detail="Categoria de corrida inexistente")
+        raise
+    painel_demanda.registrar_reserva(dados.lat_ini, dados.lon_ini, f"u:{current_user.id}")
+    despachante.enfileirar(corrida.id, current_user.id, dados.lat_ini, dados.lon_ini)
+    pubsub_usuarios.publicar(current_user.id, corrida.estado())
+    return corrida.estado()
 
 
 @router.post("/cancelar")
-async def cancelar_corrida(*, session: AsyncSessionDep, current_user: CurrentUser) -> Any:
-    current_user.status_corrida = 'cancelar'
-    await session.commit()
-    return {}
+async def cancelar_corrida(*, session: AsyncSessionDep, current_user: CurrentPrincipal) -> Any:
+    corrida = (await session.execute(corrida_ativa_stmt(Corrida.passageiro_id, current_user.id))).scalar_one_or_none()
+    if corrida is None:
+        raise HTTPException(status_code=404, detail="Nenhuma corrida em andamento")
+    motorista_id = corrida.motorista_id
+    if motorista_id is not None:
+        await session.execute(update(User).where(User.id == motorista_id).values(is_available=True))
+    await mudar_status(session, corrida, StatusCorrida.CANCELADA)
+    despachante.remover(corrida.id)
+    if motorista_id is not None:
+        indice_motoristas.liberar(motorista_id)
+    pubsub_usuarios.publicar(current_user.id, corrida.estado())
+    return corrida.estado()
 
 
 @router.get("/consultar")
-async def consultar_corrida(*, session: AsyncSessionDep, current_user: CurrentUser) -> Any:
-    # current_user.status_corrida = 'aguardando'
-    retorno_exemplo = {
-        'foto_motorista': 'url',
-        'nome_motorista': 'Fulano de Tal',
-        'placa_veiculo': 'ABC-1234',
-        'modelo_veiculo': 'Toyota Corolla',
-        'tempo_chegada_min': 5,
-        'cor_veiculo': 'Prata',
-    }
-    return retorno_exemplo
+async def consultar_corrida(*, session: AsyncSessionDep, current_user: CurrentPrincipal) -> Any:
+    corrida = (await session.execute(corrida_ativa_stmt(Corrida.passageiro_id, current_user.id))).scalar_one_or_none()
+    if corrida is None:
+        return {'corrida_id': None, 'status': None, 'motorista_id': None, 'tempo_chegada_min': None}
+    return corrida.estado()
+
+
+def evento_sse(evento: dict) -> str:
+    return f"event: corrida\ndata: {json.dumps(evento)}\n\n"
+
+
+@router.get("/consultar/stream")
+async def consultar_corrida_stream(request: Request, token: TokenDep) -> StreamingResponse:
+    """
+    Server-Sent Events com o estado da corrida do usuário (e, para motoristas, as ofertas).
+
+    Envia o estado atual ao conectar e depois só quando ele muda (reserva,
+    atribuição de motorista, cancelamento), em vez de o app consultar
+    `/consultar` em laço. O token é validado uma vez; a inscrição no canal vem
+    antes da leitura do estado e a sessão do banco é liberada logo em seguida.
+    """
+    user = await get_principal_from_token(token)
+    if user.role == 'driver':
+        # motoristas recebem pelo mesmo canal as ofertas e o estado da corrida em que estão
+        statement = corrida_ativa_stmt(Corrida.motorista_id, user.id, ESTADOS_COM_MOTORISTA)
+    else:
+        statement = corrida_ativa_stmt(Corrida.passageiro_id, user.id)
+    usuario_id = user.id
+
+    async def eventos():
+        # assina antes de ler o estado: o que for publicado durante a leitura fica na fila
+        async with pubsub_usuarios.assinar(usuario_id) as fila:
+            async with async_session() as session:
+                corrida = (await session.execute(statement)).scalar_one_or_none()
+            yield evento_sse(corrida.estado() if corrida is not None else {'corrida_id': None, 'status': None})
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(fila.get(), INTERVALO_KEEPALIVE_SSE_S)
+                except asyncio.TimeoutError:
+                    # comentário SSE: mantém proxies e o app cientes de que a conexão está viva
+                    yield ": keep-alive\n\n"
+                    continue
+                yield evento_sse(evento)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.post("/iniciar")
+async def iniciar_corrida(*, session: AsyncSessionDep, current_user: CurrentPrincipal) -> Any:
+    """Motorista embarcou o passageiro."""
+    corrida = (
+        await session.execute(corrida_ativa_stmt(Corrida.motorista_id, current_user.id, ESTADOS_COM_MOTORISTA))
+    ).scalar_one_or_none()
+    if corrida is None:
+        raise HTTPException(status_code=404, detail="Nenhuma corrida em andamento")
+    await mudar_status(session, corrida, StatusCorrida.EM_ANDAMENTO)
+    pubsub_usuarios.publicar(corrida.passageiro_id, corrida.estado())
+    return corrida.estado()
+
 
 @router.post("/finalizar")
 async def finalizar_corrida(*, session: AsyncSessionDep, current_user: CurrentUser) -> Any:
-    # current_user.status_corrida = 'aguardando'
-    retorno_exemplo = {
-        'foto_motorista': 'url',
-        'nome_motorista': 'Fulano de Tal',
-        'placa_veiculo': 'ABC-1234',
-        'modelo_veiculo': 'Toyota Corolla',
-        'tempo_chegada_min': 5,
-        'cor_veiculo': 'Prata',
-    }
-    return retorno_exemplo
+    """Motorista encerrou a corrida e volta a ficar disponível."""
+    corrida = (
+        await session.execute(corrida_ativa_stmt(Corrida.motorista_id, current_user.id, ESTADOS_COM_MOTORISTA))
+    ).scalar_one_or_none()
+    if corrida is None:
+        raise HTTPException(status_code=404, detail="Nenhuma corrida em andamento")
+    current_user.is_available = True
+    await mudar_status(session, corrida, StatusCorrida.FINALIZADA)
+    despachante.remover(corrida.id)
+    indice_motoristas.liberar(current_user.id)
+    pubsub_usuarios.publicar(corrida.passageiro_id, corrida.estado())
+    return corrida.estado()
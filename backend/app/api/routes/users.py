@@ -3,7 +3,6 @@ import uuid
 from datetime import date, datetime
 from typing import Any
 
-import jwt
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, ConfigDict, Field, model_serializer
 from sqlmodel import col, delete, func, select
@@ -12,10 +11,11 @@ from app import crud
 from app.api.deps import (
     AsyncSessionDep,
     CurrentUser,
+    claims_supabase,
     get_current_active_superuser,
 )
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
+from app.services.senhas import servico_senhas
 from app.users.models.users import (
     Message,
     UpdatePassword,
@@ -36,18 +36,18 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic)
-def create_user(*, session: AsyncSessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: AsyncSessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, user_create=user_in)
+    user = await crud.create_user(session=session, user_create=user_in)
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
@@ -102,18 +102,18 @@ async def update_user_me(*, session: AsyncSessionDep, user_in: PatchUser, curren
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(*, session: AsyncSessionDep, body: UpdatePassword, current_user: CurrentUser) -> Any:
+async def update_password_me(*, session: AsyncSessionDep, body: UpdatePassword, current_user: CurrentUser) -> Any:
     """
     Update own password.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    if not await servico_senhas.verificar(body.current_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(status_code=400, detail="New password cannot be the same as the current one")
-    hashed_password = get_password_hash(body.new_password)
+    hashed_password = await servico_senhas.gerar_hash(body.new_password)
     current_user.hashed_password = hashed_password
     session.add(current_user)
-    session.commit()
+    await session.commit()
     return Message(message="Password updated successfully")
 
 
@@ -157,18 +157,18 @@ def delete_user_me(session: AsyncSessionDep, current_user: CurrentUser) -> Any:
 
 
 @router.post("/signup", response_model=UserPublic)
-def register_user(session: AsyncSessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: AsyncSessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
+    user = await crud.create_user(session=session, user_create=user_create)
     return user
 
 
@@ -193,7 +193,7 @@ def read_user_by_id(user_id: uuid.UUID, session: AsyncSessionDep, current_user:
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(
+async def update_user(
     *,
     session: AsyncSessionDep,
     user_id: uuid.UUID,
@@ -203,18 +203,18 @@ def update_user(
     Update a user.
     """
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email(session=session, email=user_in.email)
         if existing_user and existing_user.id != user_id:
             raise HTTPException(status_code=409, detail="User with this email already exists")
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    db_user = await crud.update_user(session=session, db_user=db_user, user_in=user_in)
     return db_user
 
 
@@ -225,7 +225,7 @@ class NewAcount(BaseModel):
 
 @router.post("/new_account", summary="Create a new account for passenger")
 async def criar_conta(payload: NewAcount, session: AsyncSessionDep):
-    decoded_payload = jwt.decode(payload.token, options={"verify_signature": False})
+    decoded_payload = claims_supabase(payload.token)
     u = User(
         id=decoded_payload['sub'],
         email=decoded_payload['email'],
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.services.admissao import controle_admissao
+from app.services.senhas import servico_senhas
 from app.users.models.users import Message
 from app.utils import generate_test_email, send_email
 
@@ -29,3 +31,15 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get("/metricas/senhas", dependencies=[Depends(get_current_active_superuser)])
+async def metricas_senhas() -> dict:
+    """Fila e tempos do pool de hash de senhas."""
+    return servico_senhas.metricas()
+
+
+@router.get("/metricas/admissao", dependencies=[Depends(get_current_active_superuser)])
+async def metricas_admissao() -> dict:
+    """Conexões do pool em uso e requisições em andamento/recusadas por prioridade."""
+    return controle_admissao.metricas()
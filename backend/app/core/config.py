@@ -65,6 +65,11 @@ class Settings(BaseSettings):
     BUKCET_ABRASILEIRAR: str = ''
     SUPABASE_URL: str = ''
     SUPABASE_KEY: str = ''
+    # Verificação local dos tokens do Supabase Auth: segredo HS256 do projeto e/ou
+    # arquivo JWKS com as chaves públicas (ES256/RS256), sem chamada ao Supabase
+    SUPABASE_JWT_SECRET: str = ''
+    SUPABASE_JWKS_PATH: str = ''
+    SUPABASE_JWT_AUDIENCE: str = 'authenticated'
     START_TIME:datetime.time = datetime.time(6, 0)
     END_TIME:datetime.time  = datetime.time(23, 59)
     WORK_DAYS :list[int]= [
@@ -77,6 +82,70 @@ class Settings(BaseSettings):
     ]
     DISPONIBILIDADE_JANELA:datetime.timedelta = datetime.timedelta(15)
 
+    # Intervalo de gravação em lote das posições dos motoristas
+    LOCALIZACAO_INTERVALO_FLUSH_S: float = 2.0
+    # Intervalo mínimo entre posições aceitas de uma mesma conexão WebSocket. Abaixo do
+    # período do app (~1 s): um ping adiantado pelo jitter da rede não é retido
+    LOCALIZACAO_WS_INTERVALO_MIN_S: float = 0.8
+    # Índice de motoristas em memória: sem ping há mais que o TTL o motorista deixa de ser
+    # candidato; a cada intervalo o índice é ressincronizado com as posições gravadas no banco
+    INDICE_MOTORISTAS_TTL_S: float = 60.0
+    INDICE_MOTORISTAS_RESSINCRONIZAR_S: float = 5.0
+    # Validade da tabela de tarifas em memória antes de recarregar do banco
+    TARIFAS_TTL_S: float = 60.0
+    # Cache de cotações: número máximo de entradas e duração de cada janela
+    COTACAO_CACHE_CAPACIDADE: int = 10000
+    COTACAO_CACHE_JANELA_S: int = 30
+    # Grafo viário pré-processado (scripts/construir_grafo_viario.py); vazio desativa o roteamento
+    ROTAS_GRAFO_PATH: str = ''
+    # Despacho em lote: intervalo entre rodadas e ETA máximo aceito para atribuir um motorista
+    DESPACHO_INTERVALO_S: float = 3.0
+    DESPACHO_ETA_MAXIMO_MIN: float = 20.0
+    # Prazo para o motorista aceitar uma oferta antes de ela passar ao próximo candidato
+    OFERTA_TIMEOUT_S: float = 15.0
+    # Respostas guardadas por Idempotency-Key nas mutações de corrida: validade e número máximo
+    IDEMPOTENCIA_TTL_S: float = 86400.0
+    IDEMPOTENCIA_CAPACIDADE: int = 50000
+    # Validade da reserva de uma chave enquanto a primeira requisição executa, e intervalo
+    # de limpeza das chaves vencidas no banco
+    IDEMPOTENCIA_PRAZO_EXECUCAO_S: float = 60.0
+    IDEMPOTENCIA_LIMPEZA_S: float = 3600.0
+    # Cache do usuário autenticado: validade máxima de uma entrada e número máximo de usuários
+    PRINCIPAL_CACHE_TTL_S: float = 60.0
+    PRINCIPAL_CACHE_CAPACIDADE: int = 20000
+    # Custo do bcrypt (hashes com outro custo são refeitos no login), threads do pool de senhas
+    # e quantas operações podem esperar por uma thread antes de o login responder 503
+    BCRYPT_ROUNDS: int = 12
+    SENHAS_MAX_THREADS: int = 2
+    SENHAS_FILA_MAXIMA: int = 32
+    # Processos do servidor (lido também pelo uvicorn quando `--workers` é omitido). Os
+    # contadores de demanda são por processo e são escalados por este número
+    WEB_CONCURRENCY: int = 1
+    # Pool de conexões do banco por worker e controle de admissão: requisições não críticas
+    # em andamento acima de ADMISSAO_EM_VOO_POR_CONEXAO × conexões do pool recebem 503 em vez
+    # de esperar pelo pool (com o pool todo em uso, já acima de uma por conexão)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 1
+    DB_POOL_TIMEOUT_S: float = 20.0
+    ADMISSAO_EM_VOO_POR_CONEXAO: int = 2
+    ADMISSAO_RETRY_AFTER_S: int = 2
+    # Limite de requisições por usuário (ou IP, sem token) em cada grupo de rotas:
+    # (requisições por segundo, rajada máxima). Em variável de ambiente, como JSON.
+    # Os baldes são por processo: o orçamento vale para cada um dos WEB_CONCURRENCY workers,
+    # e um cliente que alterna conexões entre workers pode chegar a N vezes o valor. Não é
+    # dividido por N porque uma conexão keep-alive fica presa a um único worker.
+    LIMITE_TAXA: dict[str, tuple[float, int]] = {
+        'corrida': (5.0, 20),
+        'driver': (5.0, 30),
+        'login': (0.5, 10),
+    }
+    # Proxies/balanceadores (IPs ou redes CIDR) cujo X-Forwarded-For é aceito para identificar
+    # o cliente no limite de taxa e na idempotência. Vazio: vale o endereço da conexão, e atrás
+    # de um proxy todos os clientes sem token dividem o mesmo balde.
+    PROXIES_CONFIAVEIS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    # Máximo de tratadores de NOTIFY rodando ao mesmo tempo por processo
+    EVENTOS_MAX_CONCORRENCIA: int = 100
+
     # Google OAuth2
     GOOGLE_CLIENT_ID: str = ''
     GOOGLE_CLIENT_SECRET: str = ''
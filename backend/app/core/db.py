@@ -6,6 +6,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session, create_engine, select
 
 from app.core.config import settings
+from app.core.security import get_password_hash
 from app.users.models.users import User, UserCreate
 
 
@@ -15,13 +16,13 @@ def my_seralize(value):
 
 engine_async = create_async_engine(
     str(settings.SQLALCHEMY_DATABASE_URI),
-    pool_size=5,
-    max_overflow=1,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     json_serializer=my_seralize,
     connect_args={
         "connect_timeout": 10,
     },
-    pool_timeout=20,
+    pool_timeout=settings.DB_POOL_TIMEOUT_S,
     pool_recycle=1800,
     pool_pre_ping=True,
     # echo=True,  # Set to False in production
@@ -58,4 +59,7 @@ def init_db(session: Session) -> None:
             password=settings.FIRST_SUPERUSER_PASSWORD,
             is_superuser=True,
         )
-        user = crud.create_user(session=session, user_create=user_in)
+        # script de carga inicial, síncrono: gera o hash direto, sem o pool de threads do serviço
+        user = User(**user_in.model_dump(exclude={"password"}), hashed_password=get_password_hash(user_in.password))
+        session.add(user)
+        session.commit()
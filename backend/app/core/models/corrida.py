@@ -1,20 +1,174 @@
-from sqlmodel import Field, Relationship
+from enum import Enum
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Uuid, and_, text, update
+from sqlalchemy import Enum as SAEnum
+
 from app.core.models.core import Log
+from app.datetime_utils import get_utc_now
+
+
+class StatusCorrida(str, Enum):
+    AGUARDANDO = 'aguardando'  # reservada, na fila do despacho
+    ATRIBUIDA = 'atribuida'  # despacho escolheu um motorista, aguardando o aceite
+    ACEITA = 'aceita'  # motorista a caminho do embarque
+    EM_ANDAMENTO = 'em_andamento'
+    FINALIZADA = 'finalizada'
+    CANCELADA = 'cancelada'
+    SEM_MOTORISTA = 'sem_motorista'
+
+
+TRANSICOES: dict[StatusCorrida, frozenset[StatusCorrida]] = {
+    StatusCorrida.AGUARDANDO: frozenset({StatusCorrida.ATRIBUIDA, StatusCorrida.CANCELADA, StatusCorrida.SEM_MOTORISTA}),
+    # motorista recusou ou não respondeu: a corrida volta para a fila
+    StatusCorrida.ATRIBUIDA: frozenset({StatusCorrida.ACEITA, StatusCorrida.AGUARDANDO, StatusCorrida.CANCELADA}),
+    StatusCorrida.ACEITA: frozenset({StatusCorrida.EM_ANDAMENTO, StatusCorrida.CANCELADA}),
+    StatusCorrida.EM_ANDAMENTO: frozenset({StatusCorrida.FINALIZADA}),
+    StatusCorrida.FINALIZADA: frozenset(),
+    StatusCorrida.CANCELADA: frozenset(),
+    StatusCorrida.SEM_MOTORISTA: frozenset(),
+}
+
+ESTADOS_ATIVOS = (StatusCorrida.AGUARDANDO, StatusCorrida.ATRIBUIDA, StatusCorrida.ACEITA, StatusCorrida.EM_ANDAMENTO)
+ESTADOS_COM_MOTORISTA = (StatusCorrida.ATRIBUIDA, StatusCorrida.ACEITA, StatusCorrida.EM_ANDAMENTO)
+
+# coluna de data preenchida ao entrar em cada estado
+DATA_DO_ESTADO = {
+    StatusCorrida.ATRIBUIDA: 'atribuida_em',
+    StatusCorrida.ACEITA: 'aceita_em',
+    StatusCorrida.EM_ANDAMENTO: 'iniciada_em',
+    StatusCorrida.FINALIZADA: 'finalizada_em',
+    StatusCorrida.CANCELADA: 'cancelada_em',
+    StatusCorrida.SEM_MOTORISTA: 'cancelada_em',
+}
+
+
+def _em(estados) -> str:
+    return "status IN (%s)" % ", ".join(f"'{e.value}'" for e in estados)
+
+
+class TransicaoInvalida(ValueError):
+    def __init__(self, atual: StatusCorrida, novo: StatusCorrida):
+        super().__init__(f"Transição de corrida inválida: {atual.value} -> {novo.value}")
+        self.atual = atual
+        self.novo = novo
+
+
+class Corrida(Log):
+    """
+    Corrida, do pedido do passageiro até a finalização.
+
+    O status só muda por `transicionar` (ou `transicao_stmt`, em lote), que
+    valida a transição contra `TRANSICOES`. `versao` é o contador de
+    concorrência otimista do SQLAlchemy: um UPDATE feito sobre uma versão
+    desatualizada da linha falha com `StaleDataError` em vez de sobrescrever
+    a mudança de outra requisição. Cada inserção ou mudança de status dispara,
+    por trigger, o NOTIFY `corridas`, que chega às conexões SSE de todos os
+    workers (`app.services.pubsub.ao_notificar_corrida`).
+    """
+
+    __tablename__ = "corridas"
+    __table_args__ = (
+        # Índices parciais só com as corridas ativas: continuam pequenos quando o
+        # histórico chega a milhões de linhas, e os únicos garantem no máximo uma
+        # corrida ativa por passageiro e por motorista.
+        Index(
+            "uq_corridas_passageiro_ativa",
+            "passageiro_id",
+            unique=True,
+            postgresql_where=text(_em(ESTADOS_ATIVOS)),
+            postgresql_include=["id", "status", "motorista_id"],
+        ),
+        Index(
+            "uq_corridas_motorista_ativa",
+            "motorista_id",
+            unique=True,
+            postgresql_where=text(_em(ESTADOS_COM_MOTORISTA)),
+            postgresql_include=["id", "status", "passageiro_id"],
+        ),
+        Index(
+            "ix_corridas_aguardando",
+            "created_at",
+            postgresql_where=text(_em((StatusCorrida.AGUARDANDO,))),
+            postgresql_include=["id", "passageiro_id", "lat_ini", "lon_ini"],
+        ),
+        {"schema": None},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    passageiro_id = Column(Integer, ForeignKey("users.id", ondelete='RESTRICT'), nullable=False)
+    motorista_id = Column(Integer, ForeignKey("users.id", ondelete='SET NULL'), nullable=True)
+    categoria_id = Column(Uuid, ForeignKey("categorias_corridas.id", ondelete='SET NULL'), nullable=True)
+    status = Column(
+        SAEnum(
+            StatusCorrida,
+            name="ck_corridas_status",
+            native_enum=False,
+            create_constraint=True,
+            length=20,
+            values_callable=lambda enum: [e.value for e in enum],
+        ),
+        default=StatusCorrida.AGUARDANDO,
+        nullable=False,
+    )
+    versao = Column(Integer, nullable=False)
+
+    lat_ini = Column(Float, nullable=True)
+    lon_ini = Column(Float, nullable=True)
+    lat_fim = Column(Float, nullable=True)
+    lon_fim = Column(Float, nullable=True)
+    endereco_inicio = Column(String(500), nullable=True)
+    endereco_fim = Column(String(500), nullable=True)
+    distancia_km = Column(Float, nullable=True)
+    duracao_min = Column(Float, nullable=True)
+    preco = Column(Float, nullable=True)
+    versao_tarifa = Column(Integer, nullable=True)
+    tempo_chegada_min = Column(Float, nullable=True)
+
+    atribuida_em = Column(DateTime(timezone=True), nullable=True)
+    aceita_em = Column(DateTime(timezone=True), nullable=True)
+    iniciada_em = Column(DateTime(timezone=True), nullable=True)
+    finalizada_em = Column(DateTime(timezone=True), nullable=True)
+    cancelada_em = Column(DateTime(timezone=True), nullable=True)
 
+    __mapper_args__ = {"version_id_col": versao}
 
-class Corrida(Log, table=True):
-    __tablename__: str = "corridas"  # type: ignore
-    id: int = Field(primary_key=True, sa_column_kwargs={'autoincrement': True})
-    # passageiro
-    # motorista
-    # origem=
-    # destino=
-    # preco=
-    # placa=
-    # veiculo_cp
-    # forma_pagamento
+    def pode_transicionar(self, novo: StatusCorrida) -> bool:
+        return novo in TRANSICOES[self.status]
 
+    def transicionar(self, novo: StatusCorrida) -> None:
+        if not self.pode_transicionar(novo):
+            raise TransicaoInvalida(self.status, novo)
+        self.status = novo
+        self.updated_at = get_utc_now()
+        if novo in DATA_DO_ESTADO:
+            setattr(self, DATA_DO_ESTADO[novo], self.updated_at)
 
+    def estado(self) -> dict:
+        """Resumo enviado ao passageiro (consulta e SSE)."""
+        return {
+            'corrida_id': self.id,
+            'status': self.status.value,
+            'motorista_id': self.motorista_id,
+            'tempo_chegada_min': self.tempo_chegada_min,
+        }
 
 
+def transicao_stmt(corrida_id: int, atual: StatusCorrida, novo: StatusCorrida, **valores):
+    """
+    UPDATE condicional (compare-and-set) para transições fora do ORM, ex.: o despacho em lote.
 
+    Só altera a linha se ela ainda estiver em `atual`; com `.returning(Corrida.id)`
+    uma lista vazia indica que outra requisição mudou a corrida antes.
+    """
+    if novo not in TRANSICOES[atual]:
+        raise TransicaoInvalida(atual, novo)
+    agora = get_utc_now()
+    if novo in DATA_DO_ESTADO:
+        valores.setdefault(DATA_DO_ESTADO[novo], agora)
+    return (
+        update(Corrida)
+        .where(and_(Corrida.id == corrida_id, Corrida.status == atual))
+        .values(status=novo, versao=Corrida.versao + 1, updated_at=agora, **valores)
+        .returning(Corrida.id)
+        .execution_options(synchronize_session=False)
+    )
@@ -1,20 +1,49 @@
-from sqlmodel import Field, Relationship
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint, Uuid
+
 from app.core.models.core import Log
+from app.datetime_utils import get_utc_now
+
+
+class CategoriaCorrida(Log):
+    __tablename__ = "categorias_corridas"
+    __table_args__ = {"schema": None}
+
+    id = Column(Uuid, primary_key=True)
+    nome = Column(String(100), nullable=False)
+    descricao = Column(String(255), nullable=True)
+    icone = Column(String(255), nullable=True)
+    ordem = Column(Integer, default=0, nullable=False)
+
+
+class TarifaCategoria(Log):
+    """
+    Tarifa de uma categoria de corrida, versionada.
 
+    Alterar preço é inserir uma nova versão; a vigente é a de maior `versao`
+    com `vigente_desde` já alcançado. Versões antigas ficam como histórico.
+    """
 
-class CategoriaCorrida(Log, table=True):
-    __tablename__: str = "categorias_corridas"  # type: ignore
-    id: int = Field(primary_key=True, sa_column_kwargs={'autoincrement': False})
-    nome: str = Field(max_length=100, nullable=False)
-    descricao: str | None = Field(default=None, max_length=255)
-    icone: str | None = Field(default=None, max_length=255)
+    __tablename__ = "tarifas_categorias"
+    __table_args__ = (
+        UniqueConstraint("categoria_id", "versao", name="uq_tarifas_categorias_categoria_versao"),
+        {"schema": None},
+    )
 
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    categoria_id = Column(Uuid, ForeignKey("categorias_corridas.id", ondelete='CASCADE'), nullable=False)
+    versao = Column(Integer, nullable=False)
+    tarifa_base = Column(Float, nullable=False)
+    custo_por_km = Column(Float, nullable=False)
+    custo_por_minuto = Column(Float, nullable=False)
+    tarifa_minima = Column(Float, nullable=False)
+    vigente_desde = Column(DateTime(timezone=True), default=get_utc_now, nullable=False)
 
-class CategoriaVeiculo(Log, table=True):
-    __tablename__: str = "categorias_veiculo"  # type: ignore
-    id: int = Field(primary_key=True, sa_column_kwargs={'autoincrement': False})
-    nome: str = Field(max_length=100, nullable=False)
-    descricao: str | None = Field(default=None, max_length=255)
-    icone: str | None = Field(default=None, max_length=255)
 
+class CategoriaVeiculo(Log):
+    __tablename__ = "categorias_veiculo"
+    __table_args__ = {"schema": None}
 
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    nome = Column(String(100), nullable=False)
+    descricao = Column(String(255), nullable=True)
+    icone = Column(String(255), nullable=True)
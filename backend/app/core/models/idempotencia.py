@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import Base
+
+
+class ChaveIdempotencia(Base):
+    """
+    Resposta guardada por `Idempotency-Key`, compartilhada entre os workers.
+
+    Enquanto a primeira requisição executa, `status_code` fica nulo e
+    `expira_em` é curto (`IDEMPOTENCIA_PRAZO_EXECUCAO_S`), para que um worker
+    que caiu no meio não prenda a chave; ao concluir, vale `IDEMPOTENCIA_TTL_S`.
+    """
+
+    __tablename__ = "chaves_idempotencia"
+    __table_args__ = {"schema": None}
+
+    # hash de (quem fez a requisição, caminho, chave enviada)
+    chave = Column(LargeBinary, primary_key=True)
+    digest = Column(LargeBinary, nullable=False)  # hash do corpo da requisição original
+    status_code = Column(Integer, nullable=True)
+    headers = Column(JSONB, nullable=True)
+    corpo = Column(LargeBinary, nullable=True)
+    expira_em = Column(DateTime(timezone=True), nullable=False, index=True)
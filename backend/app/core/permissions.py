@@ -1,3 +1,11 @@
+"""
+Permissões do RBAC por papel, recurso e ação.
+
+`PERMISSOES_VERSAO` é uma constante global, embutida em todo token emitido
+(claim `pv`): incrementá-la invalida o RBAC de todas as sessões, de todos os
+papéis, e não só as do papel que mudou. Todos precisam fazer login de novo.
+"""
+
 from enum import Enum
 
 
@@ -18,3 +26,37 @@ Permission = tuple[Role, str, Action]
 
 # Definição das permissões
 permissoes_rbac: set[Permission] = set()
+
+# Vai no token (claim `pv`) junto com o papel. Incremente ao mudar `permissoes_rbac`
+# ou o papel de usuários: tokens emitidos com outra versão deixam de valer no RBAC.
+PERMISSOES_VERSAO = 1
+
+
+class MapaPermissoes:
+    """
+    `permissoes_rbac` pré-compilado: um inteiro por papel, com um bit por (recurso, ação).
+
+    Checar uma permissão é um lookup de dicionário e um AND de bits.
+    """
+
+    def __init__(self, permissoes: set[Permission]):
+        recursos = sorted({recurso for _, recurso, _ in permissoes})
+        self._indice_recurso = {recurso: i for i, recurso in enumerate(recursos)}
+        self._indice_acao = {acao.value: i for i, acao in enumerate(Action)}
+        self._bits: dict[str, int] = {}
+        for papel, recurso, acao in permissoes:
+            chave = papel.value if isinstance(papel, Enum) else papel
+            self._bits[chave] = self._bits.get(chave, 0) | self._bit(recurso, acao.value if isinstance(acao, Enum) else acao)
+
+    def _bit(self, recurso: str, metodo: str) -> int:
+        return 1 << (self._indice_recurso[recurso] * len(self._indice_acao) + self._indice_acao[metodo])
+
+    def permite(self, papel: str | None, recurso: str, metodo: str) -> bool:
+        if papel == Role.ADMIN:
+            return True
+        if papel is None or recurso not in self._indice_recurso or metodo not in self._indice_acao:
+            return False
+        return bool(self._bits.get(papel, 0) & self._bit(recurso, metodo))
+
+
+mapa_permissoes = MapaPermissoes(permissoes_rbac)
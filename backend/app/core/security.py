@@ -5,16 +5,25 @@ import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.permissions import PERMISSOES_VERSAO
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# mínimo = padrão = máximo: `verify_and_update` refaz hashes gerados com outro custo
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 
 ALGORITHM = "HS256"
 
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+def create_access_token(subject: str | Any, expires_delta: timedelta, role: str | None = None) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+    # papel e versão das permissões: o RBAC (deps.ResourceAccess) decide sem ir ao banco
+    to_encode = {"exp": expire, "sub": str(subject), "role": role, "pv": PERMISSOES_VERSAO}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
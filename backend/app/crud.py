@@ -4,29 +4,30 @@ from typing import Any
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.services.senhas import servico_senhas
 from  app.users.models.users  import User, UserCreate, UserUpdate
 
 
-def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
-    db_obj = User.model_validate(user_create, update={"hashed_password": get_password_hash(user_create.password)})
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
+    # bcrypt roda no pool de threads limitado, fora do event loop
+    hashed_password = await servico_senhas.gerar_hash(user_create.password)
+    db_obj = User(**user_create.model_dump(exclude={"password"}), hashed_password=hashed_password)
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
     return db_obj
 
 
-def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpdate) -> Any:
+async def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpdate) -> Any:
     user_data = user_in.model_dump(exclude_unset=True)
-    extra_data = {}
-    if "password" in user_data:
-        password = user_data["password"]
-        hashed_password = get_password_hash(password)
-        extra_data["hashed_password"] = hashed_password
-    db_user.sqlmodel_update(user_data, update=extra_data)
+    password = user_data.pop("password", None)
+    if password is not None:
+        user_data["hashed_password"] = await servico_senhas.gerar_hash(password)
+    for campo, valor in user_data.items():
+        setattr(db_user, campo, valor)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 
@@ -40,6 +41,12 @@ async def authenticate(*, session: AsyncSession, email: str, password: str) -> U
     db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    valida, novo_hash = await servico_senhas.verificar_e_atualizar(password, db_user.hashed_password)
+    if not valida:
         return None
+    if novo_hash is not None:
+        # hash gerado com outro custo do bcrypt: grava o refeito com o custo atual
+        db_user.hashed_password = novo_hash
+        session.add(db_user)
+        await session.commit()
     return db_user
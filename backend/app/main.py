@@ -1,18 +1,33 @@
+import asyncio
+import contextlib
 from pathlib import Path
 
 # import logging
 # logging.basicConfig()
 # logging.getLogger('sqlalchemy.pool').setLevel(logging.DEBUG)
 # logging.getLogger('sqlalchemy.engine').setLevel(logging.DEBUG)
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.admissao import MiddlewareAdmissao
 from app.api.events import add_event_listener
+from app.api.limite_taxa import MiddlewareLimiteTaxa
 from app.api.main import api_router
 from app.core.config import settings
+from app.services.cache_principais import ao_alterar_usuarios, cache_principais
+from app.services.despacho import despachante
+from app.services.idempotencia import armazenamento_idempotencia
+from app.services.indice_motoristas import indice_motoristas
+from app.services.localizacao import buffer_localizacoes
+from app.services.notificacoes import OuvinteNotificacoes
+from app.services.ofertas import agendador_ofertas
+from app.services.pubsub import ao_notificar_corrida
+from app.services.rotas import servico_rotas
+from app.services.senhas import SenhasSobrecarregadas
+from app.services.tarifas import ao_alterar_tarifas, catalogo_tarifas
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -24,12 +39,60 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 
 print(settings.SQLALCHEMY_DATABASE_URI)
 
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    await servico_rotas.carregar()
+    ouvinte = OuvinteNotificacoes()
+    ouvinte.registrar('tarifas_alteradas', ao_alterar_tarifas)
+    # alterações feitas enquanto a conexão estava caída não chegam: recarrega ao (re)conectar
+    ouvinte.ao_conectar(catalogo_tarifas.invalidar)
+    ouvinte.registrar('usuarios_alterados', ao_alterar_usuarios)
+    ouvinte.ao_conectar(cache_principais.limpar)
+    # mudanças de corrida feitas em outros workers chegam às conexões SSE deste
+    ouvinte.registrar('corridas', ao_notificar_corrida)
+    # Tarefas de fundo que vivem junto com o processo da API
+    tarefas = [
+        asyncio.create_task(buffer_localizacoes.executar()),
+        asyncio.create_task(indice_motoristas.executar()),
+        asyncio.create_task(despachante.executar()),
+        asyncio.create_task(agendador_ofertas.executar()),
+        asyncio.create_task(armazenamento_idempotencia.executar()),
+        asyncio.create_task(ouvinte.executar()),
+    ]
+    yield
+    for tarefa in tarefas:
+        tarefa.cancel()
+    for tarefa in tarefas:
+        with contextlib.suppress(asyncio.CancelledError):
+            await tarefa
+    # Grava as últimas posições recebidas antes de encerrar
+    await buffer_localizacoes.descarregar()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
+
+@app.exception_handler(SenhasSobrecarregadas)
+async def senhas_sobrecarregadas(_request: Request, _exc: SenhasSobrecarregadas) -> JSONResponse:
+    """Fila de hash de senhas cheia em qualquer rota (login, cadastro, troca de senha): 503, não 500."""
+    return JSONResponse(
+        {"detail": "Muitas operações de senha simultâneas, tente novamente"},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+# Recusa cedo (503) o tráfego não crítico quando o pool do banco está saturado
+app.add_middleware(MiddlewareAdmissao)
+# Limite de taxa por usuário/IP nas rotas de corrida, motorista e login (antes de abrir sessão no banco)
+app.add_middleware(MiddlewareLimiteTaxa)
+
 # Set all CORS enabled origins
 if settings.all_cors_origins:
     app.add_middleware(
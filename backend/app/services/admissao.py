@@ -0,0 +1,97 @@
+"""
+Controle de admissão: recusa cedo o tráfego menos importante quando o
+banco está saturado, em vez de deixar tudo esperar pelo pool.
+
+Com o pool de cada worker em 5 + 1 conexões, uma rajada faz as requisições
+esperarem até `pool_timeout` e falharem juntas, e os apps repetem tudo. Aqui
+acompanhamos as conexões em uso (eventos `checkout`/`checkin` do pool) e as
+requisições em andamento por prioridade:
+
+- críticas (mudanças de estado da corrida) entram sempre;
+- normais são recusadas com o pool todo em uso e já uma não crítica em
+  andamento por conexão, e sempre acima de `ADMISSAO_EM_VOO_POR_CONEXAO`
+  por conexão do pool;
+- baixas (administração, documentos, métricas) são recusadas já com o pool
+  todo em uso ou com metade daquele limite em andamento.
+
+Os limites acompanham o tamanho do pool (`DB_POOL_SIZE` + `DB_MAX_OVERFLOW`).
+
+A recusa é um 503 com Retry-After imediato, sem tocar no banco.
+"""
+
+from enum import Enum
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.db import engine_async
+
+
+class Prioridade(str, Enum):
+    CRITICA = 'critica'
+    NORMAL = 'normal'
+    BAIXA = 'baixa'
+
+
+class ControleAdmissao:
+    def __init__(
+        self,
+        capacidade_pool: int = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        max_em_voo: int | None = None,
+    ):
+        self.capacidade_pool = capacidade_pool
+        if max_em_voo is None:
+            max_em_voo = capacidade_pool * settings.ADMISSAO_EM_VOO_POR_CONEXAO
+        self.max_em_voo = max_em_voo
+        self.conexoes_em_uso = 0
+        self.em_voo = dict.fromkeys(Prioridade, 0)
+        self.recusadas = dict.fromkeys(Prioridade, 0)
+
+    def instrumentar(self, engine: Engine) -> None:
+        """Passa a contar as conexões emprestadas pelo pool do `engine` (síncrono)."""
+        event.listen(engine, "checkout", self._ao_emprestar)
+        event.listen(engine, "checkin", self._ao_devolver)
+
+    def _ao_emprestar(self, _dbapi_connection, _record, _proxy) -> None:
+        self.conexoes_em_uso += 1
+
+    def _ao_devolver(self, _dbapi_connection, _record) -> None:
+        self.conexoes_em_uso = max(0, self.conexoes_em_uso - 1)
+
+    @property
+    def pool_cheio(self) -> bool:
+        return self.conexoes_em_uso >= self.capacidade_pool
+
+    def entrar(self, prioridade: Prioridade) -> bool:
+        """Admite a requisição (e a conta como em andamento) ou devolve False para recusar."""
+        if prioridade is not Prioridade.CRITICA:
+            nao_criticas = self.em_voo[Prioridade.NORMAL] + self.em_voo[Prioridade.BAIXA]
+            if prioridade is Prioridade.BAIXA:
+                recusar = self.pool_cheio or nao_criticas >= self.max_em_voo // 2
+            else:
+                # pool esgotado e uma não crítica por conexão: a próxima só ficaria esperando
+                recusar = nao_criticas >= self.max_em_voo or (
+                    self.pool_cheio and nao_criticas >= self.capacidade_pool
+                )
+            if recusar:
+                self.recusadas[prioridade] += 1
+                return False
+        self.em_voo[prioridade] += 1
+        return True
+
+    def sair(self, prioridade: Prioridade) -> None:
+        self.em_voo[prioridade] -= 1
+
+    def metricas(self) -> dict:
+        return {
+            'capacidade_pool': self.capacidade_pool,
+            'conexoes_em_uso': self.conexoes_em_uso,
+            'max_em_voo': self.max_em_voo,
+            'em_voo': {p.value: n for p, n in self.em_voo.items()},
+            'recusadas': {p.value: n for p, n in self.recusadas.items()},
+        }
+
+
+controle_admissao = ControleAdmissao()
+controle_admissao.instrumentar(engine_async.sync_engine)
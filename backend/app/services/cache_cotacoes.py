@@ -0,0 +1,139 @@
+"""
+Cache de cotações por célula de origem/destino, faixa de distância, faixa de
+preço dinâmico e janela de tempo.
+
+Passageiros refazem a mesma cotação ao ajustar o pino e muitos cotam dos
+mesmos pontos de grande movimento; dentro da mesma janela de 30 s essas
+cotações recebem a resposta já calculada.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from app.core.config import settings
+from app.services.demanda import Zona
+
+TAMANHO_CELULA_GRAUS = 0.002  # ~200 m
+FAIXA_DISTANCIA_KM = 0.1
+FAIXA_DURACAO_MIN = 1.0
+
+
+def _celula(lat: float, lon: float) -> tuple[int, int]:
+    return (math.floor(lat / TAMANHO_CELULA_GRAUS), math.floor(lon / TAMANHO_CELULA_GRAUS))
+
+
+def chave_cotacao(
+    lat_ini: float,
+    lon_ini: float,
+    lat_fim: float,
+    lon_fim: float,
+    distancia_km: float,
+    duracao_min: float,
+    multiplicador: float,
+    agora: float | None = None,
+) -> tuple:
+    """(célula origem, célula destino, faixa de distância/duração, multiplicador, janela de tempo)."""
+    agora = time.time() if agora is None else agora
+    return (
+        _celula(lat_ini, lon_ini),
+        _celula(lat_fim, lon_fim),
+        math.floor(distancia_km / FAIXA_DISTANCIA_KM),
+        math.floor(duracao_min / FAIXA_DURACAO_MIN),
+        multiplicador,
+        int(agora // settings.COTACAO_CACHE_JANELA_S),
+    )
+
+
+class CacheCotacoes:
+    """
+    LRU com TTL, limitado a `capacidade` entradas.
+
+    Cada entrada vale até o fim da sua janela de tempo. Quando o multiplicador
+    observado numa zona muda, todas as entradas daquela zona são descartadas.
+    """
+
+    def __init__(self, capacidade: int = settings.COTACAO_CACHE_CAPACIDADE):
+        self.capacidade = capacidade
+        self._itens: OrderedDict[Hashable, tuple[float, Zona, object]] = OrderedDict()
+        self._por_zona: dict[Zona, set[Hashable]] = {}
+        self._multiplicador_por_zona: dict[Zona, float] = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.invalidados = 0
+        self.despejados = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def observar_multiplicador(self, zona: Zona, multiplicador: float) -> None:
+        anterior = self._multiplicador_por_zona.get(zona)
+        self._multiplicador_por_zona[zona] = multiplicador
+        if anterior is not None and anterior != multiplicador:
+            self.invalidar_zona(zona)
+
+    def invalidar_zona(self, zona: Zona) -> None:
+        for chave in self._por_zona.pop(zona, ()):
+            if self._itens.pop(chave, None) is not None:
+                self.invalidados += 1
+
+    def limpar(self) -> None:
+        """Descarta tudo (ex.: tabela de tarifas alterada)."""
+        self._itens.clear()
+        self._por_zona.clear()
+
+    def obter(self, chave: Hashable, agora: float | None = None):
+        item = self._itens.get(chave)
+        if item is None:
+            self.falhas += 1
+            return None
+        expira_em, zona, valor = item
+        if (time.time() if agora is None else agora) >= expira_em:
+            self._remover(chave, zona)
+            self.expirados += 1
+            self.falhas += 1
+            return None
+        self._itens.move_to_end(chave)
+        self.acertos += 1
+        return valor
+
+    def guardar(self, chave: Hashable, zona: Zona, valor, agora: float | None = None) -> None:
+        agora = time.time() if agora is None else agora
+        janela = settings.COTACAO_CACHE_JANELA_S
+        expira_em = (agora // janela + 1) * janela
+        self._itens[chave] = (expira_em, zona, valor)
+        self._itens.move_to_end(chave)
+        self._por_zona.setdefault(zona, set()).add(chave)
+        while len(self._itens) > self.capacidade:
+            chave_antiga, (_, zona_antiga, _) = self._itens.popitem(last=False)
+            self._por_zona_descartar(chave_antiga, zona_antiga)
+            self.despejados += 1
+
+    def _remover(self, chave: Hashable, zona: Zona) -> None:
+        self._itens.pop(chave, None)
+        self._por_zona_descartar(chave, zona)
+
+    def _por_zona_descartar(self, chave: Hashable, zona: Zona) -> None:
+        chaves = self._por_zona.get(zona)
+        if chaves is not None:
+            chaves.discard(chave)
+            if not chaves:
+                del self._por_zona[zona]
+
+    def metricas(self) -> dict:
+        consultas = self.acertos + self.falhas
+        return {
+            'tamanho': len(self._itens),
+            'capacidade': self.capacidade,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            'expirados': self.expirados,
+            'invalidados': self.invalidados,
+            'despejados': self.despejados,
+        }
+
+
+cache_cotacoes = CacheCotacoes()
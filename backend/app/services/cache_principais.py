@@ -0,0 +1,108 @@
+"""
+Cache do usuário autenticado (o "principal") por processo.
+
+A maioria dos endpoints só precisa do id, do papel e de saber se o usuário
+está ativo. Em vez de carregar a linha inteira de `users` (geometria
+incluída) a cada requisição, guardamos um `Principal` enxuto, por subject do
+token, num LRU com TTL.
+
+A entrada é descartada quando o `User` é alterado ou removido pelo ORM neste
+processo (eventos `after_update`/`after_delete`) e, para os outros workers,
+pelo NOTIFY `usuarios_alterados` disparado por trigger em `users`. O TTL
+limita o que escapar dos dois (ex.: UPDATE em lote fora do ORM).
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+
+from app.core.config import settings
+from app.users.models.users import User
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: int
+    email: str
+    full_name: str | None
+    role: str | None
+    is_active: bool
+    is_superuser: bool
+
+
+def principal_stmt(usuario_id: int):
+    """Só as colunas do `Principal`, sem carregar a entidade."""
+    return select(User.id, User.email, User.full_name, User.role, User.is_active, User.is_superuser).where(
+        User.id == usuario_id
+    )
+
+
+class CachePrincipais:
+    def __init__(
+        self,
+        capacidade: int = settings.PRINCIPAL_CACHE_CAPACIDADE,
+        ttl_s: float = settings.PRINCIPAL_CACHE_TTL_S,
+    ):
+        self.capacidade = capacidade
+        self.ttl_s = ttl_s
+        self._itens: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidados = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def obter(self, sub: str, agora: float | None = None) -> Principal | None:
+        item = self._itens.get(sub)
+        if item is None or (time.monotonic() if agora is None else agora) >= item[0]:
+            if item is not None:
+                del self._itens[sub]
+            self.falhas += 1
+            return None
+        self._itens.move_to_end(sub)
+        self.acertos += 1
+        return item[1]
+
+    def guardar(self, sub: str, principal: Principal, agora: float | None = None) -> None:
+        self._itens[sub] = ((time.monotonic() if agora is None else agora) + self.ttl_s, principal)
+        self._itens.move_to_end(sub)
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+
+    def invalidar(self, usuario_id: int | str) -> None:
+        if self._itens.pop(str(usuario_id), None) is not None:
+            self.invalidados += 1
+
+    def limpar(self) -> None:
+        self._itens.clear()
+
+    def metricas(self) -> dict:
+        consultas = self.acertos + self.falhas
+        return {
+            'tamanho': len(self._itens),
+            'capacidade': self.capacidade,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            'invalidados': self.invalidados,
+        }
+
+
+cache_principais = CachePrincipais()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _ao_alterar_usuario(_mapper, _connection, target: User) -> None:
+    cache_principais.invalidar(target.id)
+
+
+async def ao_alterar_usuarios(payload: dict | str) -> None:
+    """Tratador do NOTIFY `usuarios_alterados` (payload com o id do usuário)."""
+    if isinstance(payload, dict) and 'id' in payload:
+        cache_principais.invalidar(payload['id'])
+    else:
+        cache_principais.limpar()
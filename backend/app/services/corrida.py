@@ -1,32 +1,14 @@
 from typing import Literal, List, Optional
 
-# Regras de precificação por tipo de corrida
-REGRAS_PRECO = {
-    "UberX": {
-        "tarifa_base": 4.0,
-        "custo_por_km": 1.8,
-        "custo_por_minuto": 0.4,
-        "tarifa_minima": 8.0,
-    },
-    "Comfort": {
-        "tarifa_base": 6.0,
-        "custo_por_km": 2.2,
-        "custo_por_minuto": 0.5,
-        "tarifa_minima": 12.0,
-    },
-    "Black": {
-        "tarifa_base": 10.0,
-        "custo_por_km": 3.5,
-        "custo_por_minuto": 0.8,
-        "tarifa_minima": 20.0,
-    },
-    "Moto": {
-        "tarifa_base": 2.5,
-        "custo_por_km": 1.0,
-        "custo_por_minuto": 0.25,
-        "tarifa_minima": 5.0,
-    },
-}
+# Estimativa de chegada do motorista a partir da distância em linha reta
+VELOCIDADE_MEDIA_URBANA_KMH = 25.0
+FATOR_DESVIO_VIARIO = 1.4  # ruas não são linha reta
+
+
+def estimar_tempo_chegada_min(distancia_m: float) -> float:
+    """Tempo estimado (min) para o motorista percorrer `distancia_m` até o embarque."""
+    velocidade_m_min = VELOCIDADE_MEDIA_URBANA_KMH * 1000 / 60
+    return round(distancia_m * FATOR_DESVIO_VIARIO / velocidade_m_min, 1)
 
 
 def calcular_multiplicador(
@@ -0,0 +1,195 @@
+"""
+Contadores em tempo real de oferta e demanda por zona, para o preço dinâmico.
+
+Cada zona é uma célula de ~5,5 km de uma grade de latitude/longitude. A
+demanda é o número de passageiros distintos que cotaram ou reservaram
+recentemente e a oferta (motoristas disponíveis) é um contador mantido pelo
+índice de motoristas. Tudo é atualizado incrementalmente a cada evento, de
+modo que consultar a situação de uma zona custa O(1) amortizado.
+
+A oferta vem do índice, ressincronizado com o banco, e vale para todos os
+processos; a demanda só enxerga as requisições que caem neste processo.
+Com o balanceador distribuindo as requisições entre os `WEB_CONCURRENCY`
+workers, a demanda local é escalada por esse número.
+"""
+
+import math
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Hashable
+
+from app.core.config import settings
+
+TAMANHO_ZONA_GRAUS = 0.05
+JANELA_COTACOES_S = 120
+JANELA_RESERVAS_S = 300
+JANELA_RECUSAS_S = 600
+RESOLUCAO_S = 5
+
+Zona = tuple[int, int]
+
+
+def zona(lat: float, lon: float) -> Zona:
+    return (math.floor(lat / TAMANHO_ZONA_GRAUS), math.floor(lon / TAMANHO_ZONA_GRAUS))
+
+
+def vizinhanca(z: Zona):
+    """A zona e as 8 vizinhas, para não haver efeito de borda entre zonas."""
+    i, j = z
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            yield i + di, j + dj
+
+
+class JanelaDeslizante:
+    """
+    Quantidade de eventos nos últimos `janela_s` segundos.
+
+    Os eventos caem em baldes de `resolucao_s` segundos num buffer circular;
+    baldes que saem da janela são descontados do total conforme o tempo
+    avança, então registrar e consultar custam O(1) amortizado.
+    """
+
+    def __init__(self, janela_s: float, resolucao_s: float = RESOLUCAO_S):
+        self.resolucao_s = resolucao_s
+        self._baldes = [0] * max(1, math.ceil(janela_s / resolucao_s))
+        self._total = 0
+        self._epoca_atual: int | None = None
+
+    def _avancar(self, agora: float) -> None:
+        epoca = int(agora // self.resolucao_s)
+        if self._epoca_atual is None:
+            self._epoca_atual = epoca
+            return
+        passos = epoca - self._epoca_atual
+        if passos <= 0:
+            return
+        tamanho = len(self._baldes)
+        if passos >= tamanho:
+            self._baldes = [0] * tamanho
+            self._total = 0
+        else:
+            for e in range(self._epoca_atual + 1, epoca + 1):
+                posicao = e % tamanho
+                self._total -= self._baldes[posicao]
+                self._baldes[posicao] = 0
+        self._epoca_atual = epoca
+
+    def registrar(self, quantidade: int = 1, agora: float | None = None) -> None:
+        agora = time.monotonic() if agora is None else agora
+        self._avancar(agora)
+        self._baldes[self._epoca_atual % len(self._baldes)] += quantidade
+        self._total += quantidade
+
+    def total(self, agora: float | None = None) -> int:
+        self._avancar(time.monotonic() if agora is None else agora)
+        return self._total
+
+
+class PassageirosRecentes:
+    """
+    Passageiros distintos vistos nos últimos `janela_s` segundos.
+
+    Quem refaz a cotação ao ajustar o pino conta uma vez só. As entradas
+    ficam em ordem do último registro, então as vencidas saem pelo início e
+    registrar e consultar custam O(1) amortizado.
+    """
+
+    def __init__(self, janela_s: float):
+        self.janela_s = janela_s
+        self._vistos: OrderedDict[Hashable, float] = OrderedDict()
+
+    def _expirar(self, agora: float) -> None:
+        limite = agora - self.janela_s
+        while self._vistos and next(iter(self._vistos.values())) <= limite:
+            self._vistos.popitem(last=False)
+
+    def registrar(self, passageiro: Hashable, agora: float | None = None) -> None:
+        agora = time.monotonic() if agora is None else agora
+        self._vistos[passageiro] = agora
+        self._vistos.move_to_end(passageiro)
+        self._expirar(agora)
+
+    def descartar(self, passageiro: Hashable) -> None:
+        self._vistos.pop(passageiro, None)
+
+    def contem(self, passageiro: Hashable, agora: float | None = None) -> bool:
+        self._expirar(time.monotonic() if agora is None else agora)
+        return passageiro in self._vistos
+
+    def total(self, agora: float | None = None) -> int:
+        self._expirar(time.monotonic() if agora is None else agora)
+        return len(self._vistos)
+
+
+class PainelDemanda:
+    """Cotações, reservas, recusas de ofertas e motoristas disponíveis por zona."""
+
+    def __init__(self, processos: int = settings.WEB_CONCURRENCY):
+        self.processos = max(1, processos)
+        self._cotacoes: dict[Zona, PassageirosRecentes] = {}
+        self._reservas: dict[Zona, PassageirosRecentes] = {}
+        self._recusas: dict[Zona, JanelaDeslizante] = {}
+        self._motoristas: Counter[Zona] = Counter()
+
+    def _janela(self, janelas: dict[Zona, JanelaDeslizante], z: Zona, janela_s: float) -> JanelaDeslizante:
+        janela = janelas.get(z)
+        if janela is None:
+            janela = janelas[z] = JanelaDeslizante(janela_s)
+        return janela
+
+    def _passageiros(self, grupos: dict[Zona, PassageirosRecentes], z: Zona, janela_s: float) -> PassageirosRecentes:
+        grupo = grupos.get(z)
+        if grupo is None:
+            grupo = grupos[z] = PassageirosRecentes(janela_s)
+        return grupo
+
+    def registrar_cotacao(self, lat: float, lon: float, passageiro: Hashable) -> None:
+        z = zona(lat, lon)
+        reservas = self._reservas.get(z)
+        if reservas is not None and reservas.contem(passageiro):
+            return  # já contado pela reserva
+        self._passageiros(self._cotacoes, z, JANELA_COTACOES_S).registrar(passageiro)
+
+    def registrar_reserva(self, lat: float, lon: float, passageiro: Hashable) -> None:
+        z = zona(lat, lon)
+        self._passageiros(self._reservas, z, JANELA_RESERVAS_S).registrar(passageiro)
+        # a cotação que levou à reserva não conta de novo
+        if z in self._cotacoes:
+            self._cotacoes[z].descartar(passageiro)
+
+    def registrar_recusa(self, lat: float, lon: float) -> None:
+        """Oferta recusada ou expirada para um embarque no ponto."""
+        self._janela(self._recusas, zona(lat, lon), JANELA_RECUSAS_S).registrar()
+
+    def mover_motorista(self, origem: Zona | None, destino: Zona | None) -> None:
+        """Chamado pelo índice de motoristas quando um motorista entra, sai ou troca de zona."""
+        if origem == destino:
+            return
+        if origem is not None:
+            self._motoristas[origem] -= 1
+            if self._motoristas[origem] <= 0:
+                del self._motoristas[origem]
+        if destino is not None:
+            self._motoristas[destino] += 1
+
+    def passageiros_ativos(self, lat: float, lon: float) -> int:
+        """Passageiros distintos que cotaram ou reservaram na vizinhança, estimados para todos os processos."""
+        total = 0
+        for z in vizinhanca(zona(lat, lon)):
+            if z in self._cotacoes:
+                total += self._cotacoes[z].total()
+            if z in self._reservas:
+                total += self._reservas[z].total()
+        return total * self.processos
+
+    def recusas_motoristas(self, lat: float, lon: float) -> int:
+        """Ofertas recusadas/expiradas recentes na vizinhança do ponto."""
+        return sum(self._recusas[z].total() for z in vizinhanca(zona(lat, lon)) if z in self._recusas)
+
+    def motoristas_disponiveis(self, lat: float, lon: float) -> int:
+        """Motoristas disponíveis na vizinhança do ponto."""
+        return sum(self._motoristas.get(z, 0) for z in vizinhanca(zona(lat, lon)))
+
+
+painel_demanda = PainelDemanda()
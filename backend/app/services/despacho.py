@@ -0,0 +1,384 @@
+"""
+Despacho em lote: a cada poucos segundos, todas as reservas aguardando são
+atribuídas de uma vez aos motoristas disponíveis.
+
+O custo de cada par (reserva, motorista) é o ETA até o embarque
+(`calcular_matriz_eta`). A atribuição resolve um fluxo de custo mínimo
+(OR-Tools `SimpleMinCostFlow`): primeiro atende o máximo de reservas
+possível e, entre essas soluções, a de menor ETA total. Diferente do
+"primeiro a chegar leva o motorista mais próximo", não deixa uma reserva
+sem motorista (ou com um motorista distante) só porque outra, que tinha
+alternativa, chegou antes.
+
+Com vários workers da API cada um roda o seu despacho. Antes de gravar, a
+rodada reivindica as corridas (`FOR UPDATE SKIP LOCKED`) e os motoristas
+(`pg_try_advisory_xact_lock`) escolhidos: o que estiver sendo gravado por
+outro worker é pulado e volta na próxima rodada, em vez de a transação
+esperar pelo lock. O lock de motorista é consultivo para não disputar a
+linha de `users` com a gravação das posições.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+from ortools.graph.python import min_cost_flow
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_session
+from app.core.models.corrida import Corrida, StatusCorrida, transicao_stmt
+from app.services.eta import calcular_matriz_eta
+from app.services.indice_motoristas import IndiceMotoristas, indice_motoristas
+from app.services.pubsub import pubsub_usuarios
+from app.users.models.users import User
+
+logger = logging.getLogger(__name__)
+
+RAIO_BUSCA_M = 10000
+MOTORISTAS_POR_RESERVA = 10
+# primeira chave dos locks consultivos de motorista (a segunda é o id), para não colidir com outros usos
+LOCK_MOTORISTA = 0x6D6F7400
+
+
+@dataclass(frozen=True)
+class ReservaPendente:
+    corrida_id: int
+    passageiro_id: int
+    lat: float
+    lon: float
+    criada_em: float
+
+
+@dataclass(frozen=True)
+class Atribuicao:
+    corrida_id: int
+    passageiro_id: int
+    motorista_id: int
+    tempo_chegada_min: float
+    lat: float
+    lon: float
+
+    @classmethod
+    def da_corrida(cls, corrida: Corrida) -> "Atribuicao":
+        """Atribuição gravada na corrida (ex.: oferta feita pelo despacho de outro worker)."""
+        return cls(
+            corrida.id,
+            corrida.passageiro_id,
+            corrida.motorista_id,
+            corrida.tempo_chegada_min,
+            corrida.lat_ini,
+            corrida.lon_ini,
+        )
+
+    def estado(self) -> dict:
+        """Mesmo formato de `Corrida.estado`, para o passageiro."""
+        return {
+            'corrida_id': self.corrida_id,
+            'status': StatusCorrida.ATRIBUIDA.value,
+            'motorista_id': self.motorista_id,
+            'tempo_chegada_min': self.tempo_chegada_min,
+        }
+
+
+def atribuir(custos: np.ndarray, custo_maximo: float = np.inf) -> list[tuple[int, int]]:
+    """
+    Pares (linha, coluna) da atribuição de custo mínimo com o máximo de pares.
+
+    `custos` é a matriz reservas × motoristas; pares com custo acima de
+    `custo_maximo` (ou infinito) não podem ser atribuídos.
+    """
+    linhas, colunas = custos.shape
+    permitidos = np.argwhere(np.isfinite(custos) & (custos <= custo_maximo))
+    if not len(permitidos):
+        return []
+    origem, destino = 0, 1 + linhas + colunas
+    fluxo = min_cost_flow.SimpleMinCostFlow()
+    # origem → reservas → motoristas → destino, todos com capacidade 1
+    inicio = np.concatenate((
+        np.zeros(linhas, dtype=np.int64),
+        1 + permitidos[:, 0],
+        1 + linhas + np.arange(colunas),
+    ))
+    fim = np.concatenate((
+        1 + np.arange(linhas),
+        1 + linhas + permitidos[:, 1],
+        np.full(colunas, destino),
+    ))
+    # custos inteiros (décimos de segundo) para o solver
+    custo = np.concatenate((
+        np.zeros(linhas, dtype=np.int64),
+        np.rint(custos[permitidos[:, 0], permitidos[:, 1]] * 600).astype(np.int64),
+        np.zeros(colunas, dtype=np.int64),
+    ))
+    arcos = fluxo.add_arcs_with_capacity_and_unit_cost(inicio, fim, np.ones(len(inicio), dtype=np.int64), custo)
+    # oferta = todas as reservas; o solver envia o máximo possível pelo menor custo
+    fluxo.set_nodes_supplies([origem, destino], [linhas, -linhas])
+    if fluxo.solve_max_flow_with_min_cost() != fluxo.OPTIMAL:
+        logger.error("Despacho: fluxo de custo mínimo não encontrou solução ótima")
+        return []
+    pares = arcos[linhas:linhas + len(permitidos)]
+    usados = np.flatnonzero(fluxo.flows(pares) > 0)
+    return [(int(permitidos[p, 0]), int(permitidos[p, 1])) for p in usados]
+
+
+def atribuir_guloso(custos: np.ndarray, custo_maximo: float = np.inf) -> list[tuple[int, int]]:
+    """Referência: cada reserva, em ordem de chegada, leva o motorista livre mais próximo."""
+    livres = np.ones(custos.shape[1], dtype=bool)
+    pares = []
+    for linha in range(custos.shape[0]):
+        candidatos = np.where(livres & (custos[linha] <= custo_maximo), custos[linha], np.inf)
+        if candidatos.size and np.isfinite(candidatos.min()):
+            coluna = int(np.argmin(candidatos))
+            livres[coluna] = False
+            pares.append((linha, coluna))
+    return pares
+
+
+def reivindicar_corridas_stmt(corrida_ids: list[int]):
+    """
+    Trava as corridas que nenhum outro worker está gravando e devolve (id, status).
+
+    Corridas travadas por outra transação não aparecem no resultado: ficam
+    na fila para a próxima rodada.
+    """
+    return (
+        select(Corrida.id, Corrida.status)
+        .where(Corrida.id.in_(sorted(corrida_ids)))
+        .with_for_update(skip_locked=True)
+    )
+
+
+def reivindicar_motoristas_stmt(motorista_ids: list[int]):
+    """
+    (id, disponível, lock obtido) de cada motorista.
+
+    `pg_try_advisory_xact_lock` não espera: se outro worker estiver atribuindo
+    o motorista, ele só fica de fora. O lock só é tentado para quem ainda está
+    disponível e é solto no commit/rollback.
+    """
+    disponivel = User.is_active & User.is_available.isnot(False)
+    return select(
+        User.id,
+        disponivel,
+        case((disponivel, func.pg_try_advisory_xact_lock(LOCK_MOTORISTA, User.id)), else_=False),
+    ).where(User.id.in_(sorted(motorista_ids)))
+
+
+class Despachante:
+    """
+    Fila em memória das corridas `aguardando` e laço de rodadas de atribuição.
+
+    A fila é reconstruída do banco ao iniciar (índice parcial
+    `ix_corridas_aguardando`). As atribuições são gravadas com UPDATE
+    condicional: uma corrida cancelada enquanto o solver rodava, ou um
+    motorista que já recebeu outra corrida, simplesmente ficam de fora.
+    """
+
+    def __init__(self, indice: IndiceMotoristas, intervalo_s: float = settings.DESPACHO_INTERVALO_S):
+        self.indice = indice
+        self.intervalo_s = intervalo_s
+        self._fila: dict[int, ReservaPendente] = {}
+        self.atribuicoes: dict[int, Atribuicao] = {}
+        # motoristas que já recusaram (ou deixaram expirar) a oferta de cada corrida
+        self._recusados: dict[int, set[int]] = {}
+        # chamados com cada atribuição gravada (ex.: agendador de ofertas)
+        self.ao_atribuir: list[Callable[[Atribuicao], None]] = []
+        self._acordar = asyncio.Event()
+        # pares pulados porque outro worker estava gravando a corrida ou o motorista
+        self.disputados = 0
+
+    def __len__(self) -> int:
+        return len(self._fila)
+
+    def enfileirar(self, corrida_id: int, passageiro_id: int, lat: float, lon: float) -> None:
+        anterior = self._fila.get(corrida_id)
+        criada_em = anterior.criada_em if anterior is not None else time.monotonic()
+        self._fila[corrida_id] = ReservaPendente(corrida_id, passageiro_id, lat, lon, criada_em)
+
+    def remover(self, corrida_id: int) -> None:
+        """Corrida saiu do despacho (cancelada ou finalizada): sai da fila e libera o motorista."""
+        self._fila.pop(corrida_id, None)
+        self._recusados.pop(corrida_id, None)
+        atribuicao = self.atribuicoes.pop(corrida_id, None)
+        if atribuicao is not None:
+            self.indice.liberar(atribuicao.motorista_id)
+
+    def aceita(self, corrida_id: int) -> None:
+        """Motorista aceitou: a corrida não volta mais ao despacho."""
+        self._recusados.pop(corrida_id, None)
+
+    def devolver(self, atribuicao: Atribuicao) -> None:
+        """Oferta recusada ou expirada: a corrida volta à fila sem aquele motorista."""
+        self.atribuicoes.pop(atribuicao.corrida_id, None)
+        self._recusados.setdefault(atribuicao.corrida_id, set()).add(atribuicao.motorista_id)
+        self.indice.liberar(atribuicao.motorista_id)
+        self.enfileirar(atribuicao.corrida_id, atribuicao.passageiro_id, atribuicao.lat, atribuicao.lon)
+        self.acordar()
+
+    def acordar(self) -> None:
+        """Antecipa a próxima rodada (ex.: uma corrida voltou para a fila)."""
+        self._acordar.set()
+
+    async def carregar(self, session: AsyncSession) -> int:
+        """Recoloca na fila as corridas aguardando gravadas no banco (ex.: após reiniciar)."""
+        linhas = (
+            await session.execute(
+                select(Corrida.id, Corrida.passageiro_id, Corrida.lat_ini, Corrida.lon_ini)
+                .where(Corrida.status == StatusCorrida.AGUARDANDO, Corrida.lat_ini.isnot(None))
+                .order_by(Corrida.created_at)
+            )
+        ).all()
+        for corrida_id, passageiro_id, lat, lon in linhas:
+            self.enfileirar(corrida_id, passageiro_id, lat, lon)
+        return len(linhas)
+
+    def _candidatos(self, reservas: list[ReservaPendente]) -> list[int]:
+        candidatos: dict[int, None] = {}
+        for reserva in reservas:
+            for motorista_id, _ in self.indice.mais_proximos(
+                reserva.lat, reserva.lon, MOTORISTAS_POR_RESERVA, RAIO_BUSCA_M
+            ):
+                candidatos[motorista_id] = None
+        return list(candidatos)
+
+    def planejar(
+        self,
+        reservas: list[ReservaPendente],
+        motoristas: list[tuple[int, tuple[float, float]]],
+        recusados: dict[int, set[int]] | None = None,
+    ) -> list[Atribuicao]:
+        """Resolve a rodada sobre um retrato da fila e das posições (roda numa thread)."""
+        matriz = calcular_matriz_eta(
+            [p[0] for _, p in motoristas],
+            [p[1] for _, p in motoristas],
+            [r.lat for r in reservas],
+            [r.lon for r in reservas],
+        )
+        custos = matriz.tempo_min.T
+        if recusados:
+            coluna = {motorista_id: j for j, (motorista_id, _) in enumerate(motoristas)}
+            for i, reserva in enumerate(reservas):
+                for motorista_id in recusados.get(reserva.corrida_id, ()):
+                    if motorista_id in coluna:
+                        custos[i, coluna[motorista_id]] = np.inf
+        return [
+            Atribuicao(
+                reservas[i].corrida_id,
+                reservas[i].passageiro_id,
+                motoristas[j][0],
+                round(float(custos[i, j]), 1),
+                reservas[i].lat,
+                reservas[i].lon,
+            )
+            for i, j in atribuir(custos, settings.DESPACHO_ETA_MAXIMO_MIN)
+        ]
+
+    async def _reivindicar(self, session: AsyncSession, planejadas: list[Atribuicao]) -> list[Atribuicao]:
+        """Só os pares cuja corrida e motorista esta transação conseguiu travar sem esperar."""
+        corridas = dict(
+            (await session.execute(reivindicar_corridas_stmt([a.corrida_id for a in planejadas]))).all()
+        )
+        motoristas, indisponiveis = set(), set()
+        for motorista_id, disponivel, travado in (
+            await session.execute(reivindicar_motoristas_stmt([a.motorista_id for a in planejadas]))
+        ).all():
+            if not disponivel:
+                # em corrida ou desativado por outro worker: sai do índice até ser liberado
+                self.indice.ocupar(motorista_id)
+                indisponiveis.add(motorista_id)
+            elif travado:
+                motoristas.add(motorista_id)
+        livres = []
+        for atribuicao in planejadas:
+            status = corridas.get(atribuicao.corrida_id)
+            if status is not None and status != StatusCorrida.AGUARDANDO:
+                # atribuída por outro worker ou cancelada
+                self._fila.pop(atribuicao.corrida_id, None)
+            elif atribuicao.motorista_id in indisponiveis:
+                continue
+            elif status is None or atribuicao.motorista_id not in motoristas:
+                self.disputados += 1
+            else:
+                livres.append(atribuicao)
+        return livres
+
+    async def _gravar(self, session: AsyncSession, atribuicao: Atribuicao) -> bool:
+        """Grava a atribuição; se a corrida já não estiver aguardando, tira da fila."""
+        try:
+            async with session.begin_nested():
+                gravada = await session.execute(
+                    transicao_stmt(
+                        atribuicao.corrida_id,
+                        StatusCorrida.AGUARDANDO,
+                        StatusCorrida.ATRIBUIDA,
+                        motorista_id=atribuicao.motorista_id,
+                        tempo_chegada_min=atribuicao.tempo_chegada_min,
+                    )
+                )
+                if gravada.first() is None:
+                    # cancelada ou alterada por outra requisição enquanto o solver rodava
+                    self._fila.pop(atribuicao.corrida_id, None)
+                    return False
+        except IntegrityError:
+            # motorista já tem outra corrida ativa (uq_corridas_motorista_ativa): tenta na próxima rodada
+            return False
+        return True
+
+    async def rodada(self) -> list[Atribuicao]:
+        reservas = sorted(self._fila.values(), key=lambda r: r.criada_em)
+        if not reservas:
+            return []
+        motoristas = [(m, self.indice.posicao(m)) for m in self._candidatos(reservas)]
+        if not motoristas:
+            return []
+        recusados = {r.corrida_id: set(self._recusados[r.corrida_id]) for r in reservas if r.corrida_id in self._recusados}
+        planejadas = await asyncio.to_thread(self.planejar, reservas, motoristas, recusados)
+        # a fila e o índice podem ter mudado enquanto o solver rodava
+        planejadas = [a for a in planejadas if a.corrida_id in self._fila and a.motorista_id in self.indice]
+        if not planejadas:
+            return []
+        async with async_session() as session:
+            planejadas = await self._reivindicar(session, planejadas)
+            confirmadas = [a for a in planejadas if await self._gravar(session, a)]
+            if confirmadas:
+                await session.execute(
+                    update(User)
+                    .where(User.id.in_([a.motorista_id for a in confirmadas]))
+                    .values(is_available=False)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+        for atribuicao in confirmadas:
+            self._fila.pop(atribuicao.corrida_id, None)
+            self.indice.ocupar(atribuicao.motorista_id)
+            self.atribuicoes[atribuicao.corrida_id] = atribuicao
+            pubsub_usuarios.publicar(atribuicao.passageiro_id, atribuicao.estado())
+            for gancho in self.ao_atribuir:
+                gancho(atribuicao)
+        logger.info("Despacho: %s atribuições, %s reservas aguardando", len(confirmadas), len(self._fila))
+        return confirmadas
+
+    async def executar(self) -> None:
+        try:
+            async with async_session() as session:
+                await self.carregar(session)
+        except Exception:
+            logger.exception("Falha ao carregar as corridas aguardando")
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._acordar.wait(), self.intervalo_s)
+            self._acordar.clear()
+            try:
+                await self.rodada()
+            except Exception:
+                logger.exception("Falha na rodada de despacho")
+
+
+despachante = Despachante(indice_motoristas)
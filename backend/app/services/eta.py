@@ -0,0 +1,79 @@
+"""
+Matriz de tempos de chegada (ETA) entre N origens (ex.: motoristas candidatos)
+e M destinos (ex.: embarques aguardando), calculada numa só chamada.
+
+Com o grafo viário carregado, usa o many-to-many da hierarquia de contração
+(`MotorRotas.matriz`), que compartilha as buscas entre todos os pares. Pares
+fora do grafo, sem caminho, ou sem grafo carregado caem na estimativa por
+linha reta de `estimar_tempo_chegada_min`, já vetorizada.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.services import geo
+from app.services.corrida import FATOR_DESVIO_VIARIO, VELOCIDADE_MEDIA_URBANA_KMH
+from app.services.rotas import MotorRotas, servico_rotas
+
+VELOCIDADE_MEDIA_URBANA_M_MIN = VELOCIDADE_MEDIA_URBANA_KMH * 1000 / 60
+
+
+@dataclass(frozen=True)
+class MatrizEta:
+    tempo_min: np.ndarray
+    distancia_km: np.ndarray
+
+    def como_listas(self) -> dict:
+        return {
+            'tempo_min': np.round(self.tempo_min, 1).tolist(),
+            'distancia_km': np.round(self.distancia_km, 2).tolist(),
+        }
+
+
+def matriz_linha_reta(lats_origem, lons_origem, lats_destino, lons_destino) -> MatrizEta:
+    """Estimativa N×M por distância em linha reta × fator de desvio viário."""
+    distancias_m = geo.haversine_matriz_m(lats_origem, lons_origem, lats_destino, lons_destino) * FATOR_DESVIO_VIARIO
+    return MatrizEta(tempo_min=distancias_m / VELOCIDADE_MEDIA_URBANA_M_MIN, distancia_km=distancias_m / 1000)
+
+
+def _encaixar(motor: MotorRotas, lats, lons) -> tuple[list[int], np.ndarray]:
+    """Nó mais próximo de cada ponto (-1 se fora do grafo) e a distância até ele."""
+    nos, distancias = [], []
+    for lat, lon in zip(np.atleast_1d(lats).tolist(), np.atleast_1d(lons).tolist()):
+        encaixe = motor.no_mais_proximo(lat, lon)
+        nos.append(-1 if encaixe is None else encaixe[0])
+        distancias.append(0.0 if encaixe is None else encaixe[1])
+    return nos, np.asarray(distancias)
+
+
+def calcular_matriz_eta(
+    lats_origem,
+    lons_origem,
+    lats_destino,
+    lons_destino,
+    motor: MotorRotas | None = None,
+) -> MatrizEta:
+    """ETA (min) e distância (km) de cada origem a cada destino, matriz N×M."""
+    estimativa = matriz_linha_reta(lats_origem, lons_origem, lats_destino, lons_destino)
+    motor = servico_rotas.motor if motor is None else motor
+    if motor is None or not estimativa.tempo_min.size:
+        return estimativa
+
+    nos_origem, encaixe_origem = _encaixar(motor, lats_origem, lons_origem)
+    nos_destino, encaixe_destino = _encaixar(motor, lats_destino, lons_destino)
+    i = [p for p, no in enumerate(nos_origem) if no >= 0]
+    j = [p for p, no in enumerate(nos_destino) if no >= 0]
+    if not i or not j:
+        return estimativa
+    tempo_min = estimativa.tempo_min.copy()
+    distancia_km = estimativa.distancia_km.copy()
+
+    tempos_s, distancias_m = motor.matriz([nos_origem[p] for p in i], [nos_destino[p] for p in j])
+    # trechos até a via mais próxima, como em `MotorRotas.trajeto`
+    encaixe_m = encaixe_origem[i][:, np.newaxis] + encaixe_destino[j][np.newaxis, :]
+    roteado = np.isfinite(tempos_s)
+    bloco = np.ix_(i, j)
+    tempo_min[bloco] = np.where(roteado, tempos_s / 60 + encaixe_m / VELOCIDADE_MEDIA_URBANA_M_MIN, tempo_min[bloco])
+    distancia_km[bloco] = np.where(roteado, (distancias_m + encaixe_m) / 1000, distancia_km[bloco])
+    return MatrizEta(tempo_min=tempo_min, distancia_km=distancia_km)
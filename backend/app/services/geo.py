@@ -0,0 +1,75 @@
+"""
+Cálculos geográficos vetorizados (NumPy) para pontuar muitos candidatos de uma vez.
+
+Todas as funções aceitam escalares ou arrays de latitude/longitude em graus e
+seguem as regras de broadcasting do NumPy; os arrays são convertidos para
+float64 contíguo uma única vez.
+"""
+
+import numpy as np
+
+RAIO_TERRA_M = 6_371_008.8
+METROS_POR_GRAU = 111_320.0
+
+
+def _graus(valores) -> np.ndarray:
+    return np.ascontiguousarray(valores, dtype=np.float64)
+
+
+def haversine_m(lat, lon, lats, lons) -> np.ndarray:
+    """Distância em metros entre (lat, lon) e cada ponto de (lats, lons)."""
+    phi1 = np.radians(_graus(lat))
+    phi2 = np.radians(_graus(lats))
+    dphi = phi2 - phi1
+    dlambda = np.radians(_graus(lons) - _graus(lon))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matriz_m(lats_origem, lons_origem, lats_destino, lons_destino) -> np.ndarray:
+    """Matriz N×M de distâncias em metros entre N origens e M destinos."""
+    return haversine_m(
+        _graus(lats_origem)[:, np.newaxis],
+        _graus(lons_origem)[:, np.newaxis],
+        _graus(lats_destino)[np.newaxis, :],
+        _graus(lons_destino)[np.newaxis, :],
+    )
+
+
+def rumo_graus(lat, lon, lats, lons) -> np.ndarray:
+    """Rumo inicial (0 = norte, 90 = leste) de (lat, lon) até cada ponto, em [0, 360)."""
+    phi1 = np.radians(_graus(lat))
+    phi2 = np.radians(_graus(lats))
+    dlambda = np.radians(_graus(lons) - _graus(lon))
+    x = np.sin(dlambda) * np.cos(phi2)
+    y = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlambda)
+    return np.degrees(np.arctan2(x, y)) % 360.0
+
+
+def caixa_envolvente(lat: float, lon: float, raio_m: float) -> tuple[float, float, float, float]:
+    """(lat_min, lat_max, lon_min, lon_max) que contém o círculo de raio `raio_m`."""
+    dlat = raio_m / METROS_POR_GRAU
+    dlon = raio_m / (METROS_POR_GRAU * max(np.cos(np.radians(lat)), 1e-6))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def dentro_da_caixa(lats, lons, caixa: tuple[float, float, float, float]) -> np.ndarray:
+    """Máscara booleana dos pontos dentro da caixa (filtro barato, sem trigonometria)."""
+    lat_min, lat_max, lon_min, lon_max = caixa
+    lats = _graus(lats)
+    lons = _graus(lons)
+    return (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+
+
+def dentro_do_raio(lat: float, lon: float, lats, lons, raio_m: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Índices e distâncias (m) dos pontos a até `raio_m` de (lat, lon).
+
+    A caixa envolvente descarta a maior parte dos pontos antes do haversine.
+    """
+    lats = _graus(lats)
+    lons = _graus(lons)
+    candidatos = np.flatnonzero(dentro_da_caixa(lats, lons, caixa_envolvente(lat, lon, raio_m)))
+    distancias = haversine_m(lat, lon, lats[candidatos], lons[candidatos])
+    dentro = distancias <= raio_m
+    return candidatos[dentro], distancias[dentro]
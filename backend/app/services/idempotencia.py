@@ -0,0 +1,238 @@
+"""
+Registro de chaves de idempotência (`Idempotency-Key`) das mutações de corrida.
+
+Apps em redes instáveis repetem o mesmo POST várias vezes. A primeira
+requisição com uma chave reserva a entrada; quando termina, a resposta
+(status, cabeçalhos e corpo já serializado) fica guardada por
+`IDEMPOTENCIA_TTL_S`. As repetições recebem essa resposta sem executar o
+endpoint nem tocar no banco. Uma repetição que chega enquanto a primeira
+ainda está em andamento recebe 409, e a mesma chave com outro corpo, 422.
+
+As chaves ficam no Postgres (`chaves_idempotencia`, via
+`ArmazenamentoIdempotencia`), então uma repetição que cai em outro worker
+também é reconhecida. Na frente dele, cada processo mantém um LRU com TTL
+(`RegistroIdempotencia`, limitado a `IDEMPOTENCIA_CAPACIDADE` entradas) que
+responde às repetições que voltam ao mesmo worker sem ir ao banco.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, null, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.db import async_session
+from app.core.models.idempotencia import ChaveIdempotencia
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+@dataclass(frozen=True, slots=True)
+class RespostaGuardada:
+    status_code: int
+    headers: tuple[tuple[bytes, bytes], ...]
+    body: bytes
+
+
+@dataclass(slots=True)
+class _Entrada:
+    digest: bytes  # hash do corpo da requisição original
+    expira_em: float
+    resposta: RespostaGuardada | None = None  # None enquanto a primeira requisição não termina
+
+
+def digest_corpo(corpo: bytes) -> bytes:
+    return hashlib.blake2b(corpo, digest_size=16).digest()
+
+
+def digest_chave(chave: tuple) -> bytes:
+    """Chave primária no banco: hash de (escopo, caminho, Idempotency-Key)."""
+    h = hashlib.blake2b(digest_size=32)
+    for parte in chave:
+        parte = parte if isinstance(parte, bytes) else str(parte).encode()
+        h.update(len(parte).to_bytes(4, "big"))
+        h.update(parte)
+    return h.digest()
+
+
+class EmAndamento(Exception):
+    """Já existe uma requisição com esta chave sendo executada."""
+
+
+class CorpoDiferente(Exception):
+    """A chave já foi usada com outro corpo de requisição."""
+
+
+class RegistroIdempotencia:
+    def __init__(
+        self,
+        capacidade: int = settings.IDEMPOTENCIA_CAPACIDADE,
+        ttl_s: float = settings.IDEMPOTENCIA_TTL_S,
+    ):
+        self.capacidade = capacidade
+        self.ttl_s = ttl_s
+        self._itens: OrderedDict[tuple, _Entrada] = OrderedDict()
+        self.repetidas = 0
+        self.executadas = 0
+        self.conflitos = 0
+        self.despejados = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def reservar(self, chave: tuple, digest: bytes, agora: float | None = None) -> RespostaGuardada | None:
+        """
+        Resposta guardada para a chave, ou None se esta requisição deve executar.
+
+        No segundo caso a chave fica reservada até `concluir` ou `liberar`.
+        """
+        agora = time.monotonic() if agora is None else agora
+        entrada = self._itens.get(chave)
+        if entrada is not None and agora >= entrada.expira_em:
+            del self._itens[chave]
+            entrada = None
+        if entrada is None:
+            self._itens[chave] = _Entrada(digest, agora + self.ttl_s)
+            self._despejar()
+            self.executadas += 1
+            return None
+        if entrada.digest != digest:
+            self.conflitos += 1
+            raise CorpoDiferente
+        if entrada.resposta is None:
+            self.conflitos += 1
+            raise EmAndamento
+        self._itens.move_to_end(chave)
+        self.repetidas += 1
+        return entrada.resposta
+
+    def concluir(self, chave: tuple, resposta: RespostaGuardada, agora: float | None = None) -> None:
+        entrada = self._itens.get(chave)
+        if entrada is not None:
+            entrada.resposta = resposta
+            entrada.expira_em = (time.monotonic() if agora is None else agora) + self.ttl_s
+
+    def liberar(self, chave: tuple) -> None:
+        """A requisição falhou sem resposta definitiva (erro 5xx): a próxima tentativa executa de novo."""
+        entrada = self._itens.get(chave)
+        if entrada is not None and entrada.resposta is None:
+            del self._itens[chave]
+
+    def _despejar(self) -> None:
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+            self.despejados += 1
+
+    def metricas(self) -> dict:
+        return {
+            'tamanho': len(self._itens),
+            'capacidade': self.capacidade,
+            'executadas': self.executadas,
+            'repetidas': self.repetidas,
+            'conflitos': self.conflitos,
+            'despejados': self.despejados,
+        }
+
+
+class ArmazenamentoIdempotencia:
+    """Chaves de idempotência no Postgres, visíveis a todos os workers."""
+
+    def __init__(
+        self,
+        ttl_s: float = settings.IDEMPOTENCIA_TTL_S,
+        prazo_execucao_s: float = settings.IDEMPOTENCIA_PRAZO_EXECUCAO_S,
+    ):
+        self.ttl_s = ttl_s
+        self.prazo_execucao_s = prazo_execucao_s
+
+    async def reservar(self, chave: tuple, digest: bytes) -> RespostaGuardada | None:
+        """Mesmo contrato de `RegistroIdempotencia.reservar`, com a reserva gravada no banco."""
+        id_chave = digest_chave(chave)
+        expira_em = datetime.now(timezone.utc) + timedelta(seconds=self.prazo_execucao_s)
+        # insere, ou reaproveita a linha de uma chave já expirada
+        statement = insert(ChaveIdempotencia).values(chave=id_chave, digest=digest, expira_em=expira_em)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ChaveIdempotencia.chave],
+            set_={
+                'digest': statement.excluded.digest,
+                'status_code': null(),
+                'headers': null(),
+                'corpo': null(),
+                'expira_em': statement.excluded.expira_em,
+            },
+            where=ChaveIdempotencia.expira_em < func.now(),
+        ).returning(ChaveIdempotencia.chave)
+        async with async_session() as session:
+            reservada = (await session.execute(statement)).first()
+            await session.commit()
+            if reservada is not None:
+                return None
+            linha = (
+                await session.execute(
+                    select(
+                        ChaveIdempotencia.digest,
+                        ChaveIdempotencia.status_code,
+                        ChaveIdempotencia.headers,
+                        ChaveIdempotencia.corpo,
+                    ).where(ChaveIdempotencia.chave == id_chave)
+                )
+            ).first()
+        if linha is None:
+            # removida entre o INSERT e o SELECT (liberada ou limpa): trata como em andamento
+            raise EmAndamento
+        if bytes(linha.digest) != digest:
+            raise CorpoDiferente
+        if linha.status_code is None:
+            raise EmAndamento
+        headers = tuple((k.encode("latin-1"), v.encode("latin-1")) for k, v in linha.headers or ())
+        return RespostaGuardada(linha.status_code, headers, bytes(linha.corpo or b""))
+
+    async def concluir(self, chave: tuple, resposta: RespostaGuardada) -> None:
+        async with async_session() as session:
+            await session.execute(
+                update(ChaveIdempotencia)
+                .where(ChaveIdempotencia.chave == digest_chave(chave))
+                .values(
+                    status_code=resposta.status_code,
+                    headers=[[k.decode("latin-1"), v.decode("latin-1")] for k, v in resposta.headers],
+                    corpo=resposta.body,
+                    expira_em=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_s),
+                )
+            )
+            await session.commit()
+
+    async def liberar(self, chave: tuple) -> None:
+        async with async_session() as session:
+            await session.execute(
+                delete(ChaveIdempotencia).where(
+                    ChaveIdempotencia.chave == digest_chave(chave), ChaveIdempotencia.status_code.is_(None)
+                )
+            )
+            await session.commit()
+
+    async def limpar_expiradas(self) -> int:
+        async with async_session() as session:
+            resultado = await session.execute(delete(ChaveIdempotencia).where(ChaveIdempotencia.expira_em < func.now()))
+            await session.commit()
+        return resultado.rowcount
+
+    async def executar(self, intervalo_s: float = settings.IDEMPOTENCIA_LIMPEZA_S) -> None:
+        """Laço de limpeza das chaves vencidas; roda durante toda a vida do processo."""
+        while True:
+            await asyncio.sleep(intervalo_s)
+            try:
+                await self.limpar_expiradas()
+            except Exception:
+                logger.exception("Falha ao limpar chaves de idempotência expiradas")
+
+
+registro_idempotencia = RegistroIdempotencia()
+armazenamento_idempotencia = ArmazenamentoIdempotencia()
@@ -0,0 +1,296 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_session
+from app.services.demanda import PainelDemanda, painel_demanda, zona
+from app.services.geo import METROS_POR_GRAU, RAIO_TERRA_M
+from app.users.models.users import User
+
+logger = logging.getLogger(__name__)
+
+# ~1,1 km de lado no eixo da latitude
+TAMANHO_CELULA_GRAUS = 0.01
+
+
+def distancia_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância em metros entre dois pontos (haversine escalar; ver `geo` para lotes)."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_M * math.asin(math.sqrt(a))
+
+
+class IndiceMotoristas:
+    """
+    Índice espacial em memória (por processo) dos motoristas disponíveis.
+
+    Os motoristas ficam em baldes de uma grade regular de latitude/longitude,
+    de modo que a busca por raio só visita as células que intersectam o raio.
+
+    Cada motorista guarda o instante do último ping; quem não envia posição
+    há mais de `ttl_s` deixa de ser candidato e sai do índice. Como cada
+    worker só recebe os pings das conexões dele, `executar` ressincroniza o
+    índice com as posições gravadas no banco (`users.localizacao_em`) a cada
+    `INDICE_MOTORISTAS_RESSINCRONIZAR_S`.
+    """
+
+    def __init__(
+        self,
+        tamanho_celula: float = TAMANHO_CELULA_GRAUS,
+        painel: PainelDemanda | None = None,
+        ttl_s: float = settings.INDICE_MOTORISTAS_TTL_S,
+    ):
+        self.tamanho_celula = tamanho_celula
+        self.ttl_s = ttl_s
+        # contagem de oferta por zona, mantida a cada movimento de motorista
+        self.painel = painel
+        self._celulas: dict[tuple[int, int], dict[int, tuple[float, float]]] = {}
+        self._motoristas: dict[int, tuple[int, int]] = {}
+        # instante (epoch) do último ping de cada motorista; fica mesmo após `remover`
+        # (até a poda) para que a ressincronização não traga de volta uma posição anterior
+        self._visto_em: dict[int, float] = {}
+        # disponibilidade conhecida de cada motorista (ativo e sem corrida em andamento):
+        # quem está marcado como indisponível não volta ao índice pelos pings
+        self._disponivel: dict[int, bool] = {}
+        self._lock_carga = asyncio.Lock()
+        self._tarefa_carga: asyncio.Task | None = None
+        self.carregado = False
+
+    def __len__(self) -> int:
+        return len(self._motoristas)
+
+    def __contains__(self, motorista_id: int) -> bool:
+        return motorista_id in self._motoristas
+
+    def celula(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lat / self.tamanho_celula), math.floor(lon / self.tamanho_celula))
+
+    def atualizar(self, motorista_id: int, lat: float, lon: float, visto_em: float | None = None) -> None:
+        """Insere ou move o motorista para a célula da nova posição (ignora posições mais antigas que a atual)."""
+        if self._disponivel.get(motorista_id) is False:
+            return
+        visto_em = time.time() if visto_em is None else visto_em
+        if visto_em < self._visto_em.get(motorista_id, float("-inf")):
+            return
+        self._visto_em[motorista_id] = visto_em
+        nova = self.celula(lat, lon)
+        antiga = self._motoristas.get(motorista_id)
+        zona_antiga = None
+        if antiga is not None:
+            zona_antiga = zona(*self._celulas[antiga][motorista_id])
+            if antiga != nova:
+                self._retirar_da_celula(motorista_id, antiga)
+        self._celulas.setdefault(nova, {})[motorista_id] = (lat, lon)
+        self._motoristas[motorista_id] = nova
+        if self.painel is not None:
+            self.painel.mover_motorista(zona_antiga, zona(lat, lon))
+
+    def remover(self, motorista_id: int) -> None:
+        """Retira o motorista do índice (ficou indisponível ou offline)."""
+        celula = self._motoristas.pop(motorista_id, None)
+        if celula is not None:
+            if self.painel is not None:
+                self.painel.mover_motorista(zona(*self._celulas[celula][motorista_id]), None)
+            self._retirar_da_celula(motorista_id, celula)
+
+    def disponivel(self, motorista_id: int) -> bool:
+        """
+        Se o motorista pode entrar no índice: só quem foi marcado indisponível (inativo ou em
+        corrida) fica de fora. Quem este processo ainda não conhece conta como disponível,
+        como em `atualizar`; a ressincronização corrige em até um intervalo.
+        """
+        return self._disponivel.get(motorista_id, True)
+
+    def definir_disponivel(self, motorista_id: int, disponivel: bool) -> None:
+        """Marca a disponibilidade do motorista; indisponível sai do índice na hora."""
+        self._disponivel[motorista_id] = disponivel
+        if not disponivel:
+            self.remover(motorista_id)
+
+    def ocupar(self, motorista_id: int) -> None:
+        """Retira o motorista do índice até `liberar`, mesmo que continue enviando posições."""
+        self.definir_disponivel(motorista_id, False)
+
+    def liberar(self, motorista_id: int) -> None:
+        """Motorista volta a ficar disponível; reentra no índice no próximo ping."""
+        self.definir_disponivel(motorista_id, True)
+
+    def _expirado(self, motorista_id: int, limite: float) -> bool:
+        return self._visto_em.get(motorista_id, float("-inf")) < limite
+
+    def podar(self, agora: float | None = None) -> int:
+        """Retira os motoristas sem ping há mais de `ttl_s`; devolve quantos saíram."""
+        limite = (time.time() if agora is None else agora) - self.ttl_s
+        expirados = [m for m, visto_em in self._visto_em.items() if visto_em < limite]
+        for motorista_id in expirados:
+            self.remover(motorista_id)
+            del self._visto_em[motorista_id]
+        return len(expirados)
+
+    def posicao(self, motorista_id: int) -> tuple[float, float] | None:
+        celula = self._motoristas.get(motorista_id)
+        return None if celula is None else self._celulas[celula][motorista_id]
+
+    def _retirar_da_celula(self, motorista_id: int, celula: tuple[int, int]) -> None:
+        balde = self._celulas.get(celula)
+        if balde is None:
+            return
+        balde.pop(motorista_id, None)
+        if not balde:
+            del self._celulas[celula]
+
+    def proximos(self, lat: float, lon: float, raio_m: float) -> list[tuple[int, float]]:
+        """
+        Motoristas a até `raio_m` metros do ponto, como (id, distância em metros).
+
+        O custo é proporcional ao número de células tocadas pelo raio, não ao
+        total de motoristas indexados.
+        """
+        dlat = raio_m / METROS_POR_GRAU
+        dlon = raio_m / (METROS_POR_GRAU * max(math.cos(math.radians(lat)), 1e-6))
+        lat_min, lon_min = self.celula(lat - dlat, lon - dlon)
+        lat_max, lon_max = self.celula(lat + dlat, lon + dlon)
+
+        limite = time.time() - self.ttl_s
+        encontrados = []
+        expirados = []
+        for i in range(lat_min, lat_max + 1):
+            for j in range(lon_min, lon_max + 1):
+                balde = self._celulas.get((i, j))
+                if not balde:
+                    continue
+                for motorista_id, (m_lat, m_lon) in balde.items():
+                    if self._expirado(motorista_id, limite):
+                        expirados.append(motorista_id)
+                        continue
+                    distancia = distancia_m(lat, lon, m_lat, m_lon)
+                    if distancia <= raio_m:
+                        encontrados.append((motorista_id, distancia))
+        for motorista_id in expirados:
+            self.remover(motorista_id)
+        return encontrados
+
+    def mais_proximos(self, lat: float, lon: float, k: int, raio_max_m: float) -> list[tuple[int, float]]:
+        """
+        Os `k` motoristas mais próximos (até `raio_max_m`), ordenados por distância.
+
+        Visita anéis de células a partir da célula do ponto e para assim que
+        já existem `k` motoristas dentro do raio garantidamente coberto, sem
+        percorrer todos os motoristas do raio máximo.
+        """
+        lado_m = self.tamanho_celula * METROS_POR_GRAU * max(math.cos(math.radians(lat)), 1e-6)
+        ci, cj = self.celula(lat, lon)
+        limite = time.time() - self.ttl_s
+        candidatos: list[tuple[float, int]] = []
+        expirados = []
+        anel = 0
+        while True:
+            for i, j in _anel_de_celulas(ci, cj, anel):
+                balde = self._celulas.get((i, j))
+                if not balde:
+                    continue
+                for motorista_id, (m_lat, m_lon) in balde.items():
+                    if self._expirado(motorista_id, limite):
+                        expirados.append(motorista_id)
+                        continue
+                    distancia = distancia_m(lat, lon, m_lat, m_lon)
+                    if distancia <= raio_max_m:
+                        candidatos.append((distancia, motorista_id))
+            # tudo a menos de `coberto` metros do ponto já foi visitado
+            coberto = anel * lado_m
+            if coberto >= raio_max_m or sum(1 for d, _ in candidatos if d <= coberto) >= k:
+                break
+            anel += 1
+        # motoristas sem ping recente saem aqui mesmo, antes da próxima poda periódica
+        for motorista_id in expirados:
+            self.remover(motorista_id)
+        return [(motorista_id, distancia) for distancia, motorista_id in heapq.nsmallest(k, candidatos)]
+
+    async def ressincronizar(self, session: AsyncSession) -> int:
+        """
+        Traz do banco os motoristas com posição recente (gravada por qualquer worker).
+
+        A disponibilidade vem do banco: quem foi atribuído a uma corrida ou
+        desativado em outro worker sai do índice. Só move quem tem no banco uma
+        posição mais nova que a do índice; depois poda os que ficaram sem ping
+        há mais de `ttl_s`.
+        """
+        desde = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_s)
+        statement = select(
+            User.id,
+            func.ST_Y(User.current_location),
+            func.ST_X(User.current_location),
+            User.localizacao_em,
+            User.is_active & User.is_available.isnot(False),
+        ).where(
+            User.role == 'driver',
+            User.current_location.isnot(None),
+            User.localizacao_em >= desde,
+        )
+        linhas = (await session.execute(statement)).all()
+        for motorista_id, lat, lon, localizacao_em, disponivel in linhas:
+            self.definir_disponivel(motorista_id, disponivel)
+            if disponivel:
+                self.atualizar(motorista_id, lat, lon, localizacao_em.timestamp())
+        self.podar()
+        return len(linhas)
+
+    async def aquecer(self, session: AsyncSession) -> None:
+        """Primeira carga, feita uma única vez, das posições dos motoristas disponíveis."""
+        if self.carregado:
+            return
+        async with self._lock_carga:
+            if self.carregado:
+                return
+            await self.ressincronizar(session)
+            self.carregado = True
+
+    def aquecer_em_segundo_plano(self) -> None:
+        """Dispara a carga sem bloquear quem chamou; usa uma sessão própria."""
+        if self.carregado or self._tarefa_carga is not None:
+            return
+        self._tarefa_carga = asyncio.get_running_loop().create_task(self._aquecer_com_sessao_propria())
+
+    async def _aquecer_com_sessao_propria(self) -> None:
+        try:
+            async with async_session() as session:
+                await self.aquecer(session)
+        finally:
+            self._tarefa_carga = None
+
+    async def executar(self, intervalo_s: float = settings.INDICE_MOTORISTAS_RESSINCRONIZAR_S) -> None:
+        """Laço de ressincronização com o banco; roda durante toda a vida do processo."""
+        while True:
+            await asyncio.sleep(intervalo_s)
+            try:
+                async with async_session() as session:
+                    await self.ressincronizar(session)
+                self.carregado = True
+            except Exception:
+                logger.exception("Falha ao ressincronizar o índice de motoristas")
+
+
+def _anel_de_celulas(ci: int, cj: int, anel: int):
+    """Células na borda do quadrado de raio `anel` centrado em (ci, cj)."""
+    if anel == 0:
+        yield ci, cj
+        return
+    for j in range(cj - anel, cj + anel + 1):
+        yield ci - anel, j
+        yield ci + anel, j
+    for i in range(ci - anel + 1, ci + anel):
+        yield i, cj - anel
+        yield i, cj + anel
+
+
+indice_motoristas = IndiceMotoristas(painel=painel_demanda)
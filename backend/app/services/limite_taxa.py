@@ -0,0 +1,77 @@
+"""
+Limite de taxa por token bucket, em memória e por processo.
+
+Cada (grupo de rotas, usuário ou IP) tem um balde com até `rajada` fichas
+que se repõem a `taxa` por segundo. Não há tarefa repondo fichas: o balde
+guarda só (fichas, instante da última consulta) e a reposição é calculada
+quando ele é consultado de novo. Baldes que já estariam cheios são
+descartados a cada `INTERVALO_LIMPEZA_S`, então o dicionário só guarda
+quem fez requisições recentemente.
+
+Por ser por processo, cada worker aplica o orçamento inteiro de
+`LIMITE_TAXA`: o limite global de um cliente fica entre 1× (conexão
+keep-alive num só worker) e `WEB_CONCURRENCY`× o configurado.
+"""
+
+import time
+
+from app.core.config import settings
+
+INTERVALO_LIMPEZA_S = 60.0
+
+
+class LimitadorTaxa:
+    def __init__(self, orcamentos: dict[str, tuple[float, int]]):
+        # grupo -> (fichas por segundo, rajada)
+        self.orcamentos = {grupo: (float(taxa), float(rajada)) for grupo, (taxa, rajada) in orcamentos.items()}
+        self._baldes: dict[tuple[str, str], tuple[float, float]] = {}
+        self._ultima_limpeza = time.monotonic()
+        self.permitidas = 0
+        self.rejeitadas = 0
+        self.despejados = 0
+
+    def __len__(self) -> int:
+        return len(self._baldes)
+
+    def consumir(self, grupo: str, chave: str, agora: float | None = None) -> float:
+        """Gasta uma ficha; devolve 0 se a requisição pode seguir, ou quantos segundos esperar."""
+        orcamento = self.orcamentos.get(grupo)
+        if orcamento is None:
+            return 0.0
+        taxa, rajada = orcamento
+        agora = time.monotonic() if agora is None else agora
+        if agora - self._ultima_limpeza >= INTERVALO_LIMPEZA_S:
+            self.despejar(agora)
+        fichas, ultimo = self._baldes.get((grupo, chave), (rajada, agora))
+        fichas = min(rajada, fichas + (agora - ultimo) * taxa)
+        if fichas < 1.0:
+            self._baldes[(grupo, chave)] = (fichas, agora)
+            self.rejeitadas += 1
+            return (1.0 - fichas) / taxa
+        self._baldes[(grupo, chave)] = (fichas - 1.0, agora)
+        self.permitidas += 1
+        return 0.0
+
+    def despejar(self, agora: float | None = None) -> None:
+        """Remove os baldes que, com a reposição, já estariam cheios (equivalem a não existir)."""
+        agora = time.monotonic() if agora is None else agora
+        self._ultima_limpeza = agora
+        cheios = []
+        for (grupo, chave), (fichas, ultimo) in self._baldes.items():
+            taxa, rajada = self.orcamentos[grupo]
+            if fichas + (agora - ultimo) * taxa >= rajada:
+                cheios.append((grupo, chave))
+        for balde in cheios:
+            del self._baldes[balde]
+        self.despejados += len(cheios)
+
+    def metricas(self) -> dict:
+        return {
+            'baldes': len(self._baldes),
+            'permitidas': self.permitidas,
+            'rejeitadas': self.rejeitadas,
+            'despejados': self.despejados,
+        }
+
+
+limitador_taxa = LimitadorTaxa(settings.LIMITE_TAXA)
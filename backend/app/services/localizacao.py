@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, Float, Integer, column, func, update, values
+
+from app.core.config import settings
+from app.core.db import async_session
+from app.services.indice_motoristas import indice_motoristas
+from app.users.models.users import User
+
+logger = logging.getLogger(__name__)
+
+# 4 parâmetros por linha, bem abaixo do limite de 65535 binds do Postgres
+TAMANHO_LOTE = 1000
+
+
+class BufferLocalizacoes:
+    """
+    Acumula em memória as posições enviadas pelos motoristas e grava no banco
+    em lote, periodicamente.
+
+    Cada motorista ocupa uma única entrada (só a posição mais recente importa),
+    então o custo de escrita por intervalo é proporcional ao número de
+    motoristas que se moveram, e não ao número de pings recebidos.
+    """
+
+    def __init__(
+        self,
+        intervalo_s: float = settings.LOCALIZACAO_INTERVALO_FLUSH_S,
+        ttl_s: float = settings.INDICE_MOTORISTAS_TTL_S,
+    ):
+        self.intervalo_s = intervalo_s
+        self.ttl_s = ttl_s
+        # posição mais recente de cada motorista e o instante em que o servidor a recebeu
+        self._pendentes: dict[int, tuple[float, float, datetime]] = {}
+        # `registrado_em` do último ping aceito e quando chegou (monotônico), para descartar
+        # pings fora de ordem; some junto com o motorista do índice, após `ttl_s` sem pings
+        self._ultimo_registro: dict[int, tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pendentes)
+
+    def registrar(self, motorista_id: int, lat: float, lon: float, registrado_em: datetime | None = None) -> bool:
+        """
+        Guarda a posição do motorista e, se ele estiver disponível, atualiza o índice espacial.
+
+        Pings com `registrado_em` mais antigo que o último aceito (chegaram fora
+        de ordem) são descartados. Retorna se a posição foi aceita.
+        """
+        if registrado_em is not None:
+            instante = registrado_em.timestamp()
+            ultimo = self._ultimo_registro.get(motorista_id)
+            if ultimo is not None and instante <= ultimo[0]:
+                return False
+            self._ultimo_registro[motorista_id] = (instante, time.monotonic())
+        recebido_em = datetime.now(timezone.utc)
+        self._pendentes[motorista_id] = (lat, lon, recebido_em)
+        # motorista em corrida ou inativo continua tendo a posição gravada, mas não volta a ser candidato
+        if indice_motoristas.disponivel(motorista_id):
+            indice_motoristas.atualizar(motorista_id, lat, lon, recebido_em.timestamp())
+        return True
+
+    def podar(self, agora: float | None = None) -> int:
+        """Esquece o último ping de quem está há mais de `ttl_s` sem enviar; devolve quantos."""
+        limite = (time.monotonic() if agora is None else agora) - self.ttl_s
+        expirados = [m for m, (_, recebido_em) in self._ultimo_registro.items() if recebido_em < limite]
+        for motorista_id in expirados:
+            del self._ultimo_registro[motorista_id]
+        return len(expirados)
+
+    async def descarregar(self) -> int:
+        """Grava as posições pendentes com um UPDATE ... FROM (VALUES ...) por lote."""
+        if not self._pendentes:
+            return 0
+        pendentes, self._pendentes = self._pendentes, {}
+        linhas = [(motorista_id, lat, lon, recebido_em) for motorista_id, (lat, lon, recebido_em) in pendentes.items()]
+        try:
+            async with async_session() as session:
+                for inicio in range(0, len(linhas), TAMANHO_LOTE):
+                    await session.execute(atualizar_localizacoes_stmt(linhas[inicio : inicio + TAMANHO_LOTE]))
+                await session.commit()
+        except Exception:
+            # devolve o que não foi gravado, sem sobrescrever posições que chegaram depois
+            for motorista_id, posicao in pendentes.items():
+                self._pendentes.setdefault(motorista_id, posicao)
+            raise
+        return len(linhas)
+
+    async def executar(self) -> None:
+        """Laço de gravação periódica; roda durante toda a vida do processo."""
+        while True:
+            await asyncio.sleep(self.intervalo_s)
+            self.podar()
+            try:
+                await self.descarregar()
+            except Exception:
+                logger.exception("Falha ao gravar localizações dos motoristas")
+
+
+def atualizar_localizacoes_stmt(linhas: list[tuple[int, float, float, datetime]]):
+    """UPDATE users ... FROM (VALUES (id, lat, lon, recebido_em), ...) para um lote de motoristas."""
+    v = values(
+        column("id", Integer),
+        column("lat", Float),
+        column("lon", Float),
+        column("recebido_em", DateTime(timezone=True)),
+        name="v",
+    ).data(linhas)
+    return (
+        update(User)
+        .where(User.id == v.c.id)
+        .values(
+            current_location=func.ST_SetSRID(func.ST_MakePoint(v.c.lon, v.c.lat), 4326),
+            localizacao_em=v.c.recebido_em,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+buffer_localizacoes = BufferLocalizacoes()
@@ -0,0 +1,101 @@
+"""
+Consumidor assíncrono de `LISTEN/NOTIFY` do Postgres.
+
+Uma conexão dedicada (autocommit) escuta os canais registrados; cada
+notificação vira uma tarefa asyncio, com no máximo `max_concorrencia`
+tratadores rodando ao mesmo tempo. Quando o limite é atingido, a leitura
+de novas notificações espera (elas ficam no buffer da conexão), então a
+memória não cresce sem limite sob rajadas.
+
+NOTIFY não é persistido: o que for enviado enquanto a conexão estiver caída
+se perde. Por isso os tratadores devem ser idempotentes e `ao_conectar`
+permite ressincronizar o estado a cada (re)conexão.
+"""
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import psycopg
+from psycopg import sql
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Tratador = Callable[[dict | str], Awaitable[None]]
+
+ESPERA_RECONEXAO_MAX_S = 30.0
+
+
+def dsn_psycopg() -> str:
+    """A URL do SQLAlchemy (`postgresql+psycopg://`) no formato aceito pelo psycopg."""
+    return str(settings.SQLALCHEMY_DATABASE_URI).replace("postgresql+psycopg://", "postgresql://", 1)
+
+
+def _decodificar(payload: str) -> dict | str:
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return payload
+
+
+class OuvinteNotificacoes:
+    def __init__(self, max_concorrencia: int = settings.EVENTOS_MAX_CONCORRENCIA):
+        self._tratadores: dict[str, list[Tratador]] = {}
+        self._ao_conectar: list[Callable[[], Awaitable[None] | None]] = []
+        self._semaforo = asyncio.Semaphore(max_concorrencia)
+        self._tarefas: set[asyncio.Task] = set()
+        self.recebidas = 0
+        self.falhas = 0
+
+    def registrar(self, canal: str, tratador: Tratador) -> None:
+        self._tratadores.setdefault(canal, []).append(tratador)
+
+    def ao_conectar(self, funcao: Callable[[], Awaitable[None] | None]) -> None:
+        self._ao_conectar.append(funcao)
+
+    async def _tratar(self, tratador: Tratador, canal: str, payload: dict | str) -> None:
+        try:
+            await tratador(payload)
+        except Exception:
+            self.falhas += 1
+            logger.exception("Falha ao tratar notificação do canal %s", canal)
+        finally:
+            self._semaforo.release()
+
+    async def consumir(self, notificacoes: AsyncIterator) -> None:
+        """Distribui as notificações (objetos com `channel` e `payload`) entre os tratadores."""
+        async for notificacao in notificacoes:
+            self.recebidas += 1
+            payload = _decodificar(notificacao.payload)
+            for tratador in self._tratadores.get(notificacao.channel, ()):
+                await self._semaforo.acquire()
+                tarefa = asyncio.create_task(self._tratar(tratador, notificacao.channel, payload))
+                self._tarefas.add(tarefa)
+                tarefa.add_done_callback(self._tarefas.discard)
+
+    async def aguardar_pendentes(self) -> None:
+        if self._tarefas:
+            await asyncio.gather(*self._tarefas, return_exceptions=True)
+
+    async def executar(self, dsn: str | None = None) -> None:
+        """Escuta os canais registrados para sempre, reconectando com backoff."""
+        espera_s = 1.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(dsn or dsn_psycopg(), autocommit=True) as conexao:
+                    for canal in self._tratadores:
+                        await conexao.execute(sql.SQL("LISTEN {}").format(sql.Identifier(canal)))
+                    logger.info("Escutando canais: %s", ", ".join(self._tratadores))
+                    espera_s = 1.0
+                    for funcao in self._ao_conectar:
+                        resultado = funcao()
+                        if asyncio.iscoroutine(resultado):
+                            await resultado
+                    await self.consumir(conexao.notifies())
+            except psycopg.OperationalError:
+                logger.exception("Conexão de LISTEN perdida; reconectando em %.0f s", espera_s)
+                await asyncio.sleep(espera_s)
+                espera_s = min(espera_s * 2, ESPERA_RECONEXAO_MAX_S)
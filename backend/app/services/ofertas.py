@@ -0,0 +1,234 @@
+"""
+Ofertas de corrida aos motoristas, com prazo para aceitar.
+
+Cada atribuição do despacho vira uma oferta ao motorista escolhido. Se ele
+recusar, ou não responder em `OFERTA_TIMEOUT_S`, a corrida volta para a fila
+do despacho sem aquele motorista e segue para o próximo candidato; a recusa
+entra no contador por zona usado em `calcular_multiplicador`.
+
+Os prazos ficam numa roda de temporizadores (hashed timing wheel) em vez de
+uma tarefa dormindo por oferta: agendar e cancelar custam O(1) e cada tick
+só percorre as ofertas que vencem naquele tick.
+
+A roda só existe no worker que fez o despacho e serve apenas para o prazo:
+aceite e recusa são validados pela linha da corrida (status `atribuida` para
+aquele motorista), então funcionam em qualquer worker.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Hashable
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_session
+from app.core.models.corrida import Corrida, StatusCorrida, transicao_stmt
+from app.services.demanda import PainelDemanda, painel_demanda
+from app.services.despacho import Atribuicao, Despachante, despachante
+from app.services.pubsub import pubsub_usuarios
+from app.users.models.users import User
+
+logger = logging.getLogger(__name__)
+
+RESOLUCAO_S = 0.5
+TAMANHO_RODA = 512  # ~4 min de horizonte com 0,5 s por casa; prazos maiores dão voltas
+
+
+class RodaTemporizadores:
+    """
+    Roda de temporizadores com `tamanho` casas de `resolucao_s` segundos.
+
+    Um prazo de `n` ticks vai para a casa `(atual + n) % tamanho`, com o número
+    de voltas completas que ainda faltam. `avancar` move o ponteiro uma casa e
+    devolve as chaves vencidas nela.
+    """
+
+    def __init__(self, resolucao_s: float = RESOLUCAO_S, tamanho: int = TAMANHO_RODA):
+        self.resolucao_s = resolucao_s
+        self._casas: list[dict[Hashable, int]] = [{} for _ in range(tamanho)]
+        self._casa_da_chave: dict[Hashable, int] = {}
+        self._atual = 0
+
+    def __len__(self) -> int:
+        return len(self._casa_da_chave)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return chave in self._casa_da_chave
+
+    def agendar(self, chave: Hashable, atraso_s: float) -> None:
+        self.cancelar(chave)
+        tamanho = len(self._casas)
+        ticks = max(1, math.ceil(atraso_s / self.resolucao_s))
+        casa = (self._atual + ticks) % tamanho
+        self._casas[casa][chave] = (ticks - 1) // tamanho
+        self._casa_da_chave[chave] = casa
+
+    def cancelar(self, chave: Hashable) -> bool:
+        casa = self._casa_da_chave.pop(chave, None)
+        if casa is None:
+            return False
+        del self._casas[casa][chave]
+        return True
+
+    def avancar(self) -> list[Hashable]:
+        self._atual = (self._atual + 1) % len(self._casas)
+        casa = self._casas[self._atual]
+        vencidas = []
+        for chave, voltas in list(casa.items()):
+            if voltas:
+                casa[chave] = voltas - 1
+            else:
+                del casa[chave]
+                del self._casa_da_chave[chave]
+                vencidas.append(chave)
+        return vencidas
+
+
+class AgendadorOfertas:
+    def __init__(
+        self,
+        despachante: Despachante,
+        painel: PainelDemanda,
+        timeout_s: float = settings.OFERTA_TIMEOUT_S,
+        resolucao_s: float = RESOLUCAO_S,
+    ):
+        self.despachante = despachante
+        self.painel = painel
+        self.timeout_s = timeout_s
+        self.roda = RodaTemporizadores(resolucao_s)
+        self._ofertas: dict[int, Atribuicao] = {}
+        self.aceitas = 0
+        self.recusadas = 0
+        self.expiradas = 0
+        despachante.ao_atribuir.append(self.ofertar)
+
+    def __len__(self) -> int:
+        return len(self._ofertas)
+
+    def ofertar(self, atribuicao: Atribuicao) -> None:
+        self._ofertas[atribuicao.corrida_id] = atribuicao
+        self.roda.agendar(atribuicao.corrida_id, self.timeout_s)
+        pubsub_usuarios.publicar(
+            atribuicao.motorista_id,
+            {
+                'oferta': atribuicao.corrida_id,
+                'lat_ini': atribuicao.lat,
+                'lon_ini': atribuicao.lon,
+                'tempo_chegada_min': atribuicao.tempo_chegada_min,
+                'expira_em_s': self.timeout_s,
+            },
+        )
+
+    def oferta(self, corrida_id: int, motorista_id: int) -> Atribuicao | None:
+        """Oferta pendente desta corrida para este motorista."""
+        oferta = self._ofertas.get(corrida_id)
+        return oferta if oferta is not None and oferta.motorista_id == motorista_id else None
+
+    def aceitar(self, corrida_id: int) -> None:
+        """Chamado depois de gravado o aceite: cancela o prazo."""
+        self.aceitas += 1
+        if self._ofertas.pop(corrida_id, None) is not None:
+            self.roda.cancelar(corrida_id)
+        self.despachante.aceita(corrida_id)
+
+    def descartar(self, corrida_id: int) -> None:
+        """A corrida já saiu de `atribuida` por outro caminho (ex.: cancelada): esquece a oferta e o prazo."""
+        if self._ofertas.pop(corrida_id, None) is not None:
+            self.roda.cancelar(corrida_id)
+            self.despachante.aceita(corrida_id)
+
+    async def devolver(self, session: AsyncSession, ofertas: list[Atribuicao]) -> list[Atribuicao]:
+        """Volta as corridas de `atribuida` para `aguardando` e libera os motoristas (sem commit)."""
+        devolvidas = []
+        for oferta in ofertas:
+            # só a atribuição deste motorista: a corrida pode ter voltado à fila e ido a outro
+            gravada = await session.execute(
+                transicao_stmt(
+                    oferta.corrida_id,
+                    StatusCorrida.ATRIBUIDA,
+                    StatusCorrida.AGUARDANDO,
+                    motorista_id=None,
+                    tempo_chegada_min=None,
+                ).where(Corrida.motorista_id == oferta.motorista_id)
+            )
+            if gravada.first() is not None:
+                devolvidas.append(oferta)
+        if devolvidas:
+            await session.execute(
+                update(User)
+                .where(User.id.in_([o.motorista_id for o in devolvidas]))
+                .values(is_available=True)
+                .execution_options(synchronize_session=False)
+            )
+        return devolvidas
+
+    def concluir_devolucao(self, ofertas: list[Atribuicao], expiradas: bool) -> None:
+        """
+        Depois do commit: recusas no painel, corrida de volta ao despacho e aviso ao passageiro.
+
+        Vale também para ofertas de outro worker (recusadas aqui): a corrida
+        entra na fila deste despacho, e o prazo lá vence sem efeito.
+        """
+        for oferta in ofertas:
+            if self._ofertas.pop(oferta.corrida_id, None) is not None:
+                self.roda.cancelar(oferta.corrida_id)
+            self.painel.registrar_recusa(oferta.lat, oferta.lon)
+            self.despachante.devolver(oferta)
+            pubsub_usuarios.publicar(
+                oferta.passageiro_id,
+                {'corrida_id': oferta.corrida_id, 'status': StatusCorrida.AGUARDANDO.value, 'motorista_id': None, 'tempo_chegada_min': None},
+            )
+            pubsub_usuarios.publicar(oferta.motorista_id, {'oferta': oferta.corrida_id, 'expirada': expiradas})
+            if expiradas:
+                self.expiradas += 1
+            else:
+                self.recusadas += 1
+
+    async def _expirar(self, corrida_ids: list[int]) -> None:
+        ofertas = [self._ofertas[c] for c in corrida_ids if c in self._ofertas]
+        if not ofertas:
+            return
+        async with async_session() as session:
+            devolvidas = await self.devolver(session, ofertas)
+            await session.commit()
+        self.concluir_devolucao(devolvidas, expiradas=True)
+        # as que não voltaram já mudaram de estado (aceitas, recusadas ou canceladas) por outra requisição
+        for oferta in ofertas:
+            if oferta not in devolvidas:
+                self.descartar(oferta.corrida_id)
+
+    async def executar(self) -> None:
+        resolucao = self.roda.resolucao_s
+        proximo = time.monotonic() + resolucao
+        while True:
+            await asyncio.sleep(max(0.0, proximo - time.monotonic()))
+            vencidas = []
+            # recupera os ticks perdidos se o loop atrasou
+            while proximo <= time.monotonic():
+                vencidas.extend(self.roda.avancar())
+                proximo += resolucao
+            if not vencidas:
+                continue
+            try:
+                await self._expirar(vencidas)
+            except Exception:
+                logger.exception("Falha ao expirar %s ofertas", len(vencidas))
+                # tenta de novo no próximo tick
+                for corrida_id in vencidas:
+                    if corrida_id in self._ofertas:
+                        self.roda.agendar(corrida_id, resolucao)
+
+    def metricas(self) -> dict:
+        return {
+            'pendentes': len(self._ofertas),
+            'aceitas': self.aceitas,
+            'recusadas': self.recusadas,
+            'expiradas': self.expiradas,
+        }
+
+
+agendador_ofertas = AgendadorOfertas(despachante, painel_demanda)
@@ -0,0 +1,112 @@
+"""
+Precificação vetorizada: todas as categorias (e vários trajetos) numa só passada.
+
+Segue exatamente as mesmas operações, na mesma ordem, de
+`app.services.corrida.calcular_preco`, de modo que o resultado é idêntico
+ao da função escalar para cada par (trajeto, categoria).
+"""
+
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from app.services.corrida import calcular_multiplicador
+
+
+def _somente_leitura(valores) -> np.ndarray:
+    array = np.ascontiguousarray(valores, dtype=np.float64)
+    array.setflags(write=False)
+    return array
+
+
+class MotorPrecos:
+    """
+    Tarifas das categorias guardadas como arrays NumPy (uma posição por categoria).
+
+    `calcular` devolve uma matriz (trajetos × categorias) de preços.
+    """
+
+    def __init__(self, regras: Sequence[Mapping]):
+        self.tarifa_base = _somente_leitura([r["tarifa_base"] for r in regras])
+        self.custo_por_km = _somente_leitura([r["custo_por_km"] for r in regras])
+        self.custo_por_minuto = _somente_leitura([r["custo_por_minuto"] for r in regras])
+        self.tarifa_minima = _somente_leitura([r["tarifa_minima"] for r in regras])
+
+    def __len__(self) -> int:
+        return len(self.tarifa_base)
+
+    def calcular(
+        self,
+        distancias_km,
+        duracoes_min,
+        multiplicadores,
+        taxa_combustivel_por_km: float = 0.0,
+        taxa_plataforma: float = 2.0,
+        pedagios=0.0,
+        descontos=0.0,
+    ) -> np.ndarray:
+        """
+        Preços para N trajetos × todas as categorias.
+
+        `distancias_km`, `duracoes_min`, `multiplicadores`, `pedagios` (total
+        por trajeto) e `descontos` podem ser escalares ou arrays de tamanho N.
+        """
+        coluna = lambda v: np.atleast_1d(np.asarray(v, dtype=np.float64))[:, np.newaxis]  # noqa: E731
+        distancias = coluna(distancias_km)
+        duracoes = coluna(duracoes_min)
+
+        preco = (
+            self.tarifa_base
+            + distancias * (self.custo_por_km + taxa_combustivel_por_km)
+            + duracoes * self.custo_por_minuto
+        )
+        preco *= coluna(multiplicadores)
+        preco += taxa_plataforma
+        preco += coluna(pedagios)
+        preco = np.maximum(preco, self.tarifa_minima)
+        preco -= coluna(descontos)
+        preco = np.maximum(preco, 0.0)
+        return arredondar_centavos(preco)
+
+    def cotar(
+        self,
+        distancia_km: float,
+        duracao_min: float,
+        passageiros_ativos: int,
+        motoristas_disponiveis: int,
+        tempo_espera_min: float,
+        recusas_motoristas: int = 0,
+        taxa_combustivel_por_km: float = 0.0,
+        taxa_plataforma: float = 2.0,
+        pedagios: list[float] | None = None,
+        desconto: float = 0.0,
+    ) -> list[float]:
+        """Mesma assinatura de `calcular_preco`, mas para todas as categorias de uma vez."""
+        multiplicador = calcular_multiplicador(
+            passageiros_ativos, motoristas_disponiveis, tempo_espera_min, recusas_motoristas
+        )
+        precos = self.calcular(
+            distancia_km,
+            duracao_min,
+            multiplicador,
+            taxa_combustivel_por_km=taxa_combustivel_por_km,
+            taxa_plataforma=taxa_plataforma,
+            pedagios=sum(pedagios) if pedagios else 0.0,
+            descontos=desconto,
+        )
+        return precos[0].tolist()
+
+
+def arredondar_centavos(precos: np.ndarray) -> np.ndarray:
+    """
+    Arredonda para 2 casas exatamente como o `round()` do Python.
+
+    `np.round` multiplica por 100 antes de arredondar e pode divergir do
+    `round()` perto de meio centavo (ex.: 1.005); só esses valores, raros,
+    passam pelo `round()` escalar.
+    """
+    arredondados = np.round(precos, 2)
+    fracao = np.abs(precos * 100 - np.floor(precos * 100) - 0.5)
+    for posicao in zip(*np.nonzero(fracao < 1e-6)):
+        arredondados[posicao] = round(float(precos[posicao]), 2)
+    return arredondados
@@ -0,0 +1,92 @@
+"""
+Pub/sub em memória, por usuário, para empurrar mudanças de estado da corrida
+às conexões abertas (SSE) em vez de o app ficar consultando.
+
+Cada assinatura é uma fila pequena. Só o estado mais recente importa, então
+se a fila encher o evento mais antigo é descartado e quem publica nunca
+espera.
+
+As filas são por processo. Quem muda a corrida publica direto no próprio
+processo; os demais workers recebem a mesma mudança pelo NOTIFY `corridas`
+(`ao_notificar_corrida`). Como o processo que gravou também recebe o NOTIFY,
+um evento igual ao último entregue ao usuário é descartado.
+"""
+
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
+from app.core.config import settings
+
+TAMANHO_FILA = 8
+
+
+class PubSubUsuarios:
+    def __init__(self, tamanho_fila: int = TAMANHO_FILA):
+        self.tamanho_fila = tamanho_fila
+        self._assinantes: dict[int, set[asyncio.Queue]] = {}
+        # último evento entregue a cada usuário com conexão aberta
+        self._ultimo: dict[int, dict] = {}
+
+    def __len__(self) -> int:
+        return sum(len(filas) for filas in self._assinantes.values())
+
+    @contextlib.asynccontextmanager
+    async def assinar(self, usuario_id: int) -> AsyncIterator[asyncio.Queue]:
+        fila: asyncio.Queue = asyncio.Queue(self.tamanho_fila)
+        self._assinantes.setdefault(usuario_id, set()).add(fila)
+        try:
+            yield fila
+        finally:
+            filas = self._assinantes.get(usuario_id)
+            if filas is not None:
+                filas.discard(fila)
+                if not filas:
+                    del self._assinantes[usuario_id]
+                    self._ultimo.pop(usuario_id, None)
+
+    def publicar(self, usuario_id: int, evento: dict) -> int:
+        """Entrega o evento a todas as conexões do usuário; devolve quantas receberam."""
+        filas = self._assinantes.get(usuario_id, ())
+        if not filas or self._ultimo.get(usuario_id) == evento:
+            return 0
+        self._ultimo[usuario_id] = evento
+        for fila in filas:
+            if fila.full():
+                fila.get_nowait()
+            fila.put_nowait(evento)
+        return len(filas)
+
+
+pubsub_usuarios = PubSubUsuarios()
+
+
+async def ao_notificar_corrida(payload) -> None:
+    """
+    Tratador do NOTIFY `corridas`: repassa mudanças gravadas em outros workers.
+
+    O passageiro recebe o estado da corrida; numa atribuição, o motorista
+    recebe a oferta, no mesmo formato de `AgendadorOfertas.ofertar`.
+    """
+    if not isinstance(payload, dict) or payload.get('passageiro_id') is None:
+        return
+    if payload['status'] == 'atribuida' and payload.get('motorista_id') is not None:
+        pubsub_usuarios.publicar(
+            payload['motorista_id'],
+            {
+                'oferta': payload['id'],
+                'lat_ini': payload.get('lat_ini'),
+                'lon_ini': payload.get('lon_ini'),
+                'tempo_chegada_min': payload.get('tempo_chegada_min'),
+                'expira_em_s': settings.OFERTA_TIMEOUT_S,
+            },
+        )
+    pubsub_usuarios.publicar(
+        payload['passageiro_id'],
+        {
+            'corrida_id': payload['id'],
+            'status': payload['status'],
+            'motorista_id': payload.get('motorista_id'),
+            'tempo_chegada_min': payload.get('tempo_chegada_min'),
+        },
+    )
@@ -0,0 +1,408 @@
+"""
+Roteamento viário offline, dentro da API, com hierarquias de contração (CH).
+
+O grafo da região (gerado a partir de um extrato OSM por
+`scripts/construir_grafo_viario.py`) fica em arrays NumPy no formato CSR:
+para cada nó, os arcos de saída ocupam `inicio[v]:inicio[v + 1]` dos arrays
+`destino`/`tempo_s`/`distancia_m`.
+
+O pré-processamento ordena os nós por importância e adiciona atalhos de modo
+que todo menor caminho possa ser encontrado subindo na hierarquia a partir
+da origem e a partir do destino. A consulta é uma busca bidirecional que só
+segue arcos "para cima" e visita algumas centenas de nós, em vez de
+milhões como um Dijkstra comum. O custo otimizado é o tempo; a distância é
+a do caminho mais rápido.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import geo
+from app.services.corrida import FATOR_DESVIO_VIARIO, VELOCIDADE_MEDIA_URBANA_KMH
+from app.services.indice_motoristas import distancia_m
+
+logger = logging.getLogger(__name__)
+
+INFINITO = math.inf
+TAMANHO_CELULA_GRAUS = 0.005
+ANEIS_MAXIMOS_BUSCA_NO = 4  # ~2 km ao redor do ponto
+VELOCIDADE_MAXIMA_KMH = 110.0
+
+
+@dataclass
+class GrafoViario:
+    """Grafo dirigido como lista de arcos (antes da contração)."""
+
+    lat: np.ndarray
+    lon: np.ndarray
+    origem: np.ndarray
+    destino: np.ndarray
+    tempo_s: np.ndarray
+    distancia_m: np.ndarray
+
+    @property
+    def total_nos(self) -> int:
+        return len(self.lat)
+
+
+@dataclass
+class Adjacencia:
+    """Arcos em formato CSR."""
+
+    inicio: np.ndarray
+    destino: np.ndarray
+    tempo_s: np.ndarray
+    distancia_m: np.ndarray
+
+    @classmethod
+    def de_arcos(cls, total_nos: int, origem, destino, tempo_s, distancia_m) -> "Adjacencia":
+        origem = np.asarray(origem, dtype=np.int64)
+        ordem = np.argsort(origem, kind="stable")
+        inicio = np.zeros(total_nos + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origem, minlength=total_nos), out=inicio[1:])
+        return cls(
+            inicio=inicio,
+            destino=np.asarray(destino, dtype=np.int32)[ordem],
+            tempo_s=np.asarray(tempo_s, dtype=np.float64)[ordem],
+            distancia_m=np.asarray(distancia_m, dtype=np.float64)[ordem],
+        )
+
+    def arcos(self, v: int):
+        a, b = self.inicio[v], self.inicio[v + 1]
+        return zip(self.destino[a:b].tolist(), self.tempo_s[a:b].tolist(), self.distancia_m[a:b].tolist())
+
+
+class _Contracao:
+    """Estado do pré-processamento (dicionários, descartado ao final)."""
+
+    def __init__(self, grafo: GrafoViario, limite_testemunha: int):
+        n = grafo.total_nos
+        self.limite_testemunha = limite_testemunha
+        self.saida: list[dict[int, tuple[float, float]]] = [{} for _ in range(n)]
+        self.entrada: list[dict[int, tuple[float, float]]] = [{} for _ in range(n)]
+        self.arestas: dict[tuple[int, int], tuple[float, float]] = {}
+        self.profundidade = [0] * n
+        for u, v, t, d in zip(
+            grafo.origem.tolist(), grafo.destino.tolist(), grafo.tempo_s.tolist(), grafo.distancia_m.tolist()
+        ):
+            if u != v:
+                self._adicionar(u, v, t, d)
+
+    def _adicionar(self, u: int, w: int, t: float, d: float) -> None:
+        atual = self.saida[u].get(w)
+        if atual is None or t < atual[0]:
+            self.saida[u][w] = (t, d)
+            self.entrada[w][u] = (t, d)
+            self.arestas[(u, w)] = (t, d)
+
+    def _testemunhas(self, origem: int, ignorar: int, custo_maximo: float) -> dict[int, float]:
+        """Dijkstra local a partir de `origem`, sem passar por `ignorar`, limitado em custo e nós."""
+        dist = {origem: 0.0}
+        heap = [(0.0, origem)]
+        assentados = 0
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            if d > custo_maximo or assentados >= self.limite_testemunha:
+                break
+            assentados += 1
+            for y, (t, _) in self.saida[x].items():
+                if y == ignorar:
+                    continue
+                nd = d + t
+                if nd < dist.get(y, INFINITO):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        return dist
+
+    def atalhos(self, v: int) -> list[tuple[int, int, float, float]]:
+        """Atalhos necessários para contrair `v` (caminhos u→v→w sem testemunha mais curta)."""
+        novos = []
+        saidas = self.saida[v]
+        if not saidas:
+            return novos
+        maior_saida = max(t for t, _ in saidas.values())
+        for u, (t_uv, d_uv) in self.entrada[v].items():
+            testemunhas = self._testemunhas(u, v, t_uv + maior_saida)
+            for w, (t_vw, d_vw) in saidas.items():
+                if w == u:
+                    continue
+                custo = t_uv + t_vw
+                if testemunhas.get(w, INFINITO) > custo:
+                    novos.append((u, w, custo, d_uv + d_vw))
+        return novos
+
+    def prioridade(self, v: int) -> int:
+        removidos = len(self.entrada[v]) + len(self.saida[v])
+        return len(self.atalhos(v)) - removidos + self.profundidade[v]
+
+    def contrair(self, v: int) -> None:
+        for u, w, t, d in self.atalhos(v):
+            self._adicionar(u, w, t, d)
+        for u in self.entrada[v]:
+            del self.saida[u][v]
+            self.profundidade[u] = max(self.profundidade[u], self.profundidade[v] + 1)
+        for w in self.saida[v]:
+            del self.entrada[w][v]
+            self.profundidade[w] = max(self.profundidade[w], self.profundidade[v] + 1)
+        self.saida[v] = {}
+        self.entrada[v] = {}
+
+
+class MotorRotas:
+    """Consultas de menor caminho (tempo e distância) sobre a hierarquia de contração."""
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, subida: Adjacencia, descida: Adjacencia):
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        # subida: arcos u→w com rank[u] < rank[w] (busca a partir da origem)
+        self.subida = subida
+        # descida: arcos u→w com rank[u] > rank[w], guardados invertidos em w (busca a partir do destino)
+        self.descida = descida
+        self._indexar_nos()
+
+    @property
+    def total_nos(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def construir(cls, grafo: GrafoViario, limite_testemunha: int = 500) -> "MotorRotas":
+        """Pré-processa o grafo (ordenação por diferença de arestas com atualização preguiçosa)."""
+        estado = _Contracao(grafo, limite_testemunha)
+        n = grafo.total_nos
+        heap = [(estado.prioridade(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        rank = np.full(n, -1, dtype=np.int64)
+        proximo_rank = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if rank[v] >= 0:
+                continue
+            prioridade = estado.prioridade(v)
+            if heap and prioridade > heap[0][0]:
+                heapq.heappush(heap, (prioridade, v))
+                continue
+            estado.contrair(v)
+            rank[v] = proximo_rank
+            proximo_rank += 1
+            if proximo_rank % 10000 == 0:
+                logger.info("Contração: %s de %s nós", proximo_rank, n)
+
+        total = len(estado.arestas)
+        pares = np.fromiter(
+            (x for par in estado.arestas.keys() for x in par), dtype=np.int64, count=2 * total
+        ).reshape(total, 2)
+        custos = np.fromiter(
+            (x for custo in estado.arestas.values() for x in custo), dtype=np.float64, count=2 * total
+        ).reshape(total, 2)
+        origem, destino = pares[:, 0], pares[:, 1]
+        tempo, distancia = custos[:, 0], custos[:, 1]
+        sobe = rank[origem] < rank[destino]
+        desce = ~sobe
+        subida = Adjacencia.de_arcos(n, origem[sobe], destino[sobe], tempo[sobe], distancia[sobe])
+        descida = Adjacencia.de_arcos(n, destino[desce], origem[desce], tempo[desce], distancia[desce])
+        return cls(grafo.lat, grafo.lon, subida, descida)
+
+    def salvar(self, caminho: str) -> None:
+        arrays = {"lat": self.lat, "lon": self.lon}
+        for nome, adjacencia in (("subida", self.subida), ("descida", self.descida)):
+            arrays[f"{nome}_inicio"] = adjacencia.inicio
+            arrays[f"{nome}_destino"] = adjacencia.destino
+            arrays[f"{nome}_tempo_s"] = adjacencia.tempo_s
+            arrays[f"{nome}_distancia_m"] = adjacencia.distancia_m
+        np.savez_compressed(caminho, **arrays)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> "MotorRotas":
+        with np.load(caminho) as dados:
+            adjacencias = {
+                nome: Adjacencia(
+                    inicio=dados[f"{nome}_inicio"],
+                    destino=dados[f"{nome}_destino"],
+                    tempo_s=dados[f"{nome}_tempo_s"],
+                    distancia_m=dados[f"{nome}_distancia_m"],
+                )
+                for nome in ("subida", "descida")
+            }
+            return cls(dados["lat"], dados["lon"], adjacencias["subida"], adjacencias["descida"])
+
+    def _indexar_nos(self) -> None:
+        """Grade de células → nós, para achar o nó mais próximo de uma coordenada."""
+        i = np.floor(self.lat / TAMANHO_CELULA_GRAUS).astype(np.int64)
+        j = np.floor(self.lon / TAMANHO_CELULA_GRAUS).astype(np.int64)
+        ordem = np.lexsort((j, i))
+        self._nos_por_celula = ordem
+        self._celulas: dict[tuple[int, int], tuple[int, int]] = {}
+        if not len(ordem):
+            return
+        chaves = np.stack((i[ordem], j[ordem]), axis=1)
+        mudou = np.flatnonzero(np.any(chaves[1:] != chaves[:-1], axis=1)) + 1
+        inicios = np.concatenate(([0], mudou))
+        fins = np.concatenate((mudou, [len(ordem)]))
+        for a, b in zip(inicios.tolist(), fins.tolist()):
+            self._celulas[(int(chaves[a, 0]), int(chaves[a, 1]))] = (a, b)
+
+    def no_mais_proximo(self, lat: float, lon: float) -> tuple[int, float] | None:
+        """(nó, distância em metros) do nó do grafo mais próximo da coordenada."""
+        ci = math.floor(lat / TAMANHO_CELULA_GRAUS)
+        cj = math.floor(lon / TAMANHO_CELULA_GRAUS)
+        for anel in range(1, ANEIS_MAXIMOS_BUSCA_NO + 1):
+            faixas = [
+                self._celulas[(i, j)]
+                for i in range(ci - anel, ci + anel + 1)
+                for j in range(cj - anel, cj + anel + 1)
+                if (i, j) in self._celulas
+            ]
+            if faixas:
+                candidatos = np.concatenate([self._nos_por_celula[a:b] for a, b in faixas])
+                distancias = geo.haversine_m(lat, lon, self.lat[candidatos], self.lon[candidatos])
+                melhor = int(np.argmin(distancias))
+                return int(candidatos[melhor]), float(distancias[melhor])
+        return None
+
+    @staticmethod
+    def _busca_ascendente(no: int, adjacencia: Adjacencia) -> dict[int, tuple[float, float]]:
+        """Dijkstra completo só por arcos "para cima": (tempo, distância) até cada nó alcançado."""
+        dist = {no: (0.0, 0.0)}
+        heap = [(0.0, no)]
+        while heap:
+            t, v = heapq.heappop(heap)
+            if t > dist[v][0]:
+                continue
+            d = dist[v][1]
+            for w, tw, dw in adjacencia.arcos(v):
+                nt = t + tw
+                if nt < dist.get(w, (INFINITO,))[0]:
+                    dist[w] = (nt, d + dw)
+                    heapq.heappush(heap, (nt, w))
+        return dist
+
+    def matriz(self, origens: list[int], destinos: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (tempo em s, distância em m) de cada origem a cada destino, N×M; inf onde não há caminho.
+
+        Many-to-many por baldes: uma busca para baixo por destino deixa em cada
+        nó alcançado um balde (destino, custo); depois uma busca para cima por
+        origem cruza com os baldes dos nós que alcança. São N + M buscas
+        pequenas em vez de N × M consultas.
+        """
+        tempos = np.full((len(origens), len(destinos)), INFINITO)
+        distancias = np.full((len(origens), len(destinos)), INFINITO)
+        baldes: dict[int, list[tuple[int, float, float]]] = {}
+        for j, destino in enumerate(destinos):
+            for v, (t, d) in self._busca_ascendente(destino, self.descida).items():
+                baldes.setdefault(v, []).append((j, t, d))
+        for i, origem in enumerate(origens):
+            linha_t, linha_d = tempos[i], distancias[i]
+            for v, (t, d) in self._busca_ascendente(origem, self.subida).items():
+                for j, tb, db in baldes.get(v, ()):
+                    if t + tb < linha_t[j]:
+                        linha_t[j] = t + tb
+                        linha_d[j] = d + db
+        return tempos, distancias
+
+    def menor_caminho(self, origem: int, destino: int) -> tuple[float, float] | None:
+        """(tempo em s, distância em m) do caminho mais rápido, ou None se não há caminho."""
+        if origem == destino:
+            return 0.0, 0.0
+        buscas = (
+            ({origem: (0.0, 0.0)}, [(0.0, origem)], self.subida),
+            ({destino: (0.0, 0.0)}, [(0.0, destino)], self.descida),
+        )
+        melhor = (INFINITO, INFINITO)
+        lado = 0
+        while buscas[0][1] or buscas[1][1]:
+            # alterna os lados; um lado cujo próximo nó já não melhora o resultado está encerrado
+            for _ in range(2):
+                heap = buscas[lado][1]
+                if heap and heap[0][0] < melhor[0]:
+                    break
+                heap.clear()
+                lado = 1 - lado
+            else:
+                break
+            dist, heap, adjacencia = buscas[lado]
+            outra = buscas[1 - lado][0]
+            t, v = heapq.heappop(heap)
+            if t > dist[v][0]:
+                continue
+            d = dist[v][1]
+            if v in outra and t + outra[v][0] < melhor[0]:
+                melhor = (t + outra[v][0], d + outra[v][1])
+            for w, tw, dw in adjacencia.arcos(v):
+                nt = t + tw
+                if nt < dist.get(w, (INFINITO,))[0]:
+                    dist[w] = (nt, d + dw)
+                    heapq.heappush(heap, (nt, w))
+            lado = 1 - lado
+        return None if melhor[0] == INFINITO else melhor
+
+    def trajeto(self, lat_ini: float, lon_ini: float, lat_fim: float, lon_fim: float) -> tuple[float, float] | None:
+        """(distância em km, duração em min) entre duas coordenadas, ou None se fora do grafo."""
+        inicio = self.no_mais_proximo(lat_ini, lon_ini)
+        fim = self.no_mais_proximo(lat_fim, lon_fim)
+        if inicio is None or fim is None:
+            return None
+        caminho = self.menor_caminho(inicio[0], fim[0])
+        if caminho is None:
+            return None
+        tempo_s, distancia_m = caminho
+        # trechos até a via mais próxima, em velocidade urbana média
+        encaixe_m = inicio[1] + fim[1]
+        tempo_s += encaixe_m / (VELOCIDADE_MEDIA_URBANA_KMH / 3.6)
+        return (distancia_m + encaixe_m) / 1000, tempo_s / 60
+
+
+class ServicoRotas:
+    """
+    Distância e duração calculadas no servidor para precificação.
+
+    Sem grafo carregado (ou fora da área do grafo), usa os valores do cliente,
+    mas nunca abaixo da distância em linha reta nem de um tempo compatível
+    com `VELOCIDADE_MAXIMA_KMH`; sem valores do cliente, estima pela linha reta.
+    """
+
+    def __init__(self):
+        self.motor: MotorRotas | None = None
+
+    async def carregar(self, caminho: str = settings.ROTAS_GRAFO_PATH) -> None:
+        if not caminho or not os.path.exists(caminho):
+            logger.warning("Grafo viário não encontrado (%r); usando estimativa por linha reta", caminho)
+            return
+        self.motor = await asyncio.to_thread(MotorRotas.carregar, caminho)
+        logger.info("Grafo viário carregado: %s nós", self.motor.total_nos)
+
+    def trajeto(
+        self,
+        lat_ini: float,
+        lon_ini: float,
+        lat_fim: float,
+        lon_fim: float,
+        distancia_cliente_km: float | None = None,
+        duracao_cliente_min: float | None = None,
+    ) -> tuple[float, float]:
+        if self.motor is not None:
+            resultado = self.motor.trajeto(lat_ini, lon_ini, lat_fim, lon_fim)
+            if resultado is not None:
+                return resultado
+        linha_reta_km = distancia_m(lat_ini, lon_ini, lat_fim, lon_fim) / 1000
+        if distancia_cliente_km is None:
+            distancia_km = linha_reta_km * FATOR_DESVIO_VIARIO
+        else:
+            distancia_km = max(distancia_cliente_km, linha_reta_km)
+        if duracao_cliente_min is None:
+            duracao_min = distancia_km / VELOCIDADE_MEDIA_URBANA_KMH * 60
+        else:
+            duracao_min = max(duracao_cliente_min, linha_reta_km / VELOCIDADE_MAXIMA_KMH * 60)
+        return distancia_km, duracao_min
+
+
+servico_rotas = ServicoRotas()
@@ -0,0 +1,123 @@
+"""
+Hash e verificação de senhas (bcrypt) fora do event loop.
+
+Cada operação bcrypt leva de 100 a 250 ms de CPU. Chamada direto num
+endpoint async, ela trava o worker inteiro: cotações e SSE do mesmo processo
+esperam o login terminar. Aqui as operações rodam num pool de threads
+limitado (o bcrypt libera o GIL) e no máximo `SENHAS_FILA_MAXIMA` ficam
+esperando por uma thread; além disso `SenhasSobrecarregadas` é levantada
+e vira um 503 com Retry-After (tratador registrado em `app.main`) em vez de
+acumular logins.
+
+No login, um hash gerado com custo diferente de `BCRYPT_ROUNDS` é refeito
+com o custo atual (`verificar_e_atualizar`).
+"""
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TypeVar
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.security import pwd_context
+
+T = TypeVar("T")
+
+
+class SenhasSobrecarregadas(Exception):
+    """Fila de operações de senha cheia."""
+
+
+class ServicoSenhas:
+    def __init__(
+        self,
+        contexto: CryptContext = pwd_context,
+        max_threads: int = settings.SENHAS_MAX_THREADS,
+        fila_maxima: int = settings.SENHAS_FILA_MAXIMA,
+    ):
+        self.contexto = contexto
+        self.max_threads = max_threads
+        self.fila_maxima = fila_maxima
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="senhas")
+        # operações submetidas ao pool e ainda não concluídas (rodando + na fila)
+        self.pendentes = 0
+        self.concluidas = 0
+        self.rejeitadas = 0
+        self.rehashes = 0
+        self._espera_total_s = 0.0
+        self._execucao_total_s = 0.0
+
+    async def _executar(self, funcao: Callable[..., T], *args) -> T:
+        if self.em_espera >= self.fila_maxima:
+            self.rejeitadas += 1
+            raise SenhasSobrecarregadas
+        loop = asyncio.get_running_loop()
+        enfileirada_em = time.perf_counter()
+        iniciada_em = None
+
+        def medir() -> T:
+            nonlocal iniciada_em
+            iniciada_em = time.perf_counter()
+            return funcao(*args)
+
+        def concluir(_futuro: Future) -> None:
+            # Roda quando a thread termina (ou a operação sai da fila cancelada), não quando quem
+            # esperava desiste: um cliente que cai no meio do bcrypt não libera a vaga antes da hora
+            fim = time.perf_counter()
+            with contextlib.suppress(RuntimeError):  # loop já encerrado
+                loop.call_soon_threadsafe(self._registrar_conclusao, enfileirada_em, iniciada_em, fim)
+
+        futuro = self._executor.submit(medir)
+        self.pendentes += 1
+        futuro.add_done_callback(concluir)
+        return await asyncio.wrap_future(futuro)
+
+    def _registrar_conclusao(self, enfileirada_em: float, iniciada_em: float | None, fim: float) -> None:
+        self.pendentes -= 1
+        self.concluidas += 1
+        if iniciada_em is not None:
+            self._espera_total_s += iniciada_em - enfileirada_em
+            self._execucao_total_s += fim - iniciada_em
+
+    @property
+    def em_execucao(self) -> int:
+        return min(self.pendentes, self.max_threads)
+
+    @property
+    def em_espera(self) -> int:
+        """Profundidade da fila: o pool é FIFO, então tudo além das threads está esperando."""
+        return self.pendentes - self.em_execucao
+
+    async def gerar_hash(self, senha: str) -> str:
+        return await self._executar(self.contexto.hash, senha)
+
+    async def verificar(self, senha: str, hash_senha: str) -> bool:
+        return await self._executar(self.contexto.verify, senha, hash_senha)
+
+    async def verificar_e_atualizar(self, senha: str, hash_senha: str) -> tuple[bool, str | None]:
+        """(senha confere, novo hash se o atual usa outro custo ou esquema; senão None)."""
+        valida, novo_hash = await self._executar(self.contexto.verify_and_update, senha, hash_senha)
+        if novo_hash is not None:
+            self.rehashes += 1
+        return valida, novo_hash
+
+    def metricas(self) -> dict:
+        concluidas = self.concluidas or 1
+        return {
+            'threads': self.max_threads,
+            'fila_maxima': self.fila_maxima,
+            'em_execucao': self.em_execucao,
+            'em_espera': self.em_espera,
+            'concluidas': self.concluidas,
+            'rejeitadas': self.rejeitadas,
+            'rehashes': self.rehashes,
+            'espera_media_ms': 1000 * self._espera_total_s / concluidas,
+            'execucao_media_ms': 1000 * self._execucao_total_s / concluidas,
+        }
+
+
+servico_senhas = ServicoSenhas()
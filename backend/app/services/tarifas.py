@@ -0,0 +1,146 @@
+"""
+Tabela de tarifas em memória, carregada do banco (`tarifas_categorias`).
+
+As cotações leem sempre um snapshot imutável (`TabelaTarifas`): recarregar
+monta um snapshot novo e troca a referência, sem nunca alterar o que já está
+sendo lido por outra requisição. A recarga acontece em segundo plano quando
+o TTL vence ou quando `invalidar()` é chamado (ex.: NOTIFY `tarifas_alteradas`).
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass, replace
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_session
+from app.core.models.driver import CategoriaCorrida, TarifaCategoria
+from app.services.cache_cotacoes import cache_cotacoes
+from app.services.precos import MotorPrecos
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Categoria:
+    id: uuid.UUID
+    titulo: str
+    subtitulo: str | None
+    icone: str | None
+    versao_tarifa: int
+    tarifa_base: float
+    custo_por_km: float
+    custo_por_minuto: float
+    tarifa_minima: float
+
+
+@dataclass(frozen=True)
+class TabelaTarifas:
+    categorias: tuple[Categoria, ...]
+    motor: MotorPrecos
+    carregada_em: float
+
+    @classmethod
+    def de_categorias(cls, categorias: tuple[Categoria, ...], carregada_em: float) -> "TabelaTarifas":
+        return cls(
+            categorias=categorias,
+            motor=MotorPrecos([asdict(c) for c in categorias]),
+            carregada_em=carregada_em,
+        )
+
+
+# Usadas apenas até a primeira carga do banco terminar (mesmos valores da migração inicial)
+CATEGORIAS_PADRAO = (
+    Categoria(uuid.UUID('22f5cb69-d97b-4753-a148-398a387b3ceb'), 'Confort', '...', 'confort.json', 1, 4.0, 1.8, 0.4, 8.0),
+    Categoria(uuid.UUID('716f1605-2be5-47f3-8e1f-6c7bc76736f2'), 'Confort M', '...', 'woman.json', 1, 4.0, 1.8, 0.4, 8.0),
+    Categoria(uuid.UUID('a59af7b3-2895-46e1-bf44-86b8d171613b'), 'XL', '...', 'xl.json', 1, 6.0, 2.2, 0.5, 12.0),
+    Categoria(uuid.UUID('2b05c586-203e-45cd-8cf0-ce9cecd153e5'), 'Economico', '...', 'economico.json', 1, 10.0, 3.5, 0.8, 20.0),
+    Categoria(uuid.UUID('8073d7b7-63b1-447f-b91f-f0518d8a0dc2'), 'MOTO', '...', 'moto.json', 1, 2.5, 1.0, 0.25, 5.0),
+)
+
+
+def tarifas_vigentes_stmt():
+    """Última versão vigente da tarifa de cada categoria ativa."""
+    return (
+        select(CategoriaCorrida, TarifaCategoria)
+        .join(TarifaCategoria, TarifaCategoria.categoria_id == CategoriaCorrida.id)
+        .where(
+            CategoriaCorrida.is_active,
+            TarifaCategoria.is_active,
+            TarifaCategoria.vigente_desde <= func.now(),
+        )
+        .distinct(CategoriaCorrida.id)
+        .order_by(CategoriaCorrida.id, TarifaCategoria.versao.desc())
+    )
+
+
+class CatalogoTarifas:
+    def __init__(self, ttl_s: float = settings.TARIFAS_TTL_S):
+        self.ttl_s = ttl_s
+        # carregada_em=-inf faz a primeira leitura já disparar a carga do banco
+        self._tabela = TabelaTarifas.de_categorias(CATEGORIAS_PADRAO, carregada_em=float('-inf'))
+        self._tarefa_recarga: asyncio.Task | None = None
+
+    def atual(self) -> TabelaTarifas:
+        """Snapshot vigente; se estiver vencido, agenda a recarga e devolve o atual mesmo assim."""
+        tabela = self._tabela
+        if time.monotonic() - tabela.carregada_em > self.ttl_s:
+            self._agendar_recarga()
+        return tabela
+
+    def invalidar(self) -> None:
+        """Força a recarga (ex.: ao receber NOTIFY de alteração de tarifas)."""
+        self._agendar_recarga()
+
+    def _agendar_recarga(self) -> None:
+        if self._tarefa_recarga is not None:
+            return
+        self._tarefa_recarga = asyncio.get_running_loop().create_task(self._recarregar_em_segundo_plano())
+
+    async def _recarregar_em_segundo_plano(self) -> None:
+        try:
+            async with async_session() as session:
+                await self.recarregar(session)
+        except Exception:
+            logger.exception("Falha ao recarregar a tabela de tarifas")
+            # segue com a tabela atual e só tenta de novo depois de outro TTL
+            self._tabela = replace(self._tabela, carregada_em=time.monotonic())
+        finally:
+            self._tarefa_recarga = None
+
+    async def recarregar(self, session: AsyncSession) -> TabelaTarifas:
+        linhas = (await session.execute(tarifas_vigentes_stmt())).all()
+        categorias = tuple(
+            Categoria(
+                id=categoria.id,
+                titulo=categoria.nome,
+                subtitulo=categoria.descricao,
+                icone=categoria.icone,
+                versao_tarifa=tarifa.versao,
+                tarifa_base=tarifa.tarifa_base,
+                custo_por_km=tarifa.custo_por_km,
+                custo_por_minuto=tarifa.custo_por_minuto,
+                tarifa_minima=tarifa.tarifa_minima,
+            )
+            for categoria, tarifa in sorted(linhas, key=lambda linha: linha[0].ordem)
+        )
+        if not categorias:
+            # tabela vazia no banco: mantém as tarifas atuais em vez de ficar sem preço
+            logger.warning("Nenhuma tarifa vigente no banco; mantendo a tabela atual")
+            categorias = self._tabela.categorias
+        self._tabela = TabelaTarifas.de_categorias(categorias, carregada_em=time.monotonic())
+        return self._tabela
+
+
+catalogo_tarifas = CatalogoTarifas()
+
+
+async def ao_alterar_tarifas(_payload) -> None:
+    """Tratador do NOTIFY `tarifas_alteradas`."""
+    catalogo_tarifas.invalidar()
+    # cotações em cache foram calculadas com as tarifas antigas
+    cache_cotacoes.limpar()
@@ -0,0 +1,157 @@
+"""
+Verificação local dos tokens do Supabase Auth.
+
+As chaves vêm da configuração: o segredo HS256 do projeto
+(`SUPABASE_JWT_SECRET`) e/ou um arquivo JWKS com as chaves públicas
+(`SUPABASE_JWKS_PATH`). Nada é buscado na rede durante a requisição.
+
+Rotação: um token com `kid` desconhecido faz o arquivo JWKS ser relido (no
+máximo a cada `INTERVALO_RECARGA_S`, e só se ele mudou), então basta
+publicar o arquivo novo com as chaves antiga e nova.
+
+As claims já verificadas ficam guardadas pelo hash do token até o `exp`:
+o mesmo token apresentado de novo custa uma consulta a um dicionário.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import jwt
+from jwt.exceptions import InvalidTokenError, PyJWKError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_RECARGA_S = 30.0
+CAPACIDADE_CLAIMS = 50000
+ALGORITMOS_ASSIMETRICOS = ("ES256", "RS256", "EdDSA")
+
+
+class TokenSupabaseInvalido(Exception):
+    pass
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+class VerificadorSupabase:
+    def __init__(
+        self,
+        segredo: str = settings.SUPABASE_JWT_SECRET,
+        jwks_path: str = settings.SUPABASE_JWKS_PATH,
+        audience: str | None = settings.SUPABASE_JWT_AUDIENCE,
+        issuer: str | None = None,
+        capacidade: int = CAPACIDADE_CLAIMS,
+    ):
+        self.segredo = segredo
+        self.jwks_path = jwks_path
+        self.audience = audience or None
+        self.issuer = issuer
+        self.capacidade = capacidade
+        self._chaves: dict[str, jwt.PyJWK] = {}
+        self._mtime_jwks: float | None = None
+        self._ultima_recarga = float("-inf")
+        self._claims: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.acertos = 0
+        self.verificados = 0
+        self.rejeitados = 0
+        self.recargas = 0
+        self.recarregar_jwks()
+
+    def recarregar_jwks(self, agora: float | None = None) -> bool:
+        """Relê o arquivo JWKS se ele mudou desde a última leitura; devolve se recarregou."""
+        self._ultima_recarga = time.monotonic() if agora is None else agora
+        if not self.jwks_path:
+            return False
+        try:
+            mtime = os.stat(self.jwks_path).st_mtime
+            if mtime == self._mtime_jwks:
+                return False
+            with open(self.jwks_path) as arquivo:
+                jwks = json.load(arquivo)
+        except (OSError, ValueError):
+            logger.exception("Não foi possível ler o JWKS do Supabase em %s", self.jwks_path)
+            return False
+        chaves = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                chave = jwt.PyJWK(jwk)
+            except PyJWKError:
+                logger.warning("Chave ignorada no JWKS do Supabase: %s", jwk.get("kid"))
+                continue
+            if chave.key_id:
+                chaves[chave.key_id] = chave
+        self._chaves = chaves
+        self._mtime_jwks = mtime
+        self.recargas += 1
+        return True
+
+    def _chave(self, cabecalho: dict) -> tuple[object, str]:
+        algoritmo = cabecalho.get("alg")
+        if algoritmo == "HS256":
+            if not self.segredo:
+                raise TokenSupabaseInvalido("Segredo HS256 do Supabase não configurado")
+            return self.segredo, algoritmo
+        if algoritmo not in ALGORITMOS_ASSIMETRICOS:
+            raise TokenSupabaseInvalido(f"Algoritmo não aceito: {algoritmo}")
+        kid = cabecalho.get("kid")
+        chave = self._chaves.get(kid)
+        if chave is None and time.monotonic() - self._ultima_recarga >= INTERVALO_RECARGA_S:
+            # kid novo: o Supabase pode ter rotacionado as chaves
+            self.recarregar_jwks()
+            chave = self._chaves.get(kid)
+        if chave is None:
+            raise TokenSupabaseInvalido(f"Chave desconhecida: {kid}")
+        if chave.algorithm_name != algoritmo:
+            raise TokenSupabaseInvalido("Algoritmo do token difere do da chave")
+        return chave.key, algoritmo
+
+    def verificar(self, token: str) -> dict:
+        """Claims do token, verificadas (assinatura, `exp`, `aud`); levanta `TokenSupabaseInvalido`."""
+        digest = _digest(token)
+        item = self._claims.get(digest)
+        if item is not None:
+            if time.time() < item[0]:
+                self._claims.move_to_end(digest)
+                self.acertos += 1
+                return item[1]
+            del self._claims[digest]
+        try:
+            chave, algoritmo = self._chave(jwt.get_unverified_header(token))
+            claims = jwt.decode(
+                token,
+                chave,
+                algorithms=[algoritmo],
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"require": ["exp", "sub"], "verify_aud": self.audience is not None},
+            )
+        except (InvalidTokenError, TokenSupabaseInvalido) as ex:
+            self.rejeitados += 1
+            raise TokenSupabaseInvalido(str(ex)) from ex
+        self.verificados += 1
+        self._claims[digest] = (float(claims["exp"]), claims)
+        while len(self._claims) > self.capacidade:
+            self._claims.popitem(last=False)
+        return claims
+
+    def metricas(self) -> dict:
+        return {
+            'chaves': len(self._chaves),
+            'claims_em_cache': len(self._claims),
+            'acertos': self.acertos,
+            'verificados': self.verificados,
+            'rejeitados': self.rejeitados,
+            'recargas_jwks': self.recargas,
+        }
+
+
+verificador_supabase = VerificadorSupabase(
+    issuer=f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1" if settings.SUPABASE_URL else None,
+)
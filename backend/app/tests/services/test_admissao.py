@@ -0,0 +1,81 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.api.admissao import MiddlewareAdmissao, prioridade_da_rota
+from app.core.config import settings
+from app.services.admissao import ControleAdmissao, Prioridade
+
+API = settings.API_V1_STR
+
+
+def test_prioridades() -> None:
+    assert prioridade_da_rota("POST", f"{API}/corrida/cancelar") is Prioridade.CRITICA
+    assert prioridade_da_rota("POST", f"{API}/driver/ofertas/12/aceitar") is Prioridade.CRITICA
+    assert prioridade_da_rota("POST", f"{API}/corrida/cotar") is Prioridade.NORMAL
+    assert prioridade_da_rota("GET", f"{API}/corrida/cancelar") is Prioridade.NORMAL
+    assert prioridade_da_rota("POST", f"{API}/corrida/eta/matriz") is Prioridade.BAIXA
+    assert prioridade_da_rota("GET", f"{API}/core/documentos/abc") is Prioridade.BAIXA
+    assert prioridade_da_rota("GET", f"{API}/corrida/consultar/stream") is None
+    assert prioridade_da_rota("GET", f"{API}/utils/health-check/") is None
+
+
+def test_recusa_por_prioridade() -> None:
+    controle = ControleAdmissao(capacidade_pool=2, max_em_voo=4)
+
+    assert controle.entrar(Prioridade.BAIXA)
+    controle.conexoes_em_uso = 2  # pool todo emprestado
+    assert not controle.entrar(Prioridade.BAIXA)
+    # com o pool esgotado, normais só até uma não crítica por conexão
+    assert controle.entrar(Prioridade.NORMAL)
+    assert not controle.entrar(Prioridade.NORMAL)
+    assert all(controle.entrar(Prioridade.CRITICA) for _ in range(10))
+
+    controle.sair(Prioridade.NORMAL)
+    assert controle.entrar(Prioridade.NORMAL)
+    assert controle.metricas()['recusadas'] == {'critica': 0, 'normal': 1, 'baixa': 1}
+
+
+def test_limite_de_normais_acompanha_o_pool() -> None:
+    controle = ControleAdmissao(capacidade_pool=3)
+
+    assert controle.max_em_voo == 3 * settings.ADMISSAO_EM_VOO_POR_CONEXAO
+    # pool com folga: normais entram até o limite por conexão
+    assert all(controle.entrar(Prioridade.NORMAL) for _ in range(controle.max_em_voo))
+    assert not controle.entrar(Prioridade.NORMAL)
+
+
+def test_conta_conexoes_pelos_eventos_do_pool(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'x.db'}")
+    controle = ControleAdmissao(capacidade_pool=1)
+    controle.instrumentar(engine)
+
+    with engine.connect() as conexao:
+        conexao.execute(text("SELECT 1"))
+        assert controle.pool_cheio
+    assert controle.conexoes_em_uso == 0
+
+
+def test_middleware_responde_503_e_libera_a_vaga() -> None:
+    controle = ControleAdmissao(capacidade_pool=6, max_em_voo=2)
+    app = FastAPI()
+
+    @app.post(f"{API}/corrida/cotar")
+    async def cotar() -> dict:
+        return dict(controle.em_voo)
+
+    @app.post(f"{API}/corrida/cancelar")
+    async def cancelar() -> dict:
+        return {}
+
+    app.add_middleware(MiddlewareAdmissao, controle=controle)
+    cliente = TestClient(app)
+
+    assert cliente.post(f"{API}/corrida/cotar").json()['normal'] == 1
+    assert controle.em_voo[Prioridade.NORMAL] == 0
+
+    controle.em_voo[Prioridade.NORMAL] = 2  # outras requisições em andamento
+    recusada = cliente.post(f"{API}/corrida/cotar")
+    assert recusada.status_code == 503
+    assert recusada.headers['retry-after'] == str(settings.ADMISSAO_RETRY_AFTER_S)
+    assert cliente.post(f"{API}/corrida/cancelar").status_code == 200
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.services.cache_cotacoes import CacheCotacoes, chave_cotacao
+from app.services.tarifas import ao_alterar_tarifas
+
+ZONA = (-509, -986)
+
+
+def test_acerto_dentro_da_janela_e_expiracao() -> None:
+    cache = CacheCotacoes(capacidade=10)
+    chave = chave_cotacao(-25.4310, -49.2710, -25.50, -49.30, 12.34, 25, 1.2, agora=60)
+
+    assert cache.obter(chave, agora=60) is None
+    cache.guardar(chave, ZONA, ('cotacao',), agora=60)
+
+    assert chave_cotacao(-25.4312, -49.2712, -25.50, -49.30, 12.36, 25.5, 1.2, agora=75) == chave
+    assert cache.obter(chave, agora=89) == ('cotacao',)
+    assert cache.obter(chave, agora=90) is None
+    assert cache.metricas()['acertos'] == 1
+    assert cache.metricas()['falhas'] == 2
+    assert cache.metricas()['expirados'] == 1
+
+
+def test_mudanca_de_multiplicador_invalida_a_zona() -> None:
+    cache = CacheCotacoes(capacidade=10)
+    cache.observar_multiplicador(ZONA, 1.0)
+    cache.guardar('a', ZONA, 1, agora=0)
+    cache.guardar('b', (0, 0), 2, agora=0)
+
+    cache.observar_multiplicador(ZONA, 1.0)
+    assert cache.obter('a', agora=1) == 1
+
+    cache.observar_multiplicador(ZONA, 1.5)
+    assert cache.obter('a', agora=1) is None
+    assert cache.obter('b', agora=1) == 2
+    assert cache.metricas()['invalidados'] == 1
+
+
+def test_lru_respeita_capacidade() -> None:
+    cache = CacheCotacoes(capacidade=2)
+    cache.guardar('a', ZONA, 1, agora=0)
+    cache.guardar('b', ZONA, 2, agora=0)
+    cache.obter('a', agora=0)
+    cache.guardar('c', ZONA, 3, agora=0)
+
+    assert len(cache) == 2
+    assert cache.obter('b', agora=0) is None
+    assert cache.obter('a', agora=0) == 1
+    assert cache.metricas()['despejados'] == 1
+
+
+def test_alteracao_de_tarifas_limpa_o_cache(monkeypatch) -> None:
+    cache = CacheCotacoes(capacidade=10)
+    cache.guardar('a', ZONA, 1, agora=0)
+    monkeypatch.setattr('app.services.tarifas.cache_cotacoes', cache)
+
+    asyncio.run(ao_alterar_tarifas({}))
+
+    assert len(cache) == 0
+    assert cache.obter('a', agora=1) is None
@@ -0,0 +1,76 @@
+import asyncio
+from dataclasses import asdict
+from datetime import timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from app.api.deps import get_principal_from_token
+from app.core import security
+from app.services import cache_principais as modulo
+from app.services.cache_principais import (
+    CachePrincipais,
+    Principal,
+    ao_alterar_usuarios,
+)
+from app.users.models.users import User
+
+PRINCIPAL = Principal(id=7, email='m@x.com', full_name=None, role='driver', is_active=True, is_superuser=False)
+
+
+def test_ttl_e_lru() -> None:
+    cache = CachePrincipais(capacidade=2, ttl_s=60)
+    cache.guardar('7', PRINCIPAL, agora=0)
+
+    assert cache.obter('7', agora=59) is PRINCIPAL
+    assert cache.obter('7', agora=60) is None
+
+    cache.guardar('1', PRINCIPAL, agora=0)
+    cache.guardar('2', PRINCIPAL, agora=0)
+    cache.obter('1', agora=1)
+    cache.guardar('3', PRINCIPAL, agora=1)
+    assert cache.obter('2', agora=1) is None
+    assert cache.obter('1', agora=1) is PRINCIPAL
+
+
+def test_invalidacao_por_evento_e_notify() -> None:
+    assert event.contains(User, 'after_update', modulo._ao_alterar_usuario)
+    assert event.contains(User, 'after_delete', modulo._ao_alterar_usuario)
+    cache = modulo.cache_principais
+    cache.guardar('7', PRINCIPAL)
+    cache.guardar('8', PRINCIPAL)
+
+    modulo._ao_alterar_usuario(None, None, User(id=7))
+    assert cache.obter('7') is None
+    assert cache.obter('8') is PRINCIPAL
+
+    asyncio.run(ao_alterar_usuarios({'id': 8}))
+    assert cache.obter('8') is None
+
+    cache.guardar('9', PRINCIPAL)
+    asyncio.run(ao_alterar_usuarios(''))
+    assert len(cache) == 0
+
+
+def test_principal_usa_a_sessao_da_requisicao(monkeypatch) -> None:
+    class Resultado:
+        def one_or_none(self):
+            return SimpleNamespace(_mapping=asdict(PRINCIPAL))
+
+    class Sessao:
+        consultas = 0
+
+        async def execute(self, _statement):
+            Sessao.consultas += 1
+            return Resultado()
+
+    def sem_sessao_propria():
+        raise AssertionError("abriu uma segunda sessão")
+
+    monkeypatch.setattr('app.api.deps.async_session', sem_sessao_propria)
+    token = security.create_access_token(7, timedelta(minutes=5), role='driver')
+    modulo.cache_principais.invalidar('7')
+
+    assert asyncio.run(get_principal_from_token(token, Sessao())) == PRINCIPAL
+    assert Sessao.consultas == 1
+    modulo.cache_principais.invalidar('7')
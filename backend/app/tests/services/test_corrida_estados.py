@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import app.core.models.driver  # noqa: F401  (FK de categoria_id)
+import app.users.models.users  # noqa: F401  (FKs de passageiro/motorista)
+from app.core.models.corrida import (
+    ESTADOS_ATIVOS,
+    TRANSICOES,
+    Corrida,
+    StatusCorrida,
+    TransicaoInvalida,
+    transicao_stmt,
+)
+
+
+def test_fluxo_completo_preenche_as_datas() -> None:
+    corrida = Corrida(passageiro_id=1, status=StatusCorrida.AGUARDANDO)
+
+    for status in (StatusCorrida.ATRIBUIDA, StatusCorrida.ACEITA, StatusCorrida.EM_ANDAMENTO, StatusCorrida.FINALIZADA):
+        corrida.transicionar(status)
+
+    assert corrida.status is StatusCorrida.FINALIZADA
+    assert corrida.atribuida_em <= corrida.aceita_em <= corrida.iniciada_em <= corrida.finalizada_em
+    assert corrida.cancelada_em is None
+
+
+def test_transicao_invalida() -> None:
+    corrida = Corrida(passageiro_id=1, status=StatusCorrida.EM_ANDAMENTO)
+
+    with pytest.raises(TransicaoInvalida):
+        corrida.transicionar(StatusCorrida.CANCELADA)
+    assert corrida.status is StatusCorrida.EM_ANDAMENTO
+
+
+def test_estados_finais_nao_saem_e_ativos_tem_saida() -> None:
+    for status, proximos in TRANSICOES.items():
+        assert bool(proximos) == (status in ESTADOS_ATIVOS)
+
+
+def test_transicao_em_lote_e_condicional_ao_estado_atual() -> None:
+    stmt = transicao_stmt(10, StatusCorrida.AGUARDANDO, StatusCorrida.ATRIBUIDA, motorista_id=3)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "corridas.status = " in sql
+    assert "versao=(corridas.versao + " in sql
+    with pytest.raises(TransicaoInvalida):
+        transicao_stmt(10, StatusCorrida.FINALIZADA, StatusCorrida.AGUARDANDO)
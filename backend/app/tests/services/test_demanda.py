@@ -0,0 +1,78 @@
+from app.services.demanda import (
+    JanelaDeslizante,
+    PainelDemanda,
+    PassageirosRecentes,
+    zona,
+)
+from app.services.indice_motoristas import IndiceMotoristas
+
+
+def test_janela_descarta_eventos_antigos() -> None:
+    janela = JanelaDeslizante(janela_s=60, resolucao_s=10)
+    janela.registrar(agora=0)
+    janela.registrar(2, agora=15)
+    janela.registrar(agora=55)
+
+    assert janela.total(agora=59) == 4
+    assert janela.total(agora=65) == 3
+    assert janela.total(agora=75) == 1
+    assert janela.total(agora=1000) == 0
+
+
+def test_painel_conta_motoristas_pelo_indice() -> None:
+    painel = PainelDemanda()
+    indice = IndiceMotoristas(painel=painel)
+    indice.atualizar(1, -25.43, -49.27)
+    indice.atualizar(2, -25.44, -49.28)
+    indice.atualizar(3, -23.55, -46.63)
+
+    assert painel.motoristas_disponiveis(-25.43, -49.27) == 2
+
+    indice.atualizar(2, -23.56, -46.64)
+    indice.remover(1)
+
+    assert painel.motoristas_disponiveis(-25.43, -49.27) == 0
+    assert painel.motoristas_disponiveis(-23.55, -46.63) == 2
+
+
+def test_painel_soma_cotacoes_e_reservas_da_vizinhanca() -> None:
+    painel = PainelDemanda(processos=1)
+    painel.registrar_cotacao(-25.43, -49.27, 'u:1')
+    painel.registrar_cotacao(-25.43, -49.27, 'u:2')
+    painel.registrar_reserva(-25.43 + 0.05, -49.27, 'u:3')
+    painel.registrar_cotacao(-23.55, -46.63, 'u:4')
+
+    assert zona(-25.43, -49.27) != zona(-25.43 + 0.05, -49.27)
+    assert painel.passageiros_ativos(-25.43, -49.27) == 3
+
+
+def test_painel_conta_passageiros_distintos() -> None:
+    painel = PainelDemanda(processos=1)
+    for _ in range(5):
+        painel.registrar_cotacao(-25.43, -49.27, 'u:1')  # ajustando o pino
+    painel.registrar_cotacao(-25.43, -49.27, 'ip:10.0.0.1')
+    assert painel.passageiros_ativos(-25.43, -49.27) == 2
+
+    # a reserva substitui a cotação do mesmo passageiro, e cotar de novo não soma
+    painel.registrar_reserva(-25.43, -49.27, 'u:1')
+    painel.registrar_cotacao(-25.43, -49.27, 'u:1')
+    assert painel.passageiros_ativos(-25.43, -49.27) == 2
+
+
+def test_painel_escala_a_demanda_pelos_processos() -> None:
+    painel = PainelDemanda(processos=4)
+    painel.registrar_cotacao(-25.43, -49.27, 'u:1')
+
+    assert painel.passageiros_ativos(-25.43, -49.27) == 4
+
+
+def test_passageiros_recentes_expiram() -> None:
+    recentes = PassageirosRecentes(janela_s=60)
+    recentes.registrar('a', agora=0)
+    recentes.registrar('b', agora=30)
+    recentes.registrar('a', agora=50)
+
+    assert recentes.total(agora=59) == 2
+    assert recentes.total(agora=95) == 1
+    assert not recentes.contem('b', agora=95)
+    assert recentes.total(agora=200) == 0
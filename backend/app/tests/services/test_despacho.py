@@ -0,0 +1,108 @@
+import asyncio
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.core.models.corrida import StatusCorrida
+from app.services.despacho import (
+    Atribuicao,
+    Despachante,
+    atribuir,
+    atribuir_guloso,
+    reivindicar_corridas_stmt,
+    reivindicar_motoristas_stmt,
+)
+from app.services.indice_motoristas import IndiceMotoristas
+
+
+def custo_total(custos: np.ndarray, pares: list[tuple[int, int]]) -> float:
+    return float(sum(custos[i, j] for i, j in pares))
+
+
+def test_atende_mais_reservas_que_o_guloso() -> None:
+    # a reserva 0 chegou antes e leva o único motorista que atende a reserva 1
+    custos = np.array([[2.0, 3.0], [1.0, np.inf]])
+
+    assert len(atribuir_guloso(custos)) == 1
+    assert sorted(atribuir(custos)) == [(0, 1), (1, 0)]
+
+
+def test_respeita_eta_maximo() -> None:
+    custos = np.array([[25.0, 4.0], [30.0, 40.0]])
+
+    assert atribuir(custos, custo_maximo=20.0) == [(0, 1)]
+
+
+def test_nunca_pior_que_o_guloso() -> None:
+    rng = np.random.default_rng(8)
+    for _ in range(50):
+        custos = rng.uniform(1, 30, (rng.integers(1, 15), rng.integers(1, 15)))
+        otimo = atribuir(custos, custo_maximo=20.0)
+        guloso = atribuir_guloso(custos, custo_maximo=20.0)
+
+        assert len({i for i, _ in otimo}) == len({j for _, j in otimo}) == len(otimo)
+        assert len(otimo) >= len(guloso)
+        if len(otimo) == len(guloso):
+            assert custo_total(custos, otimo) <= custo_total(custos, guloso) + 1e-6
+
+
+def test_reivindicacao_nao_espera_por_locks() -> None:
+    corridas = str(reivindicar_corridas_stmt([2, 1]).compile(dialect=postgresql.dialect()))
+    motoristas = str(reivindicar_motoristas_stmt([7]).compile(dialect=postgresql.dialect()))
+
+    assert "FOR UPDATE SKIP LOCKED" in corridas
+    assert "pg_try_advisory_xact_lock" in motoristas
+
+
+class _Resultado(list):
+    def all(self) -> list:
+        return list(self)
+
+
+class _SessaoFalsa:
+    """Responde às duas consultas de reivindicação, na ordem, com resultados fixos."""
+
+    def __init__(self, corridas: list[tuple[int, StatusCorrida]], motoristas: list[tuple[int, bool, bool]]):
+        self.respostas = [corridas, motoristas]
+
+    async def execute(self, _statement) -> _Resultado:
+        return _Resultado(self.respostas.pop(0))
+
+
+def test_pula_pares_disputados_por_outro_worker() -> None:
+    despachante = Despachante(IndiceMotoristas())
+    for corrida_id in (1, 2, 3, 4):
+        despachante.enfileirar(corrida_id, 100 + corrida_id, -25.43, -49.27)
+    planejadas = [Atribuicao(c, 100 + c, 10 + c, 3.0, -25.43, -49.27) for c in (1, 2, 3, 4)]
+    # corrida 2 travada por outro worker, 3 já atribuída, motorista 14 sendo atribuído em outro worker
+    sessao = _SessaoFalsa(
+        [(1, StatusCorrida.AGUARDANDO), (3, StatusCorrida.ATRIBUIDA), (4, StatusCorrida.AGUARDANDO)],
+        [(11, True, True), (12, True, True), (13, True, True), (14, True, False)],
+    )
+
+    livres = asyncio.run(despachante._reivindicar(sessao, planejadas))
+
+    assert [a.corrida_id for a in livres] == [1]
+    assert despachante.disputados == 2
+    assert sorted(despachante._fila) == [1, 2, 4]
+
+
+def test_motorista_indisponivel_no_banco_sai_do_indice() -> None:
+    indice = IndiceMotoristas()
+    despachante = Despachante(indice)
+    despachante.enfileirar(1, 101, -25.43, -49.27)
+    indice.atualizar(11, -25.431, -49.271)
+    indice.atualizar(12, -25.45, -49.27)
+    # motorista 11 recebeu corrida em outro worker: a linha já diz is_available = false
+    sessao = _SessaoFalsa([(1, StatusCorrida.AGUARDANDO)], [(11, False, False)])
+
+    livres = asyncio.run(despachante._reivindicar(sessao, [Atribuicao(1, 101, 11, 3.0, -25.43, -49.27)]))
+
+    assert livres == []
+    assert 11 not in indice
+    assert list(despachante._fila) == [1]
+    # na próxima rodada a corrida vai para outro motorista, e pings do 11 não o devolvem ao índice
+    indice.atualizar(11, -25.431, -49.271)
+    reservas = list(despachante._fila.values())
+    motoristas = [(m, indice.posicao(m)) for m in despachante._candidatos(reservas)]
+    assert [a.motorista_id for a in despachante.planejar(reservas, motoristas, {})] == [12]
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.services.corrida import estimar_tempo_chegada_min
+from app.services.eta import calcular_matriz_eta
+from app.services.indice_motoristas import distancia_m
+from app.services.rotas import MotorRotas
+from app.tests.services.test_rotas import grade_aleatoria
+
+
+def test_sem_grafo_usa_estimativa_por_linha_reta() -> None:
+    matriz = calcular_matriz_eta([-25.43, -25.44], [-49.27, -49.28], [-25.45], [-49.26])
+
+    assert matriz.tempo_min.shape == (2, 1)
+    for i, (lat, lon) in enumerate([(-25.43, -49.27), (-25.44, -49.28)]):
+        esperado = estimar_tempo_chegada_min(distancia_m(lat, lon, -25.45, -49.26))
+        assert round(float(matriz.tempo_min[i, 0]), 1) == esperado
+
+
+def test_com_grafo_usa_rotas_e_linha_reta_fora_da_area() -> None:
+    grafo = grade_aleatoria(8, semente=7)
+    motor = MotorRotas.construir(grafo)
+    lats = [grafo.lat[0], grafo.lat[63], 10.0]
+    lons = [grafo.lon[0], grafo.lon[63], 10.0]
+
+    matriz = calcular_matriz_eta(lats, lons, lats[:2], lons[:2], motor=motor)
+
+    assert matriz.tempo_min[0, 0] == 0
+    caminho = motor.menor_caminho(0, 63)
+    if caminho is not None:
+        np.testing.assert_allclose(matriz.tempo_min[0, 1], caminho[0] / 60)
+    # ponto fora do grafo: estimativa por linha reta
+    assert np.all(np.isfinite(matriz.tempo_min[2]))
+    assert matriz.tempo_min[2, 0] > 1000
@@ -0,0 +1,40 @@
+import numpy as np
+
+from app.services import geo
+from app.services.indice_motoristas import distancia_m
+
+
+def test_haversine_vetorizado_igual_ao_escalar() -> None:
+    rng = np.random.default_rng(1)
+    lats = -25.43 + rng.uniform(-1, 1, 500)
+    lons = -49.27 + rng.uniform(-1, 1, 500)
+
+    distancias = geo.haversine_m(-25.43, -49.27, lats, lons)
+
+    esperado = [distancia_m(-25.43, -49.27, la, lo) for la, lo in zip(lats, lons)]
+    np.testing.assert_allclose(distancias, esperado, rtol=1e-12)
+
+
+def test_haversine_matriz() -> None:
+    matriz = geo.haversine_matriz_m([-25.43, -23.55], [-49.27, -46.63], [-25.43, -22.90, -23.55], [-49.27, -43.17, -46.63])
+
+    assert matriz.shape == (2, 3)
+    assert matriz[0, 0] == 0
+    assert matriz[1, 2] == 0
+    np.testing.assert_allclose(matriz[0, 1], distancia_m(-25.43, -49.27, -22.90, -43.17))
+
+
+def test_rumo() -> None:
+    rumos = geo.rumo_graus(0.0, 0.0, [1.0, 0.0, -1.0, 0.0], [0.0, 1.0, 0.0, -1.0])
+
+    np.testing.assert_allclose(rumos, [0.0, 90.0, 180.0, 270.0], atol=1e-9)
+
+
+def test_dentro_do_raio() -> None:
+    lats = np.array([-25.4284, -25.4400, -25.6000, -25.4284])
+    lons = np.array([-49.2733, -49.2800, -49.5000, -49.9000])
+
+    indices, distancias = geo.dentro_do_raio(-25.4284, -49.2733, lats, lons, 5000)
+
+    assert indices.tolist() == [0, 1]
+    assert np.all(distancias <= 5000)
@@ -0,0 +1,132 @@
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.idempotencia import RotaIdempotente
+from app.services.idempotencia import (
+    CorpoDiferente,
+    EmAndamento,
+    RegistroIdempotencia,
+    RespostaGuardada,
+    digest_chave,
+)
+
+
+def test_registro_guarda_e_expira() -> None:
+    registro = RegistroIdempotencia(capacidade=10, ttl_s=60)
+    resposta = RespostaGuardada(200, (), b'{}')
+
+    assert registro.reservar(('a',), b'x', agora=0) is None
+    with pytest.raises(EmAndamento):
+        registro.reservar(('a',), b'x', agora=1)
+    registro.concluir(('a',), resposta, agora=1)
+
+    assert registro.reservar(('a',), b'x', agora=2) is resposta
+    with pytest.raises(CorpoDiferente):
+        registro.reservar(('a',), b'y', agora=2)
+    assert registro.reservar(('a',), b'x', agora=61) is None  # expirou
+
+
+def test_registro_libera_e_despeja() -> None:
+    registro = RegistroIdempotencia(capacidade=2, ttl_s=60)
+    registro.reservar(('a',), b'x', agora=0)
+    registro.liberar(('a',))
+    assert registro.reservar(('a',), b'x', agora=0) is None
+
+    registro.reservar(('b',), b'x', agora=0)
+    registro.reservar(('c',), b'x', agora=0)
+    assert len(registro) == 2
+    assert registro.despejados == 1
+
+
+def _app(registro: RegistroIdempotencia, armazenamento=None) -> tuple[FastAPI, list]:
+    chamadas = []
+
+    class Rota(RotaIdempotente):
+        pass
+
+    Rota.registro = registro
+    Rota.armazenamento = armazenamento
+    router = APIRouter(route_class=Rota)
+
+    @router.post("/reservar")
+    async def reservar(dados: dict) -> dict:
+        chamadas.append(dados)
+        return {'corrida_id': len(chamadas)}
+
+    @router.post("/cancelar")
+    async def cancelar() -> dict:
+        chamadas.append('cancelar')
+        raise HTTPException(status_code=409, detail="Nenhuma corrida ativa")
+
+    app = FastAPI()
+    app.include_router(router)
+    return app, chamadas
+
+
+def test_repeticao_devolve_a_resposta_guardada_sem_executar() -> None:
+    app, chamadas = _app(RegistroIdempotencia())
+    cliente = TestClient(app)
+    cabecalhos = {'Idempotency-Key': 'k1', 'Authorization': 'Bearer t'}
+
+    primeira = cliente.post("/reservar", json={'id': 1}, headers=cabecalhos)
+    segunda = cliente.post("/reservar", json={'id': 1}, headers=cabecalhos)
+
+    assert primeira.json() == segunda.json() == {'corrida_id': 1}
+    assert segunda.headers['idempotency-replayed'] == 'true'
+    assert len(chamadas) == 1
+    # outro usuário com a mesma chave executa normalmente
+    cliente.post("/reservar", json={'id': 1}, headers={'Idempotency-Key': 'k1', 'Authorization': 'Bearer u'})
+    assert len(chamadas) == 2
+    assert cliente.post("/reservar", json={'id': 2}, headers=cabecalhos).status_code == 422
+    # sem a chave não há deduplicação
+    cliente.post("/reservar", json={'id': 1})
+    cliente.post("/reservar", json={'id': 1})
+    assert len(chamadas) == 4
+
+
+def test_erro_4xx_tambem_e_repetido() -> None:
+    app, chamadas = _app(RegistroIdempotencia())
+    cliente = TestClient(app)
+
+    respostas = [cliente.post("/cancelar", headers={'Idempotency-Key': 'k2'}) for _ in range(2)]
+
+    assert [r.status_code for r in respostas] == [409, 409]
+    assert respostas[1].json() == {'detail': 'Nenhuma corrida ativa'}
+    assert chamadas == ['cancelar']
+
+
+class _ArmazenamentoFalso:
+    """Faz o papel da tabela compartilhada entre workers."""
+
+    def __init__(self):
+        self.registro = RegistroIdempotencia()
+
+    async def reservar(self, chave, digest):
+        return self.registro.reservar(chave, digest)
+
+    async def concluir(self, chave, resposta):
+        self.registro.concluir(chave, resposta)
+
+    async def liberar(self, chave):
+        self.registro.liberar(chave)
+
+
+def test_repeticao_em_outro_worker_usa_o_armazenamento_compartilhado() -> None:
+    armazenamento = _ArmazenamentoFalso()
+    app_1, chamadas_1 = _app(RegistroIdempotencia(), armazenamento)
+    app_2, chamadas_2 = _app(RegistroIdempotencia(), armazenamento)
+    cabecalhos = {'Idempotency-Key': 'k3', 'Authorization': 'Bearer t'}
+
+    primeira = TestClient(app_1).post("/reservar", json={'id': 1}, headers=cabecalhos)
+    segunda = TestClient(app_2).post("/reservar", json={'id': 1}, headers=cabecalhos)
+
+    assert primeira.json() == segunda.json() == {'corrida_id': 1}
+    assert segunda.headers['idempotency-replayed'] == 'true'
+    assert len(chamadas_1) == 1 and chamadas_2 == []
+    assert TestClient(app_2).post("/reservar", json={'id': 2}, headers=cabecalhos).status_code == 422
+
+
+def test_digest_chave_separa_as_partes() -> None:
+    assert digest_chave((b'ab', '/c', 'k')) == digest_chave((b'ab', '/c', 'k'))
+    assert digest_chave((b'a', 'b/c', 'k')) != digest_chave((b'ab', '/c', 'k'))
@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+from app.services.indice_motoristas import (
+    IndiceMotoristas,
+    distancia_m,
+    indice_motoristas,
+)
+from app.services.localizacao import BufferLocalizacoes
+
+
+def test_proximos_filtra_pelo_raio() -> None:
+    indice = IndiceMotoristas()
+    indice.atualizar(1, -25.4284, -49.2733)
+    indice.atualizar(2, -25.4400, -49.2800)
+    indice.atualizar(3, -25.6000, -49.5000)
+
+    encontrados = dict(indice.proximos(-25.4284, -49.2733, 5000))
+
+    assert set(encontrados) == {1, 2}
+    assert encontrados[1] == 0
+    assert encontrados[2] == distancia_m(-25.4284, -49.2733, -25.4400, -49.2800)
+
+
+def test_atualizar_move_motorista_de_celula() -> None:
+    indice = IndiceMotoristas()
+    indice.atualizar(1, -25.4284, -49.2733)
+    indice.atualizar(1, -23.5505, -46.6333)
+
+    assert len(indice) == 1
+    assert indice.proximos(-25.4284, -49.2733, 10000) == []
+    assert [m for m, _ in indice.proximos(-23.5505, -46.6333, 100)] == [1]
+
+
+def test_remover() -> None:
+    indice = IndiceMotoristas()
+    indice.atualizar(1, -25.4284, -49.2733)
+    indice.remover(1)
+    indice.remover(1)
+
+    assert 1 not in indice
+    assert indice.proximos(-25.4284, -49.2733, 10000) == []
+
+
+def test_mais_proximos_igual_a_busca_exaustiva() -> None:
+    rng = random.Random(42)
+    indice = IndiceMotoristas()
+    for motorista_id in range(2000):
+        indice.atualizar(motorista_id, -25.43 + rng.uniform(-0.2, 0.2), -49.27 + rng.uniform(-0.2, 0.2))
+
+    esperado = sorted(indice.proximos(-25.43, -49.27, 10000), key=lambda m: m[1])[:7]
+
+    assert indice.mais_proximos(-25.43, -49.27, 7, 10000) == esperado
+
+
+def test_mais_proximos_respeita_raio_maximo() -> None:
+    indice = IndiceMotoristas()
+    indice.atualizar(1, -25.4284, -49.2733)
+    indice.atualizar(2, -25.9000, -49.2733)
+
+    assert [m for m, _ in indice.mais_proximos(-25.4284, -49.2733, 5, 10000)] == [1]
+
+
+def test_motorista_sem_ping_recente_sai_da_busca() -> None:
+    indice = IndiceMotoristas(ttl_s=60)
+    agora = time.time()
+    indice.atualizar(1, -25.4284, -49.2733, agora - 120)
+    indice.atualizar(2, -25.4290, -49.2740, agora)
+
+    assert [m for m, _ in indice.proximos(-25.4284, -49.2733, 10000)] == [2]
+    assert [m for m, _ in indice.mais_proximos(-25.4284, -49.2733, 5, 10000)] == [2]
+    assert 1 not in indice
+
+
+def test_podar_remove_expirados() -> None:
+    indice = IndiceMotoristas(ttl_s=60)
+    indice.atualizar(1, -25.4284, -49.2733, 1000.0)
+    indice.atualizar(2, -25.4290, -49.2740, 1050.0)
+
+    assert indice.podar(agora=1100.0) == 1
+    assert 1 not in indice and 2 in indice
+
+
+class _SessaoFalsa:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    async def execute(self, statement):
+        linhas = self.linhas
+
+        class _Resultado:
+            def all(self):
+                return linhas
+
+        return _Resultado()
+
+
+def test_ressincronizar_traz_posicoes_de_outros_workers() -> None:
+    indice = IndiceMotoristas(ttl_s=60)
+    agora = time.time()
+    indice.atualizar(1, -25.4284, -49.2733, agora)
+    gravado_antes = datetime.fromtimestamp(agora - 10, timezone.utc)
+    linhas = [(1, -23.5505, -46.6333, gravado_antes, True), (2, -25.4290, -49.2740, datetime.now(timezone.utc), True)]
+
+    asyncio.run(indice.ressincronizar(_SessaoFalsa(linhas)))
+
+    # a posição local é mais nova que a do banco e prevalece
+    assert indice.posicao(1) == (-25.4284, -49.2733)
+    assert indice.posicao(2) == (-25.4290, -49.2740)
+
+
+def test_remover_nao_deixa_ressincronizacao_trazer_posicao_antiga() -> None:
+    indice = IndiceMotoristas(ttl_s=60)
+    agora = time.time()
+    indice.atualizar(1, -25.4284, -49.2733, agora)
+    indice.remover(1)
+
+    linhas = [(1, -25.4284, -49.2733, datetime.fromtimestamp(agora - 1, timezone.utc), True)]
+    asyncio.run(indice.ressincronizar(_SessaoFalsa(linhas)))
+
+    assert 1 not in indice
+
+
+def test_ressincronizar_retira_quem_ficou_indisponivel_em_outro_worker() -> None:
+    indice = IndiceMotoristas(ttl_s=60)
+    indice.atualizar(1, -25.4284, -49.2733)
+
+    linhas = [(1, -25.4290, -49.2740, datetime.now(timezone.utc), False)]
+    asyncio.run(indice.ressincronizar(_SessaoFalsa(linhas)))
+
+    assert 1 not in indice
+    assert not indice.disponivel(1)
+
+
+def test_registrar_so_indexa_motorista_disponivel() -> None:
+    buffer = BufferLocalizacoes()
+    try:
+        # disponibilidade ainda desconhecida (ex.: POST /driver/location): entra no índice
+        buffer.registrar(9001, -25.4284, -49.2733)
+        assert 9001 in indice_motoristas and len(buffer) == 1
+
+        indice_motoristas.ocupar(9001)
+        buffer.registrar(9001, -25.4290, -49.2740)
+        assert 9001 not in indice_motoristas
+
+        indice_motoristas.liberar(9001)
+        buffer.registrar(9001, -25.4290, -49.2740)
+        assert indice_motoristas.posicao(9001) == (-25.4290, -49.2740)
+    finally:
+        indice_motoristas.definir_disponivel(9001, False)
+
+
+def test_buffer_esquece_o_ultimo_ping_de_quem_parou_de_enviar() -> None:
+    buffer = BufferLocalizacoes(ttl_s=60)
+    instante = datetime.now(timezone.utc)
+    buffer.registrar(9002, -25.4284, -49.2733, instante)
+    assert not buffer.registrar(9002, -25.4284, -49.2733, instante)  # repetido
+
+    assert buffer.podar(agora=time.monotonic() + 30) == 0
+    assert buffer.podar(agora=time.monotonic() + 61) == 1
+    assert buffer.registrar(9002, -25.4284, -49.2733, instante)
+    indice_motoristas.remover(9002)
@@ -0,0 +1,86 @@
+import ipaddress
+from datetime import timedelta
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.limite_taxa import (
+    MiddlewareLimiteTaxa,
+    chave_do_cliente,
+    endereco_do_cliente,
+    grupo_da_rota,
+)
+from app.core import security
+from app.core.config import settings
+from app.services.limite_taxa import LimitadorTaxa
+
+
+def test_balde_repoe_fichas_sob_demanda() -> None:
+    limitador = LimitadorTaxa({'corrida': (2.0, 3)})
+
+    assert [limitador.consumir('corrida', 'u:1', agora=0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limitador.consumir('corrida', 'u:1', agora=0) == 0.5
+    assert limitador.consumir('corrida', 'u:2', agora=0) == 0.0  # outro usuário, outro balde
+    assert limitador.consumir('corrida', 'u:1', agora=0.5) == 0.0
+    assert limitador.consumir('outro', 'u:1', agora=0) == 0.0  # grupo sem orçamento
+
+
+def test_despeja_baldes_que_ja_estariam_cheios() -> None:
+    limitador = LimitadorTaxa({'corrida': (1.0, 5)})
+    limitador.consumir('corrida', 'u:1', agora=0)
+    for _ in range(5):
+        limitador.consumir('corrida', 'u:2', agora=0)
+
+    limitador.despejar(agora=2)
+    assert len(limitador) == 1  # u:1 já teria reposto a ficha, u:2 ainda não
+    limitador.despejar(agora=5)
+    assert len(limitador) == 0
+
+
+def test_grupos_por_prefixo() -> None:
+    assert grupo_da_rota(f"{settings.API_V1_STR}/corrida/cotar") == 'corrida'
+    assert grupo_da_rota(f"{settings.API_V1_STR}/login/access-token") == 'login'
+    assert grupo_da_rota(f"{settings.API_V1_STR}/corridas") is None
+    assert grupo_da_rota(f"{settings.API_V1_STR}/users/me") is None
+
+
+def test_middleware_rejeita_antes_das_dependencias() -> None:
+    chamadas = []
+    app = FastAPI()
+
+    def sessao():
+        chamadas.append('sessao')
+
+    @app.post(f"{settings.API_V1_STR}/corrida/cotar")
+    def cotar(_=Depends(sessao)) -> dict:
+        return {}
+
+    app.add_middleware(MiddlewareLimiteTaxa, limitador=LimitadorTaxa({'corrida': (0.001, 2)}))
+    cliente = TestClient(app)
+    token = security.create_access_token(7, timedelta(minutes=5))
+
+    respostas = [cliente.post(f"{settings.API_V1_STR}/corrida/cotar", headers={'Authorization': f"Bearer {token}"}) for _ in range(3)]
+
+    assert [r.status_code for r in respostas] == [200, 200, 429]
+    assert int(respostas[2].headers['retry-after']) > 0
+    assert chamadas == ['sessao', 'sessao']
+    # sem token o balde é o do IP
+    assert cliente.post(f"{settings.API_V1_STR}/corrida/cotar").status_code == 200
+
+
+def _scope(cliente: str, encaminhado: str | None = None) -> dict:
+    headers = [(b"x-forwarded-for", encaminhado.encode())] if encaminhado else []
+    return {"type": "http", "client": (cliente, 50000), "headers": headers}
+
+
+def test_endereco_do_cliente_so_confia_no_proxy_configurado() -> None:
+    proxies = [ipaddress.ip_network("10.0.0.0/8")]
+
+    # sem proxies configurados vale a conexão, mesmo com X-Forwarded-For
+    assert endereco_do_cliente(_scope("10.0.0.5", "203.0.113.9"), []) == "10.0.0.5"
+    assert endereco_do_cliente(_scope("10.0.0.5", "203.0.113.9"), proxies) == "203.0.113.9"
+    # conexão direta de fora não pode escolher o próprio IP
+    assert endereco_do_cliente(_scope("198.51.100.1", "203.0.113.9"), proxies) == "198.51.100.1"
+    # o que o cliente pôs no cabeçalho antes do proxy é ignorado
+    assert endereco_do_cliente(_scope("10.0.0.5", "1.2.3.4, 203.0.113.9, 10.0.0.7"), proxies) == "203.0.113.9"
+    assert chave_do_cliente(_scope("10.0.0.5")) == "ip:10.0.0.5"
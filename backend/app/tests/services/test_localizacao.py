@@ -0,0 +1,40 @@
+import contextlib
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import driver
+from app.services.cache_principais import Principal
+
+MOTORISTA = Principal(7, 'm@x.com', None, 'driver', True, False)
+
+
+class Sessao:
+    async def scalar(self, _statement):
+        return True
+
+
+def test_ws_aplica_a_posicao_retida_quando_o_intervalo_termina(monkeypatch) -> None:
+    registradas = []
+
+    async def principal(_token):
+        return MOTORISTA
+
+    monkeypatch.setattr(driver, 'get_principal_from_token', principal)
+    monkeypatch.setattr(driver, 'async_session', lambda: contextlib.nullcontext(Sessao()))
+    monkeypatch.setattr(driver.settings, 'LOCALIZACAO_WS_INTERVALO_MIN_S', 0.2)
+    monkeypatch.setattr(
+        driver.buffer_localizacoes, 'registrar', lambda _id, lat, lon, _em=None: registradas.append((lat, lon))
+    )
+    app = FastAPI()
+    app.include_router(driver.router)
+
+    with TestClient(app).websocket_connect("/driver/location/ws?token=x") as ws:
+        ws.send_text('{"lat": -25.43, "lon": -49.27}')
+        ws.send_text('{"lat": -25.44, "lon": -49.28}')  # dentro do intervalo: fica retida
+        limite = time.monotonic() + 2
+        while len(registradas) < 2 and time.monotonic() < limite:
+            time.sleep(0.02)
+        # aplicada sem que o app mande outra posição
+        assert registradas == [(-25.43, -49.27), (-25.44, -49.28)]
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.notificacoes import OuvinteNotificacoes
+
+
+async def notificacoes(total: int):
+    for i in range(total):
+        yield SimpleNamespace(channel="corridas", payload=f'{{"id": {i}, "status": "aguardando"}}')
+
+
+def test_trata_em_paralelo_com_limite() -> None:
+    ouvinte = OuvinteNotificacoes(max_concorrencia=5)
+    tratados: list[int] = []
+    ativos = 0
+    pico = 0
+
+    async def tratador(evento: dict) -> None:
+        nonlocal ativos, pico
+        ativos += 1
+        pico = max(pico, ativos)
+        await asyncio.sleep(0.001)
+        ativos -= 1
+        tratados.append(evento["id"])
+
+    async def rodar() -> None:
+        ouvinte.registrar("corridas", tratador)
+        ouvinte.registrar("outro", tratador)
+        await ouvinte.consumir(notificacoes(50))
+        await ouvinte.aguardar_pendentes()
+
+    asyncio.run(rodar())
+
+    assert sorted(tratados) == list(range(50))
+    assert pico == 5
+
+
+def test_falha_de_um_tratador_nao_para_o_consumo() -> None:
+    ouvinte = OuvinteNotificacoes(max_concorrencia=2)
+    tratados: list[int] = []
+
+    async def tratador(evento: dict) -> None:
+        if evento["id"] == 3:
+            raise ValueError("falhou")
+        tratados.append(evento["id"])
+
+    async def rodar() -> None:
+        ouvinte.registrar("corridas", tratador)
+        await ouvinte.consumir(notificacoes(10))
+        await ouvinte.aguardar_pendentes()
+
+    asyncio.run(rodar())
+
+    assert len(tratados) == 9
+    assert ouvinte.falhas == 1
@@ -0,0 +1,111 @@
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.demanda import PainelDemanda
+from app.services.despacho import Atribuicao, Despachante
+from app.services.indice_motoristas import IndiceMotoristas
+from app.services.ofertas import AgendadorOfertas, RodaTemporizadores
+
+
+def test_roda_vence_no_tick_certo() -> None:
+    roda = RodaTemporizadores(resolucao_s=1.0, tamanho=8)
+    roda.agendar('a', 3)
+    roda.agendar('b', 1)
+    roda.agendar('c', 20)  # mais de uma volta
+    roda.agendar('d', 5)
+    assert roda.cancelar('d')
+
+    vencidas = {tick: roda.avancar() for tick in range(1, 25)}
+
+    assert vencidas[1] == ['b']
+    assert vencidas[3] == ['a']
+    assert vencidas[20] == ['c']
+    assert sum(len(v) for v in vencidas.values()) == 3
+    assert len(roda) == 0
+
+
+def test_reagendar_substitui_o_prazo() -> None:
+    roda = RodaTemporizadores(resolucao_s=1.0, tamanho=8)
+    roda.agendar('a', 2)
+    roda.agendar('a', 4)
+
+    assert [roda.avancar() for _ in range(4)] == [[], [], [], ['a']]
+
+
+def test_recusa_volta_a_corrida_para_a_fila_sem_o_motorista() -> None:
+    indice = IndiceMotoristas()
+    despachante = Despachante(indice)
+    painel = PainelDemanda()
+    agendador = AgendadorOfertas(despachante, painel, timeout_s=10)
+    oferta = Atribuicao(corrida_id=1, passageiro_id=10, motorista_id=20, tempo_chegada_min=3.0, lat=-25.43, lon=-49.27)
+    indice.ocupar(20)
+    agendador.ofertar(oferta)
+
+    assert agendador.oferta(1, 20) == oferta
+    assert agendador.oferta(1, 21) is None
+
+    agendador.concluir_devolucao([oferta], expiradas=False)
+
+    assert len(agendador) == 0
+    assert 1 not in agendador.roda
+    assert len(despachante) == 1
+    assert painel.recusas_motoristas(-25.43, -49.27) == 1
+    # motorista que recusou não volta a receber esta corrida
+    reservas = list(despachante._fila.values())
+    indice.atualizar(20, -25.43, -49.27)
+    indice.atualizar(21, -25.44, -49.27)
+    planejadas = despachante.planejar(
+        reservas, [(20, indice.posicao(20)), (21, indice.posicao(21))], {1: {20}}
+    )
+    assert [a.motorista_id for a in planejadas] == [21]
+
+
+def test_recusa_de_oferta_feita_em_outro_worker_volta_para_a_fila_local() -> None:
+    indice = IndiceMotoristas()
+    despachante = Despachante(indice)
+    agendador = AgendadorOfertas(despachante, PainelDemanda(), timeout_s=10)
+    oferta = Atribuicao(corrida_id=2, passageiro_id=10, motorista_id=20, tempo_chegada_min=3.0, lat=-25.43, lon=-49.27)
+
+    agendador.concluir_devolucao([oferta], expiradas=False)
+
+    assert list(despachante._fila) == [2]
+    assert despachante._recusados[2] == {20}
+    assert agendador.recusadas == 1
+
+
+def test_descartar_esquece_oferta_e_prazo() -> None:
+    agendador = AgendadorOfertas(Despachante(IndiceMotoristas()), PainelDemanda(), timeout_s=10)
+    oferta = Atribuicao(corrida_id=3, passageiro_id=10, motorista_id=20, tempo_chegada_min=3.0, lat=-25.43, lon=-49.27)
+    agendador.ofertar(oferta)
+
+    agendador.descartar(3)
+
+    assert len(agendador) == 0
+    assert 3 not in agendador.roda
+
+
+class _SessaoFalsa:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+        class _Resultado:
+            def first(self):
+                return None
+
+        return _Resultado()
+
+
+def test_devolver_so_desfaz_a_atribuicao_do_mesmo_motorista() -> None:
+    agendador = AgendadorOfertas(Despachante(IndiceMotoristas()), PainelDemanda(), timeout_s=10)
+    oferta = Atribuicao(corrida_id=4, passageiro_id=10, motorista_id=20, tempo_chegada_min=3.0, lat=-25.43, lon=-49.27)
+    sessao = _SessaoFalsa()
+
+    assert asyncio.run(agendador.devolver(sessao, [oferta])) == []
+
+    sql = str(sessao.statements[0].compile(dialect=postgresql.dialect()))
+    assert "corridas.motorista_id = " in sql
+    assert "corridas.status = " in sql
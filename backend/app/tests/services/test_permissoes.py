@@ -0,0 +1,72 @@
+from collections.abc import Iterator
+from datetime import timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.deps import ResourceAccess
+from app.core import permissions, security
+from app.core.permissions import Action, MapaPermissoes
+from app.services.cache_principais import Principal, cache_principais
+
+
+def test_mapa_de_bits() -> None:
+    mapa = MapaPermissoes({
+        ('driver', 'documentos', Action.GET),
+        ('driver', 'documentos', Action.POST),
+        ('user', 'perfil', Action.GET),
+    })
+
+    assert mapa.permite('driver', 'documentos', 'POST')
+    assert not mapa.permite('driver', 'documentos', 'DELETE')
+    assert not mapa.permite('driver', 'perfil', 'GET')
+    assert mapa.permite('user', 'perfil', 'GET')
+    assert not mapa.permite(None, 'perfil', 'GET')
+    assert not mapa.permite('user', 'inexistente', 'GET')
+    assert mapa.permite('admin', 'qualquer', 'DELETE')
+
+
+@pytest.fixture
+def cliente(monkeypatch) -> Iterator[TestClient]:
+    mapa = MapaPermissoes({('driver', 'documentos', Action.GET)})
+    monkeypatch.setattr('app.api.deps.mapa_permissoes', mapa)
+    cache_principais.guardar('7', Principal(7, 'm@x.com', None, 'driver', True, False))
+    app = FastAPI()
+
+    @app.get("/documentos")
+    def documentos(_=ResourceAccess('documentos')) -> dict:
+        return {}
+
+    @app.delete("/documentos")
+    def remover(_=ResourceAccess('documentos')) -> dict:
+        return {}
+
+    yield TestClient(app)
+    cache_principais.invalidar('7')
+
+
+def cabecalho(role: str | None) -> dict:
+    return {'Authorization': f"Bearer {security.create_access_token(7, timedelta(minutes=5), role=role)}"}
+
+
+def test_resource_access_usa_o_papel_do_principal(cliente, monkeypatch) -> None:
+    assert cliente.get("/documentos", headers=cabecalho('driver')).status_code == 200
+    assert cliente.delete("/documentos", headers=cabecalho('driver')).status_code == 403
+    # a claim não concede nada: vale o papel atual do usuário
+    assert cliente.delete("/documentos", headers=cabecalho('admin')).status_code == 403
+
+    cache_principais.guardar('7', Principal(7, 'm@x.com', None, 'user', True, False))
+    assert cliente.get("/documentos", headers=cabecalho('driver')).status_code == 403
+    cache_principais.guardar('7', Principal(7, 'm@x.com', None, 'admin', True, False))
+    assert cliente.delete("/documentos", headers=cabecalho('driver')).status_code == 200
+
+    token_antigo = cabecalho('driver')
+    monkeypatch.setattr('app.api.deps.PERMISSOES_VERSAO', permissions.PERMISSOES_VERSAO + 1)
+    assert cliente.get("/documentos", headers=token_antigo).status_code == 401
+
+
+def test_resource_access_barra_usuario_desativado(cliente) -> None:
+    cache_principais.guardar('7', Principal(7, 'm@x.com', None, 'driver', False, False))
+
+    assert cliente.get("/documentos", headers=cabecalho('driver')).status_code == 400
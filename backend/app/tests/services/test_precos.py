@@ -0,0 +1,62 @@
+import random
+from dataclasses import asdict
+
+import numpy as np
+
+from app.services.corrida import calcular_multiplicador, calcular_preco
+from app.services.precos import MotorPrecos, arredondar_centavos
+from app.services.tarifas import CATEGORIAS_PADRAO
+
+REGRAS = [asdict(categoria) for categoria in CATEGORIAS_PADRAO]
+
+# (passageiros_ativos, motoristas_disponiveis) que produzem cada multiplicador
+# com tempo de espera de 5 min e nenhuma recusa
+DEMANDA_POR_MULTIPLICADOR = {1.0: (0, 1), 1.2: (12, 10), 1.5: (17, 10), 2.0: (25, 10), 2.5: (40, 10), 3.0: (0, 0)}
+
+
+def test_cotar_igual_a_calcular_preco() -> None:
+    rng = random.Random(7)
+    motor = MotorPrecos(REGRAS)
+    for _ in range(5000):
+        argumentos = dict(
+            distancia_km=rng.choice([0, rng.uniform(0, 80), round(rng.uniform(0, 80), 1)]),
+            duracao_min=rng.choice([0, rng.uniform(0, 120), rng.randint(0, 120)]),
+            passageiros_ativos=rng.randint(0, 200),
+            motoristas_disponiveis=rng.randint(0, 100),
+            tempo_espera_min=rng.uniform(0, 20),
+            recusas_motoristas=rng.randint(0, 10),
+            taxa_combustivel_por_km=rng.choice([0.0, 6.19, rng.uniform(0, 10)]),
+            taxa_plataforma=rng.choice([2.0, rng.uniform(0, 5)]),
+            pedagios=rng.choice([None, [], [rng.uniform(0, 20) for _ in range(rng.randint(1, 3))]]),
+            desconto=rng.choice([0.0, rng.uniform(0, 100)]),
+        )
+
+        esperado = [calcular_preco(regra, **argumentos) for regra in REGRAS]
+
+        assert motor.cotar(**argumentos) == esperado
+
+
+def test_calcular_varios_trajetos() -> None:
+    rng = np.random.default_rng(3)
+    motor = MotorPrecos(REGRAS)
+    distancias = rng.uniform(0, 50, 300)
+    duracoes = rng.uniform(0, 90, 300)
+    multiplicadores = rng.choice(list(DEMANDA_POR_MULTIPLICADOR), 300)
+
+    precos = motor.calcular(distancias, duracoes, multiplicadores, taxa_combustivel_por_km=6.19)
+
+    assert precos.shape == (300, len(REGRAS))
+    for i in range(300):
+        passageiros, motoristas = DEMANDA_POR_MULTIPLICADOR[multiplicadores[i]]
+        assert calcular_multiplicador(passageiros, motoristas, 5.0, 0) == multiplicadores[i]
+        esperado = [
+            calcular_preco(regra, distancias[i], duracoes[i], passageiros, motoristas, 5.0, taxa_combustivel_por_km=6.19)
+            for regra in REGRAS
+        ]
+        assert precos[i].tolist() == esperado
+
+
+def test_arredondar_centavos_como_round() -> None:
+    valores = np.array([1.005, 2.675, 0.125, 10.0049999, 8.0, 12.345, 1e-9])
+
+    assert arredondar_centavos(valores).tolist() == [round(v, 2) for v in valores.tolist()]
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.services.pubsub import PubSubUsuarios, ao_notificar_corrida, pubsub_usuarios
+
+
+def test_entrega_so_ao_usuario_assinante() -> None:
+    pubsub = PubSubUsuarios()
+
+    async def rodar() -> None:
+        async with pubsub.assinar(1) as fila_1, pubsub.assinar(2) as fila_2:
+            assert pubsub.publicar(1, {'status': 'atribuida'}) == 1
+            assert await fila_1.get() == {'status': 'atribuida'}
+            assert fila_2.empty()
+        assert len(pubsub) == 0
+        assert pubsub.publicar(1, {'status': 'cancelar'}) == 0
+
+    asyncio.run(rodar())
+
+
+def test_fila_cheia_descarta_o_evento_mais_antigo() -> None:
+    pubsub = PubSubUsuarios(tamanho_fila=2)
+
+    async def rodar() -> None:
+        async with pubsub.assinar(1) as fila:
+            for status in ('aguardando', 'atribuida', 'cancelar'):
+                pubsub.publicar(1, {'status': status})
+            assert [fila.get_nowait()['status'] for _ in range(fila.qsize())] == ['atribuida', 'cancelar']
+
+    asyncio.run(rodar())
+
+
+def test_evento_repetido_nao_e_entregue_de_novo() -> None:
+    pubsub = PubSubUsuarios()
+
+    async def rodar() -> None:
+        async with pubsub.assinar(1) as fila:
+            assert pubsub.publicar(1, {'corrida_id': 5, 'status': 'atribuida'}) == 1
+            assert pubsub.publicar(1, {'corrida_id': 5, 'status': 'atribuida'}) == 0
+            assert pubsub.publicar(1, {'corrida_id': 5, 'status': 'aceita'}) == 1
+            assert fila.qsize() == 2
+
+    asyncio.run(rodar())
+
+
+def test_notify_de_outro_worker_chega_ao_passageiro() -> None:
+    async def rodar() -> None:
+        async with pubsub_usuarios.assinar(7001) as fila:
+            await ao_notificar_corrida(
+                {'tabela': 'corridas', 'id': 3, 'passageiro_id': 7001, 'motorista_id': 9, 'status': 'aceita', 'anterior': 'atribuida'}
+            )
+            assert fila.get_nowait() == {'corrida_id': 3, 'status': 'aceita', 'motorista_id': 9, 'tempo_chegada_min': None}
+            # o processo que gravou publicou o mesmo estado antes: o NOTIFY não duplica
+            pubsub_usuarios.publicar(7001, {'corrida_id': 3, 'status': 'em_andamento', 'motorista_id': 9, 'tempo_chegada_min': None})
+            await ao_notificar_corrida({'id': 3, 'passageiro_id': 7001, 'motorista_id': 9, 'status': 'em_andamento'})
+            assert fila.qsize() == 1
+
+    asyncio.run(rodar())
+
+
+def test_notify_de_atribuicao_chega_como_oferta_ao_motorista() -> None:
+    async def rodar() -> None:
+        async with pubsub_usuarios.assinar(7002) as fila:
+            await ao_notificar_corrida(
+                {'id': 4, 'passageiro_id': 7003, 'motorista_id': 7002, 'status': 'atribuida',
+                 'tempo_chegada_min': 3.5, 'lat_ini': -25.43, 'lon_ini': -49.27}
+            )
+            evento = fila.get_nowait()
+            assert evento['oferta'] == 4
+            assert (evento['lat_ini'], evento['lon_ini'], evento['tempo_chegada_min']) == (-25.43, -49.27, 3.5)
+
+    asyncio.run(rodar())
@@ -0,0 +1,35 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from app.api.routes.roteamento import (
+    FK_CATEGORIA,
+    UQ_PASSAGEIRO_ATIVA,
+    Reserva,
+    restricao_violada,
+)
+
+
+class _Diag:
+    def __init__(self, constraint_name: str | None):
+        self.constraint_name = constraint_name
+
+
+class _ErroDriver(Exception):
+    def __init__(self, constraint_name: str | None):
+        super().__init__(constraint_name)
+        self.diag = _Diag(constraint_name)
+
+
+def test_reserva_exige_o_embarque() -> None:
+    with pytest.raises(ValidationError):
+        Reserva(id='6f1c1a46-2b44-4a8e-9a43-5d2f7c0b1e10', lat_fim=-25.4, lon_fim=-49.2)
+
+
+def test_restricao_violada_distingue_corrida_ativa_e_categoria() -> None:
+    ativa = IntegrityError("INSERT", {}, _ErroDriver(UQ_PASSAGEIRO_ATIVA))
+    categoria = IntegrityError("INSERT", {}, _ErroDriver(FK_CATEGORIA))
+
+    assert restricao_violada(ativa) == UQ_PASSAGEIRO_ATIVA
+    assert restricao_violada(categoria) == FK_CATEGORIA
+    assert restricao_violada(IntegrityError("INSERT", {}, Exception())) is None
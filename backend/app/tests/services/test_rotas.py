@@ -0,0 +1,97 @@
+import heapq
+import math
+
+import numpy as np
+
+from app.services.rotas import GrafoViario, MotorRotas, ServicoRotas
+
+
+def grade_aleatoria(lado: int, semente: int) -> GrafoViario:
+    """Grade lado × lado com tempos aleatórios e algumas vias de mão única."""
+    rng = np.random.default_rng(semente)
+    ids = np.arange(lado * lado).reshape(lado, lado)
+    lat = (-25.45 + np.repeat(np.arange(lado), lado) * 0.001).astype(float)
+    lon = (-49.28 + np.tile(np.arange(lado), lado) * 0.001).astype(float)
+    origem, destino = [], []
+    for a, b in [*zip(ids[:, :-1].ravel(), ids[:, 1:].ravel()), *zip(ids[:-1].ravel(), ids[1:].ravel())]:
+        sentido = rng.choice([0, 0, 0, 1, -1])
+        if sentido >= 0:
+            origem.append(a)
+            destino.append(b)
+        if sentido <= 0:
+            origem.append(b)
+            destino.append(a)
+    tempo = rng.uniform(5, 60, len(origem))
+    return GrafoViario(lat, lon, np.array(origem), np.array(destino), tempo, tempo * 10)
+
+
+def dijkstra(grafo: GrafoViario, origem: int, destino: int) -> float:
+    vizinhos: dict[int, list] = {}
+    for u, v, t in zip(grafo.origem.tolist(), grafo.destino.tolist(), grafo.tempo_s.tolist()):
+        vizinhos.setdefault(u, []).append((v, t))
+    dist = {origem: 0.0}
+    heap = [(0.0, origem)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u == destino:
+            return d
+        if d > dist[u]:
+            continue
+        for v, t in vizinhos.get(u, ()):
+            if d + t < dist.get(v, math.inf):
+                dist[v] = d + t
+                heapq.heappush(heap, (d + t, v))
+    return math.inf
+
+
+def test_hierarquia_igual_a_dijkstra() -> None:
+    grafo = grade_aleatoria(12, semente=3)
+    motor = MotorRotas.construir(grafo)
+    rng = np.random.default_rng(4)
+
+    for origem, destino in rng.integers(0, grafo.total_nos, (200, 2)).tolist():
+        esperado = dijkstra(grafo, origem, destino)
+        resultado = motor.menor_caminho(origem, destino)
+        if esperado == math.inf:
+            assert resultado is None
+        else:
+            assert math.isclose(resultado[0], esperado)
+            # distância é a do caminho mais rápido (aqui, 10 m por segundo de tempo)
+            assert math.isclose(resultado[1], esperado * 10)
+
+
+def test_salvar_e_carregar(tmp_path) -> None:
+    motor = MotorRotas.construir(grade_aleatoria(6, semente=5))
+    caminho = tmp_path / "grafo.npz"
+    motor.salvar(str(caminho))
+
+    carregado = MotorRotas.carregar(str(caminho))
+
+    assert carregado.menor_caminho(0, 35) == motor.menor_caminho(0, 35)
+    assert carregado.no_mais_proximo(-25.45, -49.28)[0] == 0
+
+
+def test_servico_sem_grafo_nao_aceita_distancia_menor_que_linha_reta() -> None:
+    servico = ServicoRotas()
+
+    distancia_km, duracao_min = servico.trajeto(-25.43, -49.27, -25.53, -49.27, 0.5, 1.0)
+
+    assert distancia_km > 11
+    assert duracao_min > 5
+
+
+def test_matriz_igual_a_consultas_individuais() -> None:
+    grafo = grade_aleatoria(10, semente=6)
+    motor = MotorRotas.construir(grafo)
+    origens, destinos = [0, 17, 55, 99], [3, 42, 58, 80, 99]
+
+    tempos, distancias = motor.matriz(origens, destinos)
+
+    for i, origem in enumerate(origens):
+        for j, destino in enumerate(destinos):
+            esperado = motor.menor_caminho(origem, destino)
+            if esperado is None:
+                assert tempos[i, j] == math.inf
+            else:
+                assert math.isclose(tempos[i, j], esperado[0], abs_tol=1e-9)
+                assert math.isclose(distancias[i, j], esperado[1], abs_tol=1e-9)
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app.services.senhas import SenhasSobrecarregadas, ServicoSenhas
+
+# sha256_crypt com poucas rodadas: mesmo comportamento do CryptContext, sem o custo do bcrypt
+ATUAL = CryptContext(
+    schemes=["sha256_crypt"],
+    sha256_crypt__default_rounds=1100,
+    sha256_crypt__min_rounds=1100,
+    sha256_crypt__max_rounds=1100,
+)
+ANTIGO = CryptContext(schemes=["sha256_crypt"], sha256_crypt__default_rounds=1000)
+
+
+def test_verifica_e_refaz_hash_com_outro_custo() -> None:
+    servico = ServicoSenhas(ATUAL, max_threads=2, fila_maxima=4)
+
+    async def rodar() -> None:
+        hash_antigo = ANTIGO.hash("segredo123")
+        assert await servico.verificar_e_atualizar("errada", hash_antigo) == (False, None)
+        valida, novo_hash = await servico.verificar_e_atualizar("segredo123", hash_antigo)
+        assert valida and novo_hash is not None
+        assert await servico.verificar_e_atualizar("segredo123", novo_hash) == (True, None)
+        assert await servico.verificar("segredo123", await servico.gerar_hash("segredo123"))
+
+    asyncio.run(rodar())
+    assert servico.rehashes == 1
+    assert servico.pendentes == 0
+
+
+def test_rejeita_quando_a_fila_enche_sem_travar_o_loop() -> None:
+    servico = ServicoSenhas(ATUAL, max_threads=1, fila_maxima=1)
+    liberar = threading.Event()
+
+    async def rodar() -> None:
+        bloqueadas = [asyncio.ensure_future(servico._executar(liberar.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)  # o loop segue livre enquanto a thread está ocupada
+        assert (servico.em_execucao, servico.em_espera) == (1, 1)
+        with pytest.raises(SenhasSobrecarregadas):
+            await servico.gerar_hash("segredo123")
+        liberar.set()
+        await asyncio.gather(*bloqueadas)
+
+    asyncio.run(rodar())
+    assert servico.metricas()['rejeitadas'] == 1
+    assert servico.metricas()['em_espera'] == 0
+
+
+def test_cancelar_quem_espera_nao_libera_a_vaga_da_thread() -> None:
+    servico = ServicoSenhas(ATUAL, max_threads=1, fila_maxima=1)
+    liberar = threading.Event()
+
+    async def rodar() -> None:
+        ocupada = asyncio.ensure_future(servico._executar(liberar.wait))
+        await asyncio.sleep(0.01)
+        ocupada.cancel()  # o cliente caiu, mas a thread continua no bcrypt
+        await asyncio.sleep(0.01)
+        assert servico.em_execucao == 1
+        na_fila = asyncio.ensure_future(servico._executar(liberar.wait))
+        await asyncio.sleep(0.01)
+        assert servico.em_espera == 1
+        with pytest.raises(SenhasSobrecarregadas):
+            await servico.gerar_hash("segredo123")
+        liberar.set()
+        await na_fila
+        await asyncio.sleep(0.01)
+
+    asyncio.run(rodar())
+    assert servico.pendentes == 0
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from app.services import tokens_supabase
+from app.services.tokens_supabase import TokenSupabaseInvalido, VerificadorSupabase
+
+SEGREDO = "segredo-do-projeto-com-pelo-menos-32-bytes"
+
+
+def claims(**extra) -> dict:
+    return {"sub": "u-1", "email": "p@x.com", "aud": "authenticated", "exp": int(time.time()) + 3600, **extra}
+
+
+def escrever_jwks(caminho, chaves: dict, mtime: float) -> None:
+    jwks = {"keys": []}
+    for kid, privada in chaves.items():
+        jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(privada.public_key()))
+        jwks["keys"].append({**jwk, "kid": kid, "alg": "ES256", "use": "sig"})
+    caminho.write_text(json.dumps(jwks))
+    os.utime(caminho, (mtime, mtime))
+
+
+def test_hs256_e_cache_de_claims() -> None:
+    verificador = VerificadorSupabase(segredo=SEGREDO)
+    token = jwt.encode(claims(), SEGREDO, algorithm="HS256")
+
+    assert verificador.verificar(token)["sub"] == "u-1"
+    assert verificador.verificar(token)["email"] == "p@x.com"
+    assert (verificador.verificados, verificador.acertos) == (1, 1)
+
+    with pytest.raises(TokenSupabaseInvalido):
+        verificador.verificar(jwt.encode(claims(), "outro-segredo-com-pelo-menos-32-bytes!", algorithm="HS256"))
+    with pytest.raises(TokenSupabaseInvalido):
+        verificador.verificar(jwt.encode(claims(exp=int(time.time()) - 10), SEGREDO, algorithm="HS256"))
+    with pytest.raises(TokenSupabaseInvalido):
+        verificador.verificar(jwt.encode(claims(aud="outro"), SEGREDO, algorithm="HS256"))
+    # sem assinatura nunca passa
+    with pytest.raises(TokenSupabaseInvalido):
+        verificador.verificar(jwt.encode(claims(), None, algorithm="none"))
+
+
+def test_jwks_com_rotacao_de_chave(tmp_path, monkeypatch) -> None:
+    antiga, nova = ec.generate_private_key(ec.SECP256R1()), ec.generate_private_key(ec.SECP256R1())
+    caminho = tmp_path / "jwks.json"
+    escrever_jwks(caminho, {"k1": antiga}, mtime=1000)
+    verificador = VerificadorSupabase(jwks_path=str(caminho))
+
+    assert verificador.verificar(jwt.encode(claims(), antiga, algorithm="ES256", headers={"kid": "k1"}))["sub"] == "u-1"
+
+    escrever_jwks(caminho, {"k1": antiga, "k2": nova}, mtime=2000)
+    token_novo = jwt.encode(claims(), nova, algorithm="ES256", headers={"kid": "k2"})
+    monkeypatch.setattr(tokens_supabase, "INTERVALO_RECARGA_S", 0.0)
+    assert verificador.verificar(token_novo)["sub"] == "u-1"
+    assert verificador.recargas == 2
+
+    # chave certa com kid errado não é aceita
+    with pytest.raises(TokenSupabaseInvalido):
+        verificador.verificar(jwt.encode(claims(sub="u-2"), nova, algorithm="ES256", headers={"kid": "k1"}))
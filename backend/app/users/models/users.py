@@ -8,8 +8,8 @@ from sqlmodel import Field, Relationship, SQLModel
 # supondo que você tenha convertido Log para SQLAlchemy
 
 from datetime import date
-from sqlalchemy import Column, Index, Integer, String, Boolean, Date
-from geoalchemy2 import Geometry
+from sqlalchemy import Column, Computed, DateTime, Index, Integer, String, Boolean, Date
+from geoalchemy2 import Geography, Geometry
 from app.core.models.core import Log
 from app.datetime_utils import get_utc_now
 from app.database import Base
@@ -30,6 +30,8 @@ class Token(BaseModel):
 # Contents of JWT token
 class TokenPayload(BaseModel):
     sub: str | None = None
+    role: str | None = None
+    pv: int | None = None  # versão das permissões quando o token foi emitido
 
 
 class NewPassword(BaseModel):
@@ -96,8 +98,16 @@ class User(Log, Base):
     data_nascimento = Column(Date, nullable=True)
     is_available = Column(Boolean, default=True, nullable=True)
     current_location = Column(Geometry(geometry_type="POINT", srid=4326), nullable=True)
+    # Cópia em geography mantida pelo banco, com índice GiST para buscas por raio/KNN em metros
+    current_location_geog = Column(
+        Geography(geometry_type="POINT", srid=4326, spatial_index=False),
+        Computed("current_location::geography", persisted=True),
+        nullable=True,
+    )
+    # Instante em que o servidor recebeu a posição gravada em current_location
+    localizacao_em = Column(DateTime(timezone=True), nullable=True)
     veiculo_id = Column(Integer, nullable=True)  # foreign key se precisar
-    status_corrida = Column(String(50), nullable=True)
+    status_corrida = Column(String(50), nullable=True)  # legado: o estado da corrida fica em corridas.status
     cpf = Column(String(14), nullable=True)
     cnh = Column(String(20), nullable=True)
     cnh_arquivo = Column(String(1000), nullable=True)
@@ -113,5 +123,9 @@ class User(Log, Base):
     cep = Column(String(10), nullable=True)
     cidade = Column(String(50), nullable=True)
     estado = Column(String(2), nullable=True)
-    __table_args__ = ({"schema": None},)
+    __table_args__ = (
+        Index("ix_users_current_location_geog", "current_location_geog", postgresql_using="gist"),
+        Index("ix_users_localizacao_em", "localizacao_em"),
+        {"schema": None},
+    )
     # foto_rosto = Column(String(1000), nullable=True)
@@ -0,0 +1,150 @@
+"""
+Vazão de atribuição com vários workers disputando os mesmos motoristas.
+
+Cada processo simula o despacho de um worker da API (o Dockerfile roda
+`--workers 4`): pega corridas do início da fila e motoristas de um grupo
+pequeno (todos os workers enxergam os mesmos motoristas próximos), trava,
+grava a atribuição e solta o motorista numa segunda transação. Compara:
+
+- bloqueante: `FOR UPDATE` nas corridas e nos motoristas, que espera quem
+  já estiver gravando;
+- reivindicação: `FOR UPDATE SKIP LOCKED` nas corridas e
+  `pg_try_advisory_xact_lock` nos motoristas, como em `app.services.despacho`,
+  pulando o que estiver ocupado.
+
+Usa tabelas UNLOGGED próprias, criadas e removidas pelo script, no banco
+configurado em `.env`:
+
+    python scripts/bench_despacho_concorrente.py [--workers 4] [--segundos 10]
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+
+import psycopg
+
+from app.services.despacho import LOCK_MOTORISTA
+from app.services.notificacoes import dsn_psycopg
+
+CORRIDAS = 500_000
+MOTORISTAS = 64
+LOTE = 8
+
+CRIAR_TABELAS = """
+DROP TABLE IF EXISTS bench_despacho_corridas, bench_despacho_motoristas;
+CREATE UNLOGGED TABLE bench_despacho_motoristas (
+    id integer PRIMARY KEY,
+    is_available boolean NOT NULL DEFAULT true
+);
+CREATE UNLOGGED TABLE bench_despacho_corridas (
+    id integer PRIMARY KEY,
+    status varchar(20) NOT NULL DEFAULT 'aguardando',
+    motorista_id integer
+);
+INSERT INTO bench_despacho_motoristas (id) SELECT generate_series(1, {motoristas});
+INSERT INTO bench_despacho_corridas (id) SELECT generate_series(1, {corridas});
+CREATE UNIQUE INDEX uq_bench_despacho_motorista_ativa ON bench_despacho_corridas (motorista_id)
+    WHERE status = 'atribuida';
+CREATE INDEX ix_bench_despacho_aguardando ON bench_despacho_corridas (id) WHERE status = 'aguardando';
+ANALYZE bench_despacho_corridas, bench_despacho_motoristas;
+"""
+
+TRAVAR = {
+    "bloqueante": (
+        """SELECT id FROM bench_despacho_corridas
+           WHERE id = ANY(%s) AND status = 'aguardando' ORDER BY id FOR UPDATE""",
+        """SELECT id FROM bench_despacho_motoristas
+           WHERE id = ANY(%s) AND is_available ORDER BY id FOR UPDATE""",
+    ),
+    "reivindicacao": (
+        """SELECT id FROM bench_despacho_corridas
+           WHERE id = ANY(%s) AND status = 'aguardando' FOR UPDATE SKIP LOCKED""",
+        f"""SELECT id FROM bench_despacho_motoristas
+           WHERE id = ANY(%s) AND is_available AND pg_try_advisory_xact_lock({LOCK_MOTORISTA}, id)""",
+    ),
+}
+
+
+def worker(modo: str, segundos: float, resultados) -> None:
+    travar_corridas, travar_motoristas = TRAVAR[modo]
+    atribuidas = rodadas = 0
+    espera_s = 0.0
+    with psycopg.connect(dsn_psycopg()) as conexao:
+        fim = time.monotonic() + segundos
+        while time.monotonic() < fim:
+            fila = [r[0] for r in conexao.execute(
+                "SELECT id FROM bench_despacho_corridas WHERE status = 'aguardando' ORDER BY id LIMIT %s",
+                (LOTE * 4,),
+            )]
+            conexao.commit()
+            corridas = sorted(random.sample(fila, min(LOTE, len(fila))))
+            motoristas = sorted(random.sample(range(1, MOTORISTAS + 1), LOTE))
+            inicio = time.monotonic()
+            with conexao.transaction():
+                livres_c = [r[0] for r in conexao.execute(travar_corridas, (corridas,))]
+                livres_m = [r[0] for r in conexao.execute(travar_motoristas, (motoristas,))]
+                espera_s += time.monotonic() - inicio
+                pares = list(zip(livres_c, livres_m))
+                for corrida_id, motorista_id in pares:
+                    conexao.execute(
+                        "UPDATE bench_despacho_corridas SET status = 'atribuida', motorista_id = %s WHERE id = %s",
+                        (motorista_id, corrida_id),
+                    )
+                conexao.execute(
+                    "UPDATE bench_despacho_motoristas SET is_available = false WHERE id = ANY(%s)",
+                    ([m for _, m in pares],),
+                )
+                conexao.execute("SELECT pg_sleep(0.002)")  # resto da rodada (publicar, ofertas)
+            # a corrida termina e o motorista volta a ficar disponível
+            with conexao.transaction():
+                conexao.execute(
+                    "UPDATE bench_despacho_corridas SET status = 'finalizada' WHERE id = ANY(%s)",
+                    ([c for c, _ in pares],),
+                )
+                conexao.execute(
+                    "UPDATE bench_despacho_motoristas SET is_available = true WHERE id = ANY(%s)",
+                    ([m for _, m in pares],),
+                )
+            atribuidas += len(pares)
+            rodadas += 1
+    resultados.put((atribuidas, rodadas, espera_s))
+
+
+def medir(modo: str, workers: int, segundos: float) -> None:
+    resultados = multiprocessing.Queue()
+    processos = [multiprocessing.Process(target=worker, args=(modo, segundos, resultados)) for _ in range(workers)]
+    for processo in processos:
+        processo.start()
+    parciais = [resultados.get() for _ in processos]
+    for processo in processos:
+        processo.join()
+    atribuidas = sum(p[0] for p in parciais)
+    rodadas = sum(p[1] for p in parciais)
+    espera_ms = 1000 * sum(p[2] for p in parciais) / max(rodadas, 1)
+    print(
+        f"{modo:>14}: {atribuidas / segundos:8.0f} atribuições/s, {rodadas / segundos:6.0f} rodadas/s, "
+        f"{espera_ms:6.2f} ms travando por rodada ({workers} workers)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with psycopg.connect(dsn_psycopg(), autocommit=True) as conexao:
+        # vários comandos numa só chamada: sem parâmetros do lado do servidor
+        conexao.execute(CRIAR_TABELAS.format(motoristas=MOTORISTAS, corridas=CORRIDAS))
+    try:
+        for modo in TRAVAR:
+            medir(modo, args.workers, args.segundos)
+    finally:
+        with psycopg.connect(dsn_psycopg(), autocommit=True) as conexao:
+            conexao.execute("DROP TABLE IF EXISTS bench_despacho_corridas, bench_despacho_motoristas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Micro-benchmark: distância de um embarque até N motoristas candidatos.
+
+Compara o laço em Python puro (haversine escalar) com `app.services.geo`:
+
+    python scripts/bench_geo.py
+"""
+
+import timeit
+
+import numpy as np
+
+from app.services import geo
+from app.services.indice_motoristas import distancia_m
+
+LAT, LON = -25.4284, -49.2733
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    for total in (100, 1_000, 10_000, 100_000):
+        lats = LAT + rng.uniform(-0.2, 0.2, total)
+        lons = LON + rng.uniform(-0.2, 0.2, total)
+        lats_lista, lons_lista = lats.tolist(), lons.tolist()
+
+        # variáveis do laço ligadas como padrão: cada função mede o lote da sua iteração
+        def python_puro(lats_lista=lats_lista, lons_lista=lons_lista):
+            return [distancia_m(LAT, LON, la, lo) for la, lo in zip(lats_lista, lons_lista, strict=True)]
+
+        def numpy_vetorizado(lats=lats, lons=lons):
+            return geo.haversine_m(LAT, LON, lats, lons)
+
+        def numpy_raio(lats=lats, lons=lons):
+            return geo.dentro_do_raio(LAT, LON, lats, lons, 10000)
+
+        repeticoes = max(1, 200_000 // total)
+        print(f"{total:>7} candidatos")
+        for nome, funcao in (("python puro", python_puro), ("numpy haversine", numpy_vetorizado), ("numpy caixa+raio", numpy_raio)):
+            segundos = min(timeit.repeat(funcao, number=repeticoes, repeat=5)) / repeticoes
+            print(f"    {nome:<18} {segundos * 1e6:>10.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
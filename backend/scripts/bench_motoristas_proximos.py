@@ -0,0 +1,94 @@
+"""
+Benchmark da busca de motoristas por raio no PostGIS.
+
+Compara o predicado antigo (cast de `current_location` para geography em cada
+linha) com o novo (coluna `current_location_geog` + índice GiST) sobre
+10 mil, 100 mil e 1 milhão de motoristas sintéticos em Curitiba e região.
+
+Usa uma tabela UNLOGGED própria (`bench_motoristas`), criada e removida pelo
+script, no banco configurado em `.env`:
+
+    python scripts/bench_motoristas_proximos.py [--tamanhos 10000 100000 1000000]
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+
+LAT, LON, RAIO_M = -25.4284, -49.2733, 10000
+REPETICOES = 20
+
+CRIAR_TABELA = """
+DROP TABLE IF EXISTS bench_motoristas;
+CREATE UNLOGGED TABLE bench_motoristas (
+    id integer PRIMARY KEY,
+    is_active boolean NOT NULL,
+    current_location geometry(POINT, 4326),
+    current_location_geog geography(POINT, 4326)
+        GENERATED ALWAYS AS (current_location::geography) STORED
+);
+INSERT INTO bench_motoristas (id, is_active, current_location)
+SELECT g, random() > 0.1,
+       ST_SetSRID(ST_MakePoint(-49.2733 + (random() - 0.5) * 4, -25.4284 + (random() - 0.5) * 4), 4326)
+FROM generate_series(1, :total) AS g;
+CREATE INDEX ix_bench_motoristas_geog ON bench_motoristas USING gist (current_location_geog);
+ANALYZE bench_motoristas;
+"""
+
+CONSULTAS = {
+    "cast por linha (antigo)": """
+        SELECT id FROM bench_motoristas
+        WHERE is_active AND ST_DWithin(
+            current_location::geography,
+            ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography,
+            :raio)
+    """,
+    "coluna geography + GiST (novo)": """
+        SELECT id FROM bench_motoristas
+        WHERE is_active AND ST_DWithin(
+            current_location_geog,
+            ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography,
+            :raio)
+    """,
+}
+
+
+def medir(conn, sql: str) -> tuple[float, str]:
+    parametros = {"lat": LAT, "lon": LON, "raio": RAIO_M}
+    plano = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), parametros).scalars().all()
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        conn.execute(text(sql), parametros).all()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), "\n".join(plano)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    with engine.connect() as conn:
+        try:
+            for total in args.tamanhos:
+                for comando in CRIAR_TABELA.strip().split(";\n"):
+                    conn.execute(text(comando), {"total": total})
+                conn.commit()
+                print(f"\n===== {total} motoristas =====")
+                for nome, sql in CONSULTAS.items():
+                    mediana_ms, plano = medir(conn, sql)
+                    print(f"\n--- {nome}: mediana {mediana_ms:.2f} ms ({REPETICOES} execuções)")
+                    print(plano)
+        finally:
+            conn.execute(text("DROP TABLE IF EXISTS bench_motoristas"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Vazão do consumidor de LISTEN/NOTIFY contra um Postgres local.
+
+Uma conexão envia N notificações no canal `bench_corridas` enquanto o
+`OuvinteNotificacoes` as consome com tratadores assíncronos (simulando
+1 ms de I/O cada):
+
+    python scripts/bench_notificacoes.py 20000
+"""
+
+import asyncio
+import sys
+import time
+
+import psycopg
+
+from app.services.notificacoes import OuvinteNotificacoes, dsn_psycopg
+
+CANAL = "bench_corridas"
+
+
+async def main(total: int) -> None:
+    ouvinte = OuvinteNotificacoes()
+    tratados = 0
+    terminou = asyncio.Event()
+
+    async def tratador(_evento: dict) -> None:
+        nonlocal tratados
+        await asyncio.sleep(0.001)
+        tratados += 1
+        if tratados == total:
+            terminou.set()
+
+    ouvinte.registrar(CANAL, tratador)
+    consumidor = asyncio.create_task(ouvinte.executar())
+    await asyncio.sleep(1)
+
+    inicio = time.perf_counter()
+    async with await psycopg.AsyncConnection.connect(dsn_psycopg(), autocommit=True) as conexao:
+        for lote in range(0, total, 1000):
+            async with conexao.transaction():
+                for i in range(lote, min(lote + 1000, total)):
+                    await conexao.execute("SELECT pg_notify(%s, %s)", (CANAL, f'{{"id": {i}, "status": "aguardando"}}'))
+    await terminou.wait()
+    segundos = time.perf_counter() - inicio
+    print(f"{total} eventos em {segundos:.2f} s: {total / segundos:.0f} eventos/s")
+    consumidor.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,166 @@
+"""
+Gera o grafo viário pré-processado (hierarquia de contração) usado por
+`app.services.rotas` a partir de um extrato OSM em XML.
+
+O `tileserver-gl/data/sul.mbtiles` só tem tiles vetoriais de renderização
+(sem topologia nem sentido de via), então o grafo vem do extrato OSM da
+mesma região. Para converter o .pbf da Geofabrik:
+
+    osmium cat sul-latest.osm.pbf -o sul-latest.osm.bz2
+    python scripts/construir_grafo_viario.py sul-latest.osm.bz2 data/grafo_viario.npz
+
+e apontar `ROTAS_GRAFO_PATH` para o arquivo gerado.
+"""
+
+import argparse
+import bz2
+import gzip
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from app.services import geo
+from app.services.rotas import GrafoViario, MotorRotas
+
+logger = logging.getLogger(__name__)
+
+# Velocidade típica (km/h) por tipo de via quando não há `maxspeed`
+VELOCIDADES_KMH = {
+    "motorway": 100,
+    "trunk": 80,
+    "primary": 60,
+    "secondary": 50,
+    "tertiary": 40,
+    "unclassified": 30,
+    "residential": 30,
+    "living_street": 10,
+    "service": 15,
+    "motorway_link": 50,
+    "trunk_link": 40,
+    "primary_link": 40,
+    "secondary_link": 35,
+    "tertiary_link": 30,
+}
+ACESSO_PROIBIDO = {"no", "private"}
+
+
+def abrir(caminho: str):
+    if caminho.endswith(".bz2"):
+        return bz2.open(caminho, "rb")
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rb")
+    return open(caminho, "rb")
+
+
+def velocidade_kmh(tags: dict[str, str]) -> float:
+    numero = re.match(r"\d+", tags.get("maxspeed", ""))
+    if numero:
+        return float(numero.group())
+    return VELOCIDADES_KMH[tags["highway"]]
+
+
+def sentido(tags: dict[str, str]) -> int:
+    """1: só no sentido da via; -1: só no sentido contrário; 0: mão dupla."""
+    oneway = tags.get("oneway", "")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway == "no":
+        return 0
+    if tags["highway"] in ("motorway", "motorway_link") or tags.get("junction") == "roundabout":
+        return 1
+    return 0
+
+
+def ler_vias(caminho: str):
+    """1ª passada: vias trafegáveis por carro, como (nós, velocidade, sentido)."""
+    vias = []
+    with abrir(caminho) as arquivo:
+        for _, elemento in ET.iterparse(arquivo):
+            if elemento.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in elemento.iter("tag")}
+                if (
+                    tags.get("highway") in VELOCIDADES_KMH
+                    and tags.get("access") not in ACESSO_PROIBIDO
+                    and tags.get("motor_vehicle") not in ACESSO_PROIBIDO
+                ):
+                    nos = [int(nd.get("ref")) for nd in elemento.iter("nd")]
+                    if len(nos) > 1:
+                        vias.append((nos, velocidade_kmh(tags), sentido(tags)))
+                elemento.clear()
+            elif elemento.tag in ("node", "relation"):
+                elemento.clear()
+    return vias
+
+
+def ler_coordenadas(caminho: str, usados: dict[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """2ª passada: coordenadas apenas dos nós usados pelas vias."""
+    lat = np.full(len(usados), np.nan)
+    lon = np.full(len(usados), np.nan)
+    with abrir(caminho) as arquivo:
+        for _, elemento in ET.iterparse(arquivo):
+            if elemento.tag == "node":
+                indice = usados.get(int(elemento.get("id")))
+                if indice is not None:
+                    lat[indice] = float(elemento.get("lat"))
+                    lon[indice] = float(elemento.get("lon"))
+            elemento.clear()
+    return lat, lon
+
+
+def montar_grafo(caminho: str) -> GrafoViario:
+    vias = ler_vias(caminho)
+    usados: dict[int, int] = {}
+    for nos, _, _ in vias:
+        for no in nos:
+            usados.setdefault(no, len(usados))
+    lat, lon = ler_coordenadas(caminho, usados)
+
+    origem, destino, velocidade = [], [], []
+    for nos, kmh, sentido_via in vias:
+        indices = [usados[no] for no in nos]
+        for a, b in zip(indices, indices[1:]):
+            if sentido_via >= 0:
+                origem.append(a)
+                destino.append(b)
+                velocidade.append(kmh)
+            if sentido_via <= 0:
+                origem.append(b)
+                destino.append(a)
+                velocidade.append(kmh)
+    origem = np.asarray(origem, dtype=np.int64)
+    destino = np.asarray(destino, dtype=np.int64)
+    validos = ~(np.isnan(lat[origem]) | np.isnan(lat[destino]))
+    origem, destino = origem[validos], destino[validos]
+    distancia_m = geo.haversine_m(lat[origem], lon[origem], lat[destino], lon[destino])
+    tempo_s = distancia_m / (np.asarray(velocidade)[validos] / 3.6)
+    return GrafoViario(lat, lon, origem, destino, tempo_s, distancia_m)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("osm", help="extrato OSM (.osm, .osm.bz2 ou .osm.gz)")
+    parser.add_argument("saida", help="arquivo .npz de saída")
+    parser.add_argument("--limite-testemunha", type=int, default=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    inicio = time.perf_counter()
+    grafo = montar_grafo(args.osm)
+    logger.info("Grafo: %s nós, %s arcos (%.0f s)", grafo.total_nos, len(grafo.origem), time.perf_counter() - inicio)
+    motor = MotorRotas.construir(grafo, limite_testemunha=args.limite_testemunha)
+    logger.info(
+        "Hierarquia: %s arcos de subida, %s de descida (%.0f s)",
+        len(motor.subida.destino),
+        len(motor.descida.destino),
+        time.perf_counter() - inicio,
+    )
+    motor.salvar(args.saida)
+
+
+if __name__ == "__main__":
+    main()
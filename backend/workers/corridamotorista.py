@@ -1,24 +1,30 @@
-from supabase import create_client, Client
-import os
-
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-
-supabase: Client = create_client(url, key)
-
-def on_update(payload):
-    print("🚦 Atualização detectada:", payload)
-    nova_linha = payload["new"]
-    if nova_linha["status"] == "iniciado":
-        print("➡️ Corrida iniciada, chamando motoristas...")
-
-# Inscrever no Realtime
-supabase \
-    .table("corridas") \
-    .on("UPDATE", on_update) \
-    .subscribe()
-
-# Mantém o worker rodando
-import time
-while True:
-    time.sleep(1)
+"""
+Worker de eventos de corrida: consome as mudanças de status enviadas pelo
+trigger `notificar_status_corrida` (canal `corridas`) via LISTEN/NOTIFY.
+
+    cd backend && python -m workers.corridamotorista
+"""
+
+import asyncio
+import logging
+
+from app.services.notificacoes import OuvinteNotificacoes
+
+logger = logging.getLogger(__name__)
+
+
+async def ao_mudar_status(evento: dict) -> None:
+    logger.info("Corrida %s: %s -> %s", evento["id"], evento["anterior"], evento["status"])
+    if evento["status"] == "aguardando":
+        logger.info("Corrida %s aguardando, chamando motoristas...", evento["id"])
+
+
+async def main() -> None:
+    ouvinte = OuvinteNotificacoes()
+    ouvinte.registrar("corridas", ao_mudar_status)
+    await ouvinte.executar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())